@@ -1,11 +1,10 @@
 # app/chat.py
 import os
 import sys
-# ensure project root on path so src can be imported
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import argparse
+# modul di src saling import secara flat (from topk import ...): src dimuat sekali, tanpa paket src.*
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
 
-from src.vsm_ir import VSMRetrieval
-from src.preprocess import preprocess_text  # if you have this
 import textwrap
 
 def make_answer_template(query, best_doc, snippet):
@@ -14,20 +13,39 @@ def make_answer_template(query, best_doc, snippet):
     answer = f"Sepertinya yang Anda maksud adalah **{title}**.\nRingkasan singkat: {snippet}\nCoba baca resep lengkapnya pada dokumen {best_doc}."
     return answer
 
-def chat_loop():
-    vsm = VSMRetrieval()
-    vsm.load_processed_docs()
-    vsm.build_tfidf()
-    print(f"Loaded {len(vsm.doc_ids)} documents.\nChatbot siap. Ketik 'exit' untuk keluar.")
+def load_local_ranker():
+    from vsm_ir import VSMRetrieval
+    from preprocess import preprocess_text, load_stem_dictionary
+    from result_cache import ResultCache
+    # model tersimpan (python src/vsm_ir.py build) jika masih sesuai korpus, selain itu fit ulang
+    vsm = VSMRetrieval.open()
+    vsm.result_cache = ResultCache(maxsize=256)
+    # kamus stem hasil ingest → stemming query cukup satu lookup dict
+    load_stem_dictionary()
+    print(f"Loaded {len(vsm.doc_ids)} documents.")
+
+    def ask(q):
+        # preprocess query same as corpus
+        tokens = preprocess_text(q)
+        return vsm.rank(" ".join(tokens), k=3)
+    return ask
+
+def load_remote_ranker(url):
+    # mode klien: index dan analyzer sudah dimuat di search_server.py
+    from search_server import SearchClient
+    client = SearchClient(url)
+    print(f"Terhubung ke {url} ({client.health()['n_docs']} documents).")
+    return lambda q: client.search(q, model="vsm", k=3, analyze=True)["results"]
+
+def chat_loop(server=None):
+    ask = load_remote_ranker(server) if server else load_local_ranker()
+    print("Chatbot siap. Ketik 'exit' untuk keluar.")
     while True:
         q = input("\nAnda: ").strip()
         if q.lower() in ("exit", "quit"):
             print("Bot: Sampai jumpa!")
             break
-        # preprocess query same as corpus
-        tokens = preprocess_text(q)
-        query_str = " ".join(tokens)
-        results = vsm.rank(query_str, k=3)
+        results = ask(q)
         if not results:
             print("Bot: Maaf, saya tidak menemukan hasil untuk query tersebut.")
             continue
@@ -40,4 +58,6 @@ def chat_loop():
             print(f" - {r['doc_id']} (score={r['score']:.4f})")
 
 if __name__ == "__main__":
-    chat_loop()
+    parser = argparse.ArgumentParser(description="Chatbot resep (VSM)")
+    parser.add_argument("--server", default=None, help="URL search_server.py, mis. http://127.0.0.1:8765")
+    chat_loop(parser.parse_args().server)
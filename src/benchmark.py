@@ -0,0 +1,418 @@
+# src/benchmark.py
+# Benchmark skala besar: korpus resep sintetis (10k → 1M dokumen) yang mengikuti
+# distribusi kosakata data/*.txt, query sintetis dari index, lalu pengukuran
+# throughput preprocessing, waktu & ukuran build index, cold start, latensi query
+# (p50/p95/p99) boolean / VSM / BM25 dan peak RSS. Hasil disimpan sebagai JSON;
+# `compare` menandai regresi antara dua hasil.
+#
+#   python src/benchmark.py generate --docs 100000
+#   python src/benchmark.py run --corpus data/bench/corpus_100000 --out reports/bench_100k.json
+#   python src/benchmark.py compare reports/bench_old.json reports/bench_100k.json
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import subprocess
+from collections import Counter
+from contextlib import redirect_stdout
+import numpy as np
+from sysinfo import peak_rss_mb
+
+BENCH_FORMAT = "stki-benchmark"
+BENCH_VERSION = 1
+
+SECTIONS = ("judul", "bahan", "langkah")
+_SECTION_RE = re.compile(r"^\s*(judul|bahan|langkah)\s*:", re.IGNORECASE | re.MULTILINE)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# suku kata untuk kosakata sintetis (ekor distribusi yang tumbuh bersama korpus)
+_SYLLABLES = ["ba", "ka", "la", "ma", "na", "pa", "ra", "sa", "ta", "ga", "da", "ja", "ci", "ku", "lu",
+              "mu", "nu", "pu", "ru", "su", "tu", "ri", "si", "ti", "lo", "mo", "ne", "re", "te", "gu",
+              "ngi", "nya", "wa", "ya", "bi", "di", "ho", "ke", "se", "de"]
+
+def default_bench_dir():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, "data", "bench")
+
+def dir_size_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return round(total / 2**20, 3)
+
+def percentiles(samples_ms):
+    a = np.asarray(samples_ms, dtype=np.float64)
+    if not len(a):
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(a, [50, 95, 99])
+    return {"n": len(a), "mean_ms": round(float(a.mean()), 4), "p50_ms": round(float(p50), 4),
+            "p95_ms": round(float(p95), 4), "p99_ms": round(float(p99), 4),
+            "max_ms": round(float(a.max()), 4), "qps": round(1000 * len(a) / max(float(a.sum()), 1e-9), 1)}
+
+# KORPUS SINTETIS
+class CorpusModel:
+    """
+    Statistik data/*.txt per bagian (judul, bahan, langkah): distribusi unigram
+    kata dan panjang bagian per dokumen. Dokumen sintetis mengambil panjang dari
+    dokumen asli acak (dengan jitter) dan kata dari unigram bagiannya; sebagian
+    kecil kata diganti kosakata sintetis berdistribusi Zipf yang ukurannya tumbuh
+    mengikuti jumlah dokumen (hukum Heaps), agar ukuran kosakata realistis di 1M dokumen.
+    """
+    def __init__(self, raw_dir, novel_rate=0.05):
+        self.novel_rate = novel_rate
+        counts = {s: Counter() for s in SECTIONS}
+        self.lengths = []
+        for fname in sorted(os.listdir(raw_dir)):
+            if not fname.endswith(".txt"):
+                continue
+            with open(os.path.join(raw_dir, fname), encoding="utf-8") as f:
+                parts = self.split_sections(f.read())
+            lens = []
+            for s in SECTIONS:
+                words = _WORD_RE.findall(parts.get(s, "").lower())
+                counts[s].update(words)
+                lens.append(len(words))
+            self.lengths.append(lens)
+        if not self.lengths:
+            raise ValueError(f"Tidak ada file .txt di {raw_dir}")
+        self.lengths = np.array(self.lengths, dtype=np.int64)
+        self.words, self.cum = {}, {}
+        for s in SECTIONS:
+            items = counts[s].most_common() or [("resep", 1)]
+            self.words[s] = [w for w, _ in items]
+            p = np.array([c for _, c in items], dtype=np.float64)
+            self.cum[s] = np.cumsum(p / p.sum())
+
+    @staticmethod
+    def split_sections(text):
+        parts, marks = {}, list(_SECTION_RE.finditer(text))
+        for i, m in enumerate(marks):
+            end = marks[i + 1].start() if i + 1 < len(marks) else len(text)
+            parts[m.group(1).lower()] = text[m.end():end].strip()
+        return parts
+
+    @staticmethod
+    def novel_word(i):
+        syl = _SYLLABLES
+        word = ""
+        i += len(syl)   # minimal dua suku kata
+        while i:
+            i, r = divmod(i, len(syl))
+            word += syl[r]
+        return word
+
+    def _draw(self, rng, section, n, novel_cum):
+        words = self.words[section]
+        idx = np.searchsorted(self.cum[section], rng.random(n), side="right")
+        out = [words[min(i, len(words) - 1)] for i in idx]
+        novel = np.flatnonzero(rng.random(n) < self.novel_rate)
+        if len(novel):
+            ranks = np.searchsorted(novel_cum, rng.random(len(novel)), side="right")
+            for pos, r in zip(novel, ranks):
+                out[pos] = self.novel_word(int(r))
+        return out
+
+    def document(self, rng, novel_cum):
+        title_n, bahan_n, langkah_n = (max(1, int(n * rng.uniform(0.7, 1.3)))
+                                       for n in self.lengths[rng.integers(len(self.lengths))])
+        title = " ".join(w.capitalize() for w in self._draw(rng, "judul", title_n, novel_cum))
+        bahan = self._draw(rng, "bahan", bahan_n, novel_cum)
+        langkah = self._draw(rng, "langkah", langkah_n, novel_cum)
+        # bahan dipisah koma per 1-4 kata, langkah dipotong menjadi kalimat 6-14 kata
+        items, i = [], 0
+        while i < len(bahan):
+            step = int(rng.integers(1, 5))
+            items.append(" ".join(bahan[i:i + step]))
+            i += step
+        sentences, i = [], 0
+        while i < len(langkah):
+            step = int(rng.integers(6, 15))
+            s = " ".join(langkah[i:i + step])
+            sentences.append(s[:1].upper() + s[1:] + ".")
+            i += step
+        return f"Judul: {title}\n\nBahan:\n{', '.join(items)}.\n\nLangkah:\n{' '.join(sentences)}"
+
+def generate_corpus(raw_dir, out_dir, n_docs, seed=0, novel_rate=0.05, zipf_s=1.1):
+    start = time.perf_counter()
+    model = CorpusModel(raw_dir, novel_rate)
+    rng = np.random.default_rng(seed)
+    vocab = int(20 * n_docs ** 0.6)
+    p = 1.0 / np.arange(1, vocab + 1) ** zipf_s
+    novel_cum = np.cumsum(p / p.sum())
+
+    os.makedirs(out_dir, exist_ok=True)
+    width = len(str(n_docs - 1))
+    for i in range(n_docs):
+        with open(os.path.join(out_dir, f"doc_{i:0{width}d}.txt"), "w", encoding="utf-8") as f:
+            f.write(model.document(rng, novel_cum))
+        if (i + 1) % 100000 == 0:
+            print(f"[INFO] {i + 1} / {n_docs} docs")
+    meta = {"n_docs": n_docs, "seed": seed, "novel_rate": novel_rate, "novel_vocab": vocab, "zipf_s": zipf_s,
+            "source": os.path.abspath(raw_dir), "source_docs": len(model.lengths)}
+    # bukan .txt → tidak ikut diproses preprocessing
+    with open(os.path.join(out_dir, "synthetic.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    print(f"[INFO] generated {n_docs} docs in {time.perf_counter() - start:.2f}s → {out_dir}")
+    return meta
+
+# QUERY SINTETIS
+def generate_queries(terms, df, n, seed=0, head_rate=0.8):
+    """
+    n query 1-4 kata dari kosakata index: sebagian besar kata diambil sebanding
+    df (kata umum lebih sering dicari), sisanya seragam (ekor panjang).
+    """
+    rng = np.random.default_rng(seed)
+    df = np.asarray(df, dtype=np.float64)
+    cum = np.cumsum(df / df.sum())
+    queries = []
+    for _ in range(n):
+        length = int(rng.choice([1, 2, 3, 4], p=[0.3, 0.35, 0.25, 0.1]))
+        ids = [int(np.searchsorted(cum, rng.random(), side="right")) if rng.random() < head_rate
+               else int(rng.integers(len(terms))) for _ in range(length)]
+        queries.append([str(terms[min(i, len(terms) - 1)]) for i in ids])
+    return queries
+
+def boolean_form(tokens, i):
+    """Variasi query boolean: OR, AND, AND NOT bergantian"""
+    if len(tokens) == 1:
+        return tokens[0]
+    form = i % 3
+    if form == 0:
+        return " OR ".join(tokens)
+    if form == 1:
+        return " AND ".join(tokens)
+    return f"{' AND '.join(tokens[:-1])} AND NOT {tokens[-1]}"
+
+# PENGUKURAN
+def time_queries(fn, queries, warmup=5):
+    for q in queries[:warmup]:
+        fn(q)
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+def cold_start(model, work_dir, query):
+    """Proses baru: import → buka index/model → query pertama (page cache OS tetap hangat)"""
+    cmd = [sys.executable, os.path.abspath(__file__), "cold", model, "--work", work_dir, "--query", query]
+    start = time.perf_counter()
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result["total_s"] = round(time.perf_counter() - start, 4)
+    return result
+
+def _cold(model, work_dir, query):
+    t0 = time.perf_counter()
+    with redirect_stdout(open(os.devnull, "w")):
+        from index_store import IndexReader
+        if model == "boolean":
+            from boolean_ir import BooleanIndex
+            import boolean_query
+        elif model == "vsm":
+            from term_matrix import TermDocMatrix
+        else:
+            from bm25_ir import BM25Retrieval
+        t1 = time.perf_counter()
+        if model == "boolean":
+            index = BooleanIndex.from_reader(IndexReader(os.path.join(work_dir, "index")))
+            run = lambda q: boolean_query.execute(boolean_query.plan(boolean_query.parse_query(q), index), index)
+        elif model == "vsm":
+            engine = TermDocMatrix.from_index(IndexReader(os.path.join(work_dir, "index")))
+            run = lambda q: engine.rank(q, k=10, weight="tfidf")
+        else:
+            bm25 = BM25Retrieval.load(os.path.join(work_dir, "bm25"))
+            run = lambda q: bm25.rank(q, k=10)
+        t2 = time.perf_counter()
+        run(query)
+        t3 = time.perf_counter()
+    print(json.dumps({"import_s": round(t1 - t0, 4), "open_s": round(t2 - t1, 4),
+                      "first_query_s": round(t3 - t2, 4), "peak_rss_mb": peak_rss_mb(children=False)}))
+
+def run_benchmark(corpus_dir, work_dir, n_queries=1000, workers=1, k=10, seed=0, keep=False):
+    from preprocess import preprocess_directory
+    from index_store import build_index, IndexReader
+    from term_matrix import TermDocMatrix
+    from bm25_ir import BM25Retrieval
+    from boolean_ir import BooleanIndex
+    import boolean_query
+
+    processed = os.path.join(work_dir, "processed")
+    index_dir = os.path.join(work_dir, "index")
+    bm25_dir = os.path.join(work_dir, "bm25")
+    for d in (processed, index_dir, bm25_dir):
+        shutil.rmtree(d, ignore_errors=True)
+    n_raw = sum(1 for f in os.listdir(corpus_dir) if f.endswith(".txt"))
+    result = {"format": BENCH_FORMAT, "version": BENCH_VERSION,
+              "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                          "cpus": os.cpu_count()},
+              "corpus": {"path": os.path.abspath(corpus_dir), "n_docs": n_raw,
+                         "size_mb": dir_size_mb(corpus_dir)},
+              "rss_mb": {}}
+
+    # 1. preprocessing (log per file dibuang)
+    print(f"[INFO] preprocessing {n_raw} docs (workers={workers}) ...")
+    with redirect_stdout(open(os.devnull, "w")):
+        stats = preprocess_directory(corpus_dir, processed, workers=workers, full=True)
+    seconds = max(stats["seconds"], 1e-9)
+    result["preprocess"] = {"seconds": round(seconds, 3), "workers": workers, "tokens": stats["tokens"],
+                            "docs_per_s": round(stats["docs"] / seconds, 1),
+                            "tokens_per_s": round(stats["tokens"] / seconds, 1)}
+    result["rss_mb"]["preprocess"] = peak_rss_mb()
+
+    # 2. build index posisional + impact index BM25
+    print("[INFO] building index ...")
+    start = time.perf_counter()
+    with redirect_stdout(open(os.devnull, "w")):
+        meta = build_index(processed, index_dir)
+    result["index"] = {"build_s": round(time.perf_counter() - start, 3), "size_mb": dir_size_mb(index_dir),
+                       "n_terms": meta["n_terms"], "n_postings": meta["n_postings"]}
+    start = time.perf_counter()
+    with redirect_stdout(open(os.devnull, "w")):
+        BM25Retrieval.from_index(IndexReader(index_dir)).save(bm25_dir)
+    result["bm25"] = {"build_s": round(time.perf_counter() - start, 3), "size_mb": dir_size_mb(bm25_dir)}
+    result["rss_mb"]["build"] = peak_rss_mb()
+
+    # 3. query sintetis dari kosakata index
+    reader = IndexReader(index_dir)
+    df = np.diff(np.asarray(reader.term_ptr))
+    queries = generate_queries(reader.terms, df, n_queries, seed)
+    text_queries = [" ".join(q) for q in queries]
+    bool_queries = [boolean_form(q, i) for i, q in enumerate(queries)]
+
+    # 4. cold start per model (proses baru)
+    print("[INFO] cold start ...")
+    result["cold_start"] = {m: cold_start(m, work_dir, text_queries[0]) for m in ("boolean", "vsm", "bm25")}
+
+    # 5. latensi query (tanpa cache hasil)
+    print(f"[INFO] timing {n_queries} queries per model ...")
+    with redirect_stdout(open(os.devnull, "w")):
+        boolean = BooleanIndex.from_reader(reader)
+        engine = TermDocMatrix.from_index(reader)
+        engine.weighted("tfidf")
+        bm25 = BM25Retrieval.load(bm25_dir)
+    def run_boolean(q):
+        docs = boolean_query.execute(boolean_query.plan(boolean_query.parse_query(q), boolean), boolean)
+        return docs[:k]
+    result["queries"] = {
+        "boolean": time_queries(run_boolean, bool_queries),
+        "vsm": time_queries(lambda q: engine.rank(q, k=k, weight="tfidf"), text_queries),
+        "vsm_prune": time_queries(lambda q: engine.rank(q, k=k, weight="tfidf", prune=True), text_queries),
+        "bm25": time_queries(lambda q: bm25.rank(q, k=k), text_queries),
+        "bm25_prune": time_queries(lambda q: bm25.rank(q, k=k, prune=True), text_queries),
+    }
+    result["rss_mb"]["query"] = peak_rss_mb()
+    result["peak_rss_mb"] = peak_rss_mb()
+    if not keep:
+        del reader, boolean, engine, bm25
+        for d in (processed, index_dir, bm25_dir):
+            shutil.rmtree(d, ignore_errors=True)
+    return result
+
+# PERBANDINGAN
+# metrik → arah: -1 = makin kecil makin baik, +1 = makin besar makin baik
+def _direction(path):
+    if path.endswith(("docs_per_s", "tokens_per_s", ".qps")):
+        return 1
+    if path.endswith(("_s", "_ms", "_mb", "seconds")) or path.startswith("rss_mb") or path == "peak_rss_mb":
+        return -1
+    return 0
+
+def _flatten(d, prefix=""):
+    out = {}
+    for key, value in d.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(_flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[path] = value
+    return out
+
+def compare(old, new, threshold=0.10):
+    """
+    Baris per metrik yang bisa dibandingkan: (metrik, lama, baru, perubahan relatif,
+    regresi?). Regresi = memburuk lebih dari threshold sesuai arah metrik.
+    """
+    a, b = _flatten(old), _flatten(new)
+    rows = []
+    for path in sorted(set(a) & set(b)):
+        direction = _direction(path)
+        if not direction or path.startswith(("corpus.", "machine.")):
+            continue
+        change = (b[path] - a[path]) / a[path] if a[path] else 0.0
+        rows.append((path, a[path], b[path], change, -direction * change > threshold))
+    return rows
+
+def main():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Benchmark skala besar dengan korpus sintetis")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_gen = sub.add_parser("generate", help="buat korpus resep sintetis dari distribusi data/*.txt")
+    p_gen.add_argument("--docs", type=int, default=10000)
+    p_gen.add_argument("--raw", default=os.path.join(base, "data"))
+    p_gen.add_argument("--out", default=None, help="default: data/bench/corpus_<docs>")
+    p_gen.add_argument("--seed", type=int, default=0)
+    p_gen.add_argument("--novel-rate", type=float, default=0.05, help="fraksi kata dari kosakata sintetis")
+    p_run = sub.add_parser("run", help="jalankan benchmark pada korpus")
+    p_run.add_argument("--corpus", required=True)
+    p_run.add_argument("--work", default=None, help="folder artefak (default: data/bench/work_<nama korpus>)")
+    p_run.add_argument("--queries", type=int, default=1000)
+    p_run.add_argument("--workers", type=int, default=1, help="worker preprocessing")
+    p_run.add_argument("--k", type=int, default=10)
+    p_run.add_argument("--seed", type=int, default=0)
+    p_run.add_argument("--keep", action="store_true", help="simpan artefak index setelah selesai")
+    p_run.add_argument("--out", default=os.path.join(base, "reports", "benchmark.json"))
+    p_cmp = sub.add_parser("compare", help="bandingkan dua hasil benchmark dan tandai regresi")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("candidate")
+    p_cmp.add_argument("--threshold", type=float, default=0.10, help="batas regresi relatif (0.10 = 10%%)")
+    p_cold = sub.add_parser("cold", help="probe cold start internal (dipanggil oleh run di proses baru)")
+    p_cold.add_argument("model", choices=["boolean", "vsm", "bm25"])
+    p_cold.add_argument("--work", required=True)
+    p_cold.add_argument("--query", default="")
+    args = parser.parse_args()
+
+    if args.cmd == "generate":
+        generate_corpus(args.raw, args.out or os.path.join(default_bench_dir(), f"corpus_{args.docs}"),
+                        args.docs, args.seed, args.novel_rate)
+    elif args.cmd == "run":
+        work = args.work or os.path.join(default_bench_dir(), "work_" + os.path.basename(os.path.normpath(args.corpus)))
+        result = run_benchmark(args.corpus, work, args.queries, args.workers, args.k, args.seed, args.keep)
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=1)
+        pre = result["preprocess"]
+        print(f"preprocess  {pre['docs_per_s']:.1f} docs/s, {pre['tokens_per_s']:.1f} tokens/s")
+        print(f"index       {result['index']['build_s']:.2f}s, {result['index']['size_mb']:.1f} MB   "
+              f"bm25 {result['bm25']['build_s']:.2f}s, {result['bm25']['size_mb']:.1f} MB")
+        for m, c in result["cold_start"].items():
+            print(f"cold {m:<7} {c['total_s']:.3f}s (open {c['open_s']:.3f}s, first query {c['first_query_s']:.4f}s)")
+        for m, q in result["queries"].items():
+            print(f"{m:<11} p50={q['p50_ms']:.3f} ms  p95={q['p95_ms']:.3f} ms  p99={q['p99_ms']:.3f} ms  "
+                  f"({q['qps']:.0f} q/s)")
+        print(f"peak RSS    {result['peak_rss_mb']} MB")
+        print(f"[INFO] saved to {args.out}")
+    elif args.cmd == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.candidate, encoding="utf-8") as f:
+            new = json.load(f)
+        if old.get("corpus", {}).get("n_docs") != new.get("corpus", {}).get("n_docs"):
+            print("[WARN] jumlah dokumen korpus berbeda; perbandingan tidak setara")
+        rows = compare(old, new, args.threshold)
+        for path, a, b, change, regressed in rows:
+            flag = "REGRESSION" if regressed else ""
+            print(f"{path:<32} {a:>12.4g} → {b:<12.4g} {change:+8.1%}  {flag}")
+        n = sum(r[4] for r in rows)
+        print(f"\n{n} regresi (threshold {args.threshold:.0%})")
+        sys.exit(1 if n else 0)
+    else:
+        _cold(args.model, args.work, args.query)
+
+if __name__ == "__main__":
+    main()
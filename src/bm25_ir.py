@@ -0,0 +1,263 @@
+# src/bm25_ir.py
+# BM25 dengan impact index: bobot idf·tf tersaturasi (dengan normalisasi panjang
+# dokumen) dihitung sekali saat indexing untuk k1/b tertentu. Query cukup satu
+# perkalian vektor sparse × matriks lalu seleksi top-k parsial.
+import os
+import json
+import time
+import argparse
+from collections import Counter
+import numpy as np
+from topk import BlockMax, blockmax_topk, load_block_max, top_k_indices
+from result_cache import query_key
+from explain import Explainer, load_top
+from packed_store import iter_processed, manifest_generation, corpus_fingerprint
+import tracing
+
+BM25_FORMAT = "stki-bm25-impact"
+BM25_VERSION = 1
+
+class BM25Retrieval:
+    def __init__(self, processed_dir=None, k1=1.5, b=0.75):
+        base = os.path.dirname(os.path.abspath(__file__))
+
+        if processed_dir is None:
+            processed_dir = os.path.join(base, "..", "data", "processed")
+
+        self.processed_dir = os.path.normpath(processed_dir)
+        self.k1 = k1
+        self.b = b
+
+        self.doc_ids = []
+        self.terms = None        # array term terurut (kolom → term)
+        self.impact = None       # CSR term × doc berisi bobot BM25
+        self.doc_lens = None
+        self.avgdl = 0.0
+        self.generation = 0
+        self.corpus = None           # sidik sumber (packed_store.corpus_fingerprint / IndexReader.fingerprint)
+        self.last_query_stats = None
+        self.result_cache = None     # result_cache.ResultCache opsional di depan rank()
+        self._explainer = None
+        self._top = None             # tabel top-N term tersimpan (lihat explain.py)
+        self._block_max = None       # topk.BlockMax atas impact untuk rank(prune=True)
+
+    # LOAD KORPUS → MATRIKS TF (term × doc)
+    def load_processed_docs(self):
+        from scipy.sparse import csr_matrix
+        self.corpus = corpus_fingerprint(self.processed_dir)
+        vocab = {}
+        rows, cols, vals = [], [], []
+        doc_lens = []
+        for fname, text in iter_processed(self.processed_dir):
+            tokens = text.split()
+            doc = len(self.doc_ids)
+            self.doc_ids.append(fname)
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                rows.append(vocab.setdefault(term, len(vocab)))
+                cols.append(doc)
+                vals.append(tf)
+
+        # urutkan kamus agar term bisa dicari dengan binary search
+        terms = sorted(vocab)
+        remap = np.empty(len(vocab), dtype=np.int64)
+        for new_id, term in enumerate(terms):
+            remap[vocab[term]] = new_id
+        tf = csr_matrix(
+            (np.array(vals, dtype=np.float64), (remap[np.array(rows, dtype=np.int64)], np.array(cols))),
+            shape=(len(terms), len(self.doc_ids)),
+        )
+        self.terms = np.array(terms, dtype=str)
+        self.doc_lens = np.array(doc_lens, dtype=np.float64)
+        print(f"[INFO] Loaded {len(self.doc_ids)} documents.")
+        self._build_impact(tf)
+
+    @classmethod
+    def from_index(cls, index, k1=1.5, b=0.75):
+        """Membangun impact index langsung dari postings index_store.IndexReader"""
+        from scipy.sparse import csr_matrix
+        bm25 = cls(k1=k1, b=b)
+        bm25.doc_ids = [str(d) for d in index.doc_ids]
+        bm25.terms = index.terms
+        bm25.doc_lens = np.asarray(index.doc_lens, dtype=np.float64)
+        bm25.generation = index.generation
+        bm25.corpus = index.fingerprint()
+        tf = csr_matrix(
+            (np.asarray(index.post_tf, dtype=np.float64), np.asarray(index.post_docs), np.asarray(index.term_ptr)),
+            shape=(len(index.terms), index.N),
+        )
+        bm25._build_impact(tf)
+        return bm25
+
+    # PRECOMPUTE IMPACT: idf · f·(k1+1) / (f + k1·(1 - b + b·dl/avgdl))
+    def _build_impact(self, tf):
+        from scipy.sparse import csr_matrix
+        N = len(self.doc_ids)
+        self.avgdl = float(self.doc_lens.sum()) / max(1, N)
+        df = np.diff(tf.indptr)
+        # BM25 idf (with small smoothing), sama dengan search_engine.bm25_score_for_doc
+        idf = np.log((N - df + 0.5) / (df + 0.5) + 1e-9)
+
+        f = tf.data
+        term_of_entry = np.repeat(np.arange(len(df)), df)
+        denom = f + self.k1 * (1 - self.b + self.b * self.doc_lens[tf.indices] / self.avgdl)
+        data = idf[term_of_entry] * (f * (self.k1 + 1)) / denom
+        self.impact = csr_matrix((data, tf.indices, tf.indptr), shape=tf.shape)
+        self._explainer = None
+        self._block_max = None
+        print(f"[INFO] BM25 impact index: {tf.shape[0]} terms x {N} docs (k1={self.k1}, b={self.b})")
+
+    # SIMPAN / MUAT (array .npy, bisa mmap)
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "terms.npy"), np.asarray(self.terms))
+        np.save(os.path.join(path, "doc_ids.npy"), np.array(self.doc_ids, dtype=str))
+        np.save(os.path.join(path, "doc_lens.npy"), self.doc_lens)
+        np.save(os.path.join(path, "impact_data.npy"), self.impact.data)
+        np.save(os.path.join(path, "impact_indices.npy"), self.impact.indices)
+        np.save(os.path.join(path, "impact_indptr.npy"), self.impact.indptr)
+        self.explainer().save_top(path)
+        self.block_max().save(path)
+        meta = {"format": BM25_FORMAT, "version": BM25_VERSION, "k1": self.k1, "b": self.b,
+                "n_docs": len(self.doc_ids), "avgdl": self.avgdl, "generation": self.generation,
+                "corpus": self.corpus, "block_size": self.block_max().block_size}
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        from scipy.sparse import csr_matrix
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != BM25_FORMAT or meta.get("version") != BM25_VERSION:
+            raise ValueError(f"Format BM25 index tidak dikenali di {path}")
+        mode = "r" if mmap else None
+        arr = lambda name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mode)
+        bm25 = cls(k1=meta["k1"], b=meta["b"])
+        bm25.terms = arr("terms")
+        bm25.doc_ids = [str(d) for d in arr("doc_ids")]
+        bm25.doc_lens = arr("doc_lens")
+        bm25.avgdl = meta["avgdl"]
+        bm25.generation = meta["generation"]
+        bm25.corpus = meta.get("corpus")
+        bm25.impact = csr_matrix((arr("impact_data"), arr("impact_indices"), arr("impact_indptr")),
+                                 shape=(len(bm25.terms), meta["n_docs"]), copy=False)
+        bm25._top = load_top(path, mmap)
+        bm25._block_max = load_block_max(path, meta["n_docs"], meta.get("block_size"), mmap)
+        return bm25
+
+    # QUERY → VEKTOR SPARSE (1 × V, berisi jumlah kemunculan term query)
+    def vectorize_query(self, query_tokens):
+        from scipy.sparse import csr_matrix
+        counts = Counter()
+        for t in query_tokens:
+            i = int(np.searchsorted(self.terms, t))
+            if i < len(self.terms) and self.terms[i] == t:
+                counts[i] += 1
+        cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        vals = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        return csr_matrix((vals, (np.zeros(len(cols), dtype=np.int64), cols)), shape=(1, len(self.terms)))
+
+    def score(self, query_tokens):
+        """Skor BM25 semua dokumen: satu perkalian sparse vektor × matriks impact"""
+        q_vec = self.vectorize_query(query_tokens)
+        return np.asarray((q_vec @ self.impact).todense()).ravel()
+
+    def rank(self, query, k=5, prune=False):
+        """
+        prune=True: top-k block-max (lihat topk.py) yang melewati blok dokumen yang
+        tidak mungkin masuk top-k; hasil identik dengan scoring penuh. Jumlah dokumen
+        yang benar-benar diskor disimpan di last_query_stats.
+        """
+        if self.impact is None:
+            raise ValueError("BM25 index belum dibuat.")
+        with tracing.span("analyze"):
+            tokens = query.lower().split()
+            q_vec = self.vectorize_query(tokens)
+        cache = self.result_cache
+        if cache is not None:
+            key = query_key("bm25", q_vec.indices, q_vec.data, self.k1, self.b)
+            with tracing.span("cache"):
+                cached = cache.get(key, k, self.generation)
+            if cached is not None:
+                self.last_query_stats = {"n_docs": len(self.doc_ids), "scored": 0, "pruned": 0, "mode": "cache"}
+                return cached
+
+        top = None
+        if prune:
+            with tracing.span("score"):
+                top = self._rank_pruned(q_vec, k)
+        if top is None:
+            with tracing.span("score"):
+                scores = np.asarray((q_vec @ self.impact).todense()).ravel()
+            self.last_query_stats = {"n_docs": len(self.doc_ids), "scored": len(self.doc_ids), "pruned": 0,
+                                     "mode": "exhaustive"}
+            with tracing.span("sort"):
+                top = [(i, float(scores[i])) for i in top_k_indices(scores, k)]
+        if tracing.active():
+            ptr = self.impact.indptr
+            tracing.count("docs_scored", self.last_query_stats["scored"])
+            tracing.count("postings_read", int(sum(ptr[t + 1] - ptr[t] for t in q_vec.indices)))
+        results = [{"doc_id": self.doc_ids[d], "score": s} for d, s in top]
+        if cache is not None:
+            cache.put(key, k, results, self.generation)
+        return results
+
+    def rank_pruned(self, query_tokens, k):
+        """(doc, skor) top-k via block-max; None jika harus kembali ke scoring penuh"""
+        return self._rank_pruned(self.vectorize_query(query_tokens), k)
+
+    def _rank_pruned(self, q_vec, k):
+        top, stats = blockmax_topk(self.impact, self.block_max(), q_vec.indices, q_vec.data, k)
+        stats["mode"] = "blockmax" if top is not None else "exhaustive"
+        self.last_query_stats = stats
+        return top
+
+    def block_max(self):
+        """Batas atas impact per blok doc id (tersimpan bersama index, atau dihitung sekali)"""
+        if self._block_max is None:
+            self._block_max = BlockMax.from_matrix(self.impact)
+        return self._block_max
+
+    # PENJELASAN HASIL (sparse, lihat explain.py)
+    def explainer(self):
+        if self._explainer is None:
+            self._explainer = Explainer(self.impact, self.terms, term_major=True, top=self._top)
+        return self._explainer
+
+    def explain(self, doc, query, top_n=5):
+        """Kontribusi BM25 tiap term query (jumlah kemunculan × impact) + top term dokumen"""
+        q_vec = self.vectorize_query(query.lower().split())
+        return self.explainer().explain(doc, q_vec.indices, q_vec.data, top_n)
+
+def default_bm25_dir():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, "data", "index", "bm25")
+
+# CLI: bangun impact index sekali, lalu dipakai search_engine --model bm25
+if __name__ == "__main__":
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="BM25 impact index")
+    parser.add_argument("command", choices=["build", "query"])
+    parser.add_argument("--processed", default=os.path.join(base, "data", "processed"))
+    parser.add_argument("--out", default=default_bm25_dir())
+    parser.add_argument("--k1", type=float, default=1.5)
+    parser.add_argument("--b", type=float, default=0.75)
+    parser.add_argument("--query", default="")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--prune", action="store_true", help="top-k block-max (dynamic pruning)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        bm25 = BM25Retrieval(args.processed, k1=args.k1, b=args.b)
+        bm25.load_processed_docs()
+        bm25.generation = manifest_generation(args.processed)
+        bm25.save(args.out)
+        print(f"[INFO] saved to {args.out} in {time.perf_counter() - start:.2f}s")
+    else:
+        bm25 = BM25Retrieval.load(args.out)
+        for r in bm25.rank(args.query, k=args.k, prune=args.prune):
+            print(f"{r['doc_id']:<30} {r['score']:.4f}")
+        stats = bm25.last_query_stats
+        print(f"[INFO] {stats['mode']}: scored {stats['scored']} / {stats['n_docs']} docs")
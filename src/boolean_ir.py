@@ -1,23 +1,396 @@
 # src/boolean_ir.py
 import os
+import sys
+import time
+import bisect
+import argparse
+import tracemalloc
+from array import array
 from collections import defaultdict
+import numpy as np
+from packed_store import iter_processed
+
+# jarak skip pointer (dalam jumlah posting) pada posting list terkompresi
+SKIP_INTERVAL = 64
+
+# VARINT (7 bit per byte, bit tertinggi = masih ada byte lanjutan)
+def _write_varint(buf, value):
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+# POSTING LIST TERKOMPRESI (delta + varint, dengan skip pointer)
+class PostingList:
+    """
+    Doc id terurut disimpan sebagai delta varint dalam satu bytearray.
+    Setiap SKIP_INTERVAL posting dicatat (doc id, offset byte) agar seek()
+    bisa melompat langsung ke blok yang tepat tanpa men-decode dari awal.
+    """
+    __slots__ = ("data", "length", "last", "skip_docs", "skip_offsets")
+
+    def __init__(self, doc_ids=()):
+        self.data = bytearray()
+        self.length = 0
+        self.last = -1
+        self.skip_docs = array("i")
+        self.skip_offsets = array("I")
+        for d in doc_ids:
+            self.append(d)
+
+    def append(self, doc_id):
+        """Menambah doc id di akhir list (harus lebih besar dari doc id terakhir)"""
+        if doc_id <= self.last:
+            raise ValueError(f"doc id harus naik: {doc_id} <= {self.last}")
+        if self.length % SKIP_INTERVAL == 0:
+            # skip entry menyimpan doc id sebelum blok sebagai basis delta
+            self.skip_docs.append(self.last)
+            self.skip_offsets.append(len(self.data))
+        _write_varint(self.data, doc_id - self.last)
+        self.last = doc_id
+        self.length += 1
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.decode().tolist())
+
+    def nbytes(self):
+        return len(self.data) + self.skip_docs.itemsize * len(self.skip_docs) * 2
+
+    def decode(self):
+        """Decode seluruh list ke array int64 (vektorisasi numpy, tanpa loop Python)"""
+        if not self.length:
+            return np.empty(0, dtype=np.int64)
+        raw = np.frombuffer(bytes(self.data), dtype=np.uint8)
+        is_end = raw < 0x80
+        starts = np.empty(self.length, dtype=np.int64)
+        starts[0] = 0
+        starts[1:] = np.flatnonzero(is_end)[:-1] + 1
+        # posisi byte di dalam varint-nya → geser 7 bit per byte
+        group = np.cumsum(np.concatenate(([0], is_end[:-1]))).astype(np.int64)
+        shift = 7 * (np.arange(len(raw)) - starts[group])
+        values = (raw & 0x7F).astype(np.int64) << shift
+        deltas = np.add.reduceat(values, starts)
+        return np.cumsum(deltas) - 1
+
+    def seek_filter(self, candidates):
+        """Mengembalikan candidates (terurut naik) yang juga ada di list ini"""
+        if len(candidates) * SKIP_INTERVAL >= self.length:
+            # kandidat padat: decode sekali lalu binary search vektor
+            return _member_filter(self.decode(), candidates)
+        out = []
+        data = self.data
+        skip_docs = self.skip_docs
+        candidates = candidates.tolist() if hasattr(candidates, "tolist") else candidates
+        block = -1
+        pos = 0
+        doc = -1
+        for target in candidates:
+            if target > self.last:
+                break
+            # lompat ke blok terakhir yang basisnya < target
+            b = bisect.bisect_left(skip_docs, target) - 1
+            if b > block:
+                block = b
+                pos = self.skip_offsets[b]
+                doc = skip_docs[b]
+            # decode linear sampai doc >= target
+            while doc < target:
+                delta, pos = _read_varint(data, pos)
+                doc += delta
+            if doc == target:
+                out.append(target)
+        return np.array(out, dtype=np.int64)
+
+class ArrayPostings:
+    """Doc id terurut yang sudah ada di memori/mmap (mis. index_store); seek via binary search (np.searchsorted) per kandidat"""
+    __slots__ = ("docs",)
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __iter__(self):
+        return iter(self.decode().tolist())
+
+    def nbytes(self):
+        return getattr(self.docs, "nbytes", 0)
+
+    def decode(self):
+        return np.asarray(self.docs, dtype=np.int64)
+
+    def seek_filter(self, candidates):
+        return _member_filter(self.docs, candidates)
+
+def _member_filter(docs, candidates):
+    """candidates yang ada di docs (keduanya terurut): satu binary search per kandidat"""
+    candidates = np.asarray(candidates, dtype=np.int64)
+    if not len(docs) or not len(candidates):
+        return candidates[:0]
+    pos = np.searchsorted(docs, candidates)
+    pos[pos == len(docs)] = len(docs) - 1
+    return candidates[np.asarray(docs)[pos] == candidates]
+
+# OPERASI POSTING
+def intersect_postings(lists):
+    """AND: mulai dari list terpendek, lalu saring kandidat ke list lain (terpendek dulu)"""
+    if not lists:
+        return np.empty(0, dtype=np.int64)
+    lists = sorted(lists, key=len)
+    candidates = lists[0].decode()
+    for plist in lists[1:]:
+        if not len(candidates):
+            break
+        candidates = plist.seek_filter(candidates)
+    return candidates
+
+def union_postings(lists):
+    """
+    OR: k-way merge list terurut, duplikat dibuang. Sort stabil numpy (timsort)
+    mendeteksi k run yang sudah terurut sehingga bekerja sebagai merge k-arah.
+    """
+    arrays = [p.decode() for p in lists if len(p)]
+    if not arrays:
+        return np.empty(0, dtype=np.int64)
+    if len(arrays) == 1:
+        return arrays[0]
+    merged = np.sort(np.concatenate(arrays), kind="stable")
+    keep = np.empty(len(merged), dtype=bool)
+    keep[0] = True
+    keep[1:] = merged[1:] != merged[:-1]
+    return merged[keep]
+
+def difference_postings(docs, plist):
+    """docs (terurut) dikurangi isi plist, tanpa membentuk semesta dokumen"""
+    docs = np.asarray(docs, dtype=np.int64)
+    if not len(docs) or not len(plist):
+        return docs
+    present = plist.seek_filter(docs)
+    return docs[~np.isin(docs, present, assume_unique=True)]
+
+# INDEX BOOLEAN (doc id integer)
+class BooleanIndex:
+    """
+    Index boolean berbasis doc id integer. doc_ids[i] = nama file; id dialokasikan
+    urut nama file sehingga hasil terurut id = terurut nama file.
+    """
+    def __init__(self):
+        self.doc_ids = []
+        self.doc_index = {}
+        self.postings = {}
+        self.deleted = set()
+        self.positions = None
+        self._ordered = True
+        self._reader = None
+        self._sorted_terms = None
+
+    @classmethod
+    def from_processed_dir(cls, processed_dir, with_positions=False):
+        """with_positions=True juga menyimpan posisi token (dibutuhkan query frasa)"""
+        index = cls()
+        if with_positions:
+            index.positions = defaultdict(dict)
+        for fname, text in iter_processed(processed_dir):
+            index.add_document(fname, text.split())
+        return index
+
+    @classmethod
+    def from_reader(cls, reader):
+        """Memakai postings index_store.IndexReader (mmap) langsung, tanpa membangun ulang"""
+        index = cls()
+        index._reader = reader
+        index.doc_ids = [str(d) for d in reader.doc_ids]
+        return index
+
+    def add_document(self, fname, tokens):
+        doc = len(self.doc_ids)
+        if self.doc_ids and fname < self.doc_ids[-1]:
+            self._ordered = False
+        self.doc_ids.append(fname)
+        self.doc_index[fname] = doc
+        self._sorted_terms = None
+        if self.positions is not None:
+            for pos, token in enumerate(tokens):
+                self.positions[token].setdefault(doc, array("I")).append(pos)
+        for token in set(tokens):
+            plist = self.postings.get(token)
+            if plist is None:
+                plist = self.postings[token] = PostingList()
+            plist.append(doc)
+        return doc
+
+    def remove_document(self, fname):
+        doc = self.doc_index.pop(fname, None)
+        if doc is not None:
+            self.deleted.add(doc)
+
+    def get(self, term):
+        """Posting list untuk term (list kosong jika tidak ada)"""
+        if self._reader is not None:
+            return ArrayPostings(self._reader.postings(term)[0])
+        return self.postings.get(term) or PostingList()
+
+    def df(self, term):
+        return len(self.get(term))
+
+    def terms(self):
+        if self._reader is not None:
+            return [str(t) for t in self._reader.terms]
+        return self.postings.keys()
+
+    def expand_prefix(self, prefix):
+        """Semua term berawalan prefix (kamus terurut + binary search)"""
+        if self._reader is not None:
+            return [str(self._reader.terms[i]) for i in self._reader.prefix_term_ids(prefix)]
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        lo = bisect.bisect_left(self._sorted_terms, prefix)
+        hi = bisect.bisect_left(self._sorted_terms, prefix + "\U0010ffff")
+        return self._sorted_terms[lo:hi]
+
+    @property
+    def has_positions(self):
+        return self._reader is not None or self.positions is not None
+
+    def term_positions(self, term, docs):
+        """dict doc → posisi term, hanya untuk docs yang diminta"""
+        if self._reader is not None:
+            by_doc = self._reader.term_positions(term)
+        elif self.positions is not None:
+            by_doc = self.positions.get(term, {})
+        else:
+            raise ValueError("Index dibangun tanpa posisi; gunakan with_positions=True untuk query frasa.")
+        return {d: by_doc[d] for d in docs if d in by_doc}
+
+    def universe(self):
+        """Semua doc id aktif (hanya dipakai untuk NOT tanpa operand positif)"""
+        docs = np.arange(len(self.doc_ids), dtype=np.int64)
+        if self.deleted:
+            docs = docs[~np.isin(docs, list(self.deleted))]
+        return docs
+
+    def names(self, docs):
+        """Konversi doc id → nama file (terurut nama file), melewati dokumen terhapus"""
+        docs = docs.tolist() if hasattr(docs, "tolist") else docs
+        if self.deleted:
+            docs = [d for d in docs if d not in self.deleted]
+        doc_ids = self.doc_ids
+        names = [doc_ids[d] for d in docs]
+        return names if self._ordered else sorted(names)
+
+    def nbytes(self):
+        """Perkiraan memori postings (byte)"""
+        return sum(p.nbytes() for p in self.postings.values())
 
 def build_inverted_index(processed_dir):
-    index = defaultdict(set)
-    for fname in os.listdir(processed_dir):
-        if fname.endswith(".txt"):
-            with open(os.path.join(processed_dir, fname), encoding="utf-8") as f:
-                tokens = f.read().split()
-            for token in set(tokens):
-                index[token].add(fname)
+    return BooleanIndex.from_processed_dir(processed_dir)
+
+def update_inverted_index(index, processed_dir, changes):
+    """Memperbarui index secara inkremental dari hasil preprocess.changed_documents"""
+    for fname in list(changes["changed"]) + list(changes["removed"]):
+        index.remove_document(fname)
+    for fname, text in iter_processed(processed_dir, changes["changed"]):
+        index.add_document(fname, text.split())
     return index
 
 def boolean_retrieve(query_tokens, index, op="AND"):
+    lists = [index.get(t) for t in query_tokens]
+    if not lists:
+        return []
+    if op == "AND":
+        result = intersect_postings(lists)
+    else:
+        result = union_postings(lists)
+    return index.names(result)
+
+# PERBANDINGAN DENGAN INDEX BERBASIS SET (implementasi lama)
+def _build_set_index(corpus):
+    index = defaultdict(set)
+    for fname, tokens in corpus:
+        for token in set(tokens):
+            index[token].add(fname)
+    return index
+
+def _set_retrieve(query_tokens, index, op="AND"):
     sets = [index.get(t, set()) for t in query_tokens]
     if not sets:
         return []
-    if op == "AND":
-        result = set.intersection(*sets)
+    result = set.intersection(*sets) if op == "AND" else set.union(*sets)
+    return sorted(result)
+
+def benchmark(processed_dir, copies=1, repeat=20):
+    """
+    Membandingkan memori (tracemalloc) dan latensi query index set lama vs
+    BooleanIndex terkompresi. copies > 1 menggandakan korpus untuk simulasi skala.
+    """
+    corpus = []
+    for fname, text in iter_processed(processed_dir):
+        tokens = text.split()
+        for c in range(copies):
+            corpus.append((f"{c:06d}_{fname}", tokens))
+    corpus.sort()
+
+    tracemalloc.start()
+    set_index = _build_set_index(corpus)
+    set_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    bool_index = BooleanIndex()
+    for fname, tokens in corpus:
+        bool_index.add_document(fname, tokens)
+    bool_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # query: pasangan/triplet term dengan df tinggi dan rendah
+    by_df = sorted(set_index, key=lambda t: len(set_index[t]), reverse=True)
+    queries = [by_df[:2], by_df[:3], [by_df[0], by_df[len(by_df) // 2]], [by_df[1], by_df[-1]]]
+
+    print(f"[INFO] {len(corpus)} docs, {len(set_index)} terms")
+    print(f"memory  set-based: {set_mem / 1e6:8.2f} MB   compressed: {bool_mem / 1e6:8.2f} MB "
+          f"(postings {bool_index.nbytes() / 1e6:.2f} MB)")
+    for op in ("AND", "OR"):
+        for q in queries:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                expected = _set_retrieve(q, set_index, op)
+            t_set = (time.perf_counter() - start) / repeat
+            start = time.perf_counter()
+            for _ in range(repeat):
+                got = boolean_retrieve(q, bool_index, op)
+            t_new = (time.perf_counter() - start) / repeat
+            assert got == expected, f"hasil berbeda untuk {q} ({op})"
+            print(f"{op:<3} {' '.join(q):<30} hits={len(got):<8} set={t_set * 1000:8.3f} ms  "
+                  f"compressed={t_new * 1000:8.3f} ms")
+
+if __name__ == "__main__":
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Boolean retrieval (posting list terkompresi)")
+    parser.add_argument("--benchmark", action="store_true", help="bandingkan dengan index berbasis set")
+    parser.add_argument("--copies", type=int, default=1, help="gandakan korpus N kali untuk benchmark")
+    parser.add_argument("--processed", default=os.path.join(base, "data", "processed"))
+    parser.add_argument("query", nargs="*")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.processed, copies=args.copies)
+    elif args.query:
+        index = build_inverted_index(args.processed)
+        print(boolean_retrieve([q.lower() for q in args.query], index))
     else:
-        result = set.union(*sets)
-    return list(result)
+        parser.print_help(sys.stderr)
@@ -0,0 +1,260 @@
+# src/boolean_query.py
+# Bahasa query boolean: AND / OR / NOT, kurung, frasa "..." (pakai posisi) dan
+# wildcard prefix (bawang*). Query di-parse ke AST, lalu dikompilasi menjadi
+# rencana eksekusi yang mengurutkan operand berdasarkan document frequency.
+import os
+import re
+import argparse
+import numpy as np
+from boolean_ir import union_postings, difference_postings, _member_filter
+
+KEYWORDS = {"AND", "OR", "NOT"}
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+
+# TOKENIZER QUERY
+def lex(query):
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        m = _TOKEN_RE.match(query, pos)
+        if not m:
+            raise ValueError(f"Query tidak valid di posisi {pos}: {query[pos:]!r}")
+        pos = m.end()
+        lparen, rparen, phrase, word = m.groups()
+        if lparen:
+            tokens.append(("(", None))
+        elif rparen:
+            tokens.append((")", None))
+        elif phrase is not None:
+            tokens.append(("PHRASE", phrase.lower().split()))
+        elif word in KEYWORDS:
+            tokens.append((word, None))
+        else:
+            tokens.append(("WORD", word.lower()))
+    return tokens
+
+# PARSER (recursive descent) → AST
+class _Parser:
+    """
+    or_expr  := and_expr (OR and_expr)*
+    and_expr := not_expr (AND not_expr)*
+    not_expr := NOT not_expr | "(" or_expr ")" | "frasa" | kata | prefix*
+    Operand yang berdampingan tanpa operator digabung dengan default_op.
+    """
+    def __init__(self, tokens, default_op):
+        self.tokens = tokens
+        self.i = 0
+        self.default_op = default_op
+
+    def peek(self):
+        return self.tokens[self.i][0] if self.i < len(self.tokens) else None
+
+    def take(self):
+        tok = self.tokens[self.i]
+        self.i += 1
+        return tok
+
+    def starts_operand(self):
+        return self.peek() in ("(", "PHRASE", "WORD", "NOT")
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Query kosong.")
+        node = self.or_expr()
+        if self.i != len(self.tokens):
+            raise ValueError(f"Token tidak terduga: {self.tokens[self.i][0]}")
+        return node
+
+    def or_expr(self):
+        children = [self.and_expr()]
+        while self.peek() == "OR" or (self.default_op == "OR" and self.starts_operand()):
+            if self.peek() == "OR":
+                self.take()
+            children.append(self.and_expr())
+        return children[0] if len(children) == 1 else ("or", children)
+
+    def and_expr(self):
+        children = [self.not_expr()]
+        while self.peek() == "AND" or (self.default_op == "AND" and self.starts_operand()):
+            if self.peek() == "AND":
+                self.take()
+            children.append(self.not_expr())
+        return children[0] if len(children) == 1 else ("and", children)
+
+    def not_expr(self):
+        kind = self.peek()
+        if kind == "NOT":
+            self.take()
+            return ("not", self.not_expr())
+        if kind == "(":
+            self.take()
+            node = self.or_expr()
+            if self.peek() != ")":
+                raise ValueError("Kurung tutup ')' tidak ditemukan.")
+            self.take()
+            return node
+        if kind == "PHRASE":
+            words = self.take()[1]
+            if not words:
+                raise ValueError("Frasa kosong.")
+            return ("term", words[0]) if len(words) == 1 else ("phrase", words)
+        if kind == "WORD":
+            word = self.take()[1]
+            if word.endswith("*") and len(word) > 1:
+                return ("prefix", word.rstrip("*"))
+            return ("term", word)
+        raise ValueError(f"Operand diharapkan, ditemukan {kind or 'akhir query'}.")
+
+def parse_query(query, default_op="OR"):
+    return _Parser(lex(query), default_op.upper()).parse()
+
+# PLANNER: estimasi biaya = batas atas jumlah dokumen hasil
+def plan(node, index):
+    """Mengubah AST menjadi rencana eksekusi: (op, est, children/term)"""
+    kind = node[0]
+    n_docs = len(index.doc_ids)
+    if kind == "term":
+        return ("term", index.df(node[1]), node[1])
+    if kind == "prefix":
+        terms = index.expand_prefix(node[1])
+        children = sorted((("term", index.df(t), t) for t in terms), key=lambda c: c[1])
+        return ("or", min(n_docs, sum(c[1] for c in children)), children)
+    if kind == "phrase":
+        children = sorted((("term", index.df(t), t) for t in node[1]), key=lambda c: c[1])
+        return ("phrase", children[0][1], node[1], children)
+    if kind == "not":
+        child = plan(node[1], index)
+        return ("not", n_docs - child[1] if child[0] == "term" else n_docs, child)
+    children = [plan(c, index) for c in node[1]]
+    if kind == "or":
+        return ("or", min(n_docs, sum(c[1] for c in children)), sorted(children, key=lambda c: c[1]))
+    # AND: operand positif paling selektif dulu, NOT dievaluasi terakhir sebagai pengurang
+    positives = sorted((c for c in children if c[0] != "not"), key=lambda c: c[1])
+    negatives = [c for c in children if c[0] == "not"]
+    est = positives[0][1] if positives else n_docs
+    return ("and", est, positives + negatives)
+
+def format_plan(p, depth=0):
+    pad = "  " * depth
+    kind, est = p[0], p[1]
+    if kind == "term":
+        return f"{pad}TERM {p[2]} (df={est})"
+    if kind == "phrase":
+        return f"{pad}PHRASE \"{' '.join(p[2])}\" (est={est})"
+    children = [p[2]] if kind == "not" else p[2]
+    lines = [f"{pad}{kind.upper()} (est={est})"]
+    lines += [format_plan(c, depth + 1) for c in children]
+    return "\n".join(lines)
+
+# EKSEKUSI
+def execute(p, index, within=None):
+    """
+    Menjalankan rencana; within (array doc id terurut) membatasi hasil sehingga
+    NOT di dalam AND cukup mengurangi kandidat tanpa membentuk semesta dokumen.
+    """
+    kind = p[0]
+    if kind == "term":
+        plist = index.get(p[2])
+        return plist.decode() if within is None else plist.seek_filter(within)
+    if kind == "phrase":
+        docs = within
+        for child in p[3]:
+            docs = execute(child, index, docs)
+            if not len(docs):
+                return docs
+        return _phrase_filter(p[2], docs, index)
+    if kind == "or":
+        parts = [execute(c, index, within) for c in p[2]]
+        return union_postings([_Docs(d) for d in parts])
+    if kind == "not":
+        base = index.universe() if within is None else within
+        if not len(base):
+            return base
+        return difference_postings(base, _Docs(execute(p[2], index, base)))
+    # AND
+    docs = within
+    for child in p[2]:
+        if child[0] == "not":
+            if docs is None:
+                docs = index.universe()
+            docs = difference_postings(docs, _Docs(execute(child[2], index, docs)))
+        else:
+            docs = execute(child, index, docs)
+        if not len(docs):
+            break   # short-circuit: hasil antara kosong
+    return docs
+
+class _Docs:
+    """Adaptor array doc id hasil antara agar bisa dipakai operasi posting list"""
+    def __init__(self, docs):
+        self.docs = np.asarray(docs, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def decode(self):
+        return self.docs
+
+    def seek_filter(self, candidates):
+        return _member_filter(self.docs, candidates)
+
+def _phrase_filter(words, docs, index):
+    """Menyimpan dokumen yang memuat words berurutan (cek posisi)"""
+    if not len(docs):
+        return docs
+    doc_list = docs.tolist()
+    positions = [index.term_positions(w, doc_list) for w in words]
+    keep = []
+    for d in doc_list:
+        starts = set(positions[0][d])
+        for offset, by_doc in enumerate(positions[1:], start=1):
+            starts &= {p - offset for p in by_doc[d]}
+            if not starts:
+                break
+        if starts:
+            keep.append(d)
+    return np.array(keep, dtype=np.int64)
+
+def query_terms(node):
+    """Term positif (bukan di bawah NOT) dari AST, untuk skor/penjelasan hasil"""
+    kind = node[0]
+    if kind == "term":
+        return [node[1]]
+    if kind == "phrase":
+        return list(node[1])
+    if kind == "prefix":
+        return []
+    if kind == "not":
+        return []
+    return [t for c in node[1] for t in query_terms(c)]
+
+def has_phrase(node):
+    if node[0] == "phrase":
+        return True
+    if node[0] in ("and", "or"):
+        return any(has_phrase(c) for c in node[1])
+    if node[0] == "not":
+        return has_phrase(node[1])
+    return False
+
+def search(query, index, default_op="OR"):
+    """Parse + plan + eksekusi; mengembalikan nama file terurut"""
+    p = plan(parse_query(query, default_op), index)
+    return index.names(execute(p, index))
+
+if __name__ == "__main__":
+    from boolean_ir import BooleanIndex
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Query boolean: AND/OR/NOT, (), \"frasa\", prefix*")
+    parser.add_argument("query")
+    parser.add_argument("--op", choices=["AND", "OR"], default="OR", help="operator default antar kata")
+    parser.add_argument("--processed", default=os.path.join(base, "data", "processed"))
+    args = parser.parse_args()
+
+    ast = parse_query(args.query, args.op)
+    index = BooleanIndex.from_processed_dir(args.processed, with_positions=has_phrase(ast))
+    p = plan(ast, index)
+    print(format_plan(p))
+    for name in index.names(execute(p, index)):
+        print(name)
@@ -1,6 +1,11 @@
-import streamlit as st
-from vsm_ir import VSMRetrieval
+import os
 import re
+import streamlit as st
+from search_engine import open_index, load_engine
+from term_matrix import WEIGHTS
+from result_cache import ResultCache
+from doc_store import highlight_html
+import tracing
 
 # pengaturan halaman
 st.set_page_config(page_title="Mini Search Engine", page_icon="🔎")
@@ -58,10 +63,17 @@ st.markdown(DARK if dark else LIGHT, unsafe_allow_html=True)
 # judul
 st.markdown("<h1 style='text-align:center; font-weight:800;'>🔎 Mini Search Engine</h1>", unsafe_allow_html=True)
 
-# muat model
-vsm = VSMRetrieval()
-vsm.load_processed_docs()
-vsm.build_tfidf()
+# muat model: satu matriks tf (dari index mmap jika ada) untuk semua skema bobot,
+# dibagi antar sesi lewat cache_resource; bobot turunan di-cache di dalamnya
+@st.cache_resource
+def load_model():
+    processed_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "processed")
+    engine = load_engine(processed_dir, open_index(processed_dir))
+    # query populer (ayam goreng, rendang, ...) dilayani dari cache hasil
+    engine.result_cache = ResultCache(maxsize=512)
+    return engine
+
+engine = load_model()
 
 # state input
 if "query_text" not in st.session_state:
@@ -92,6 +104,12 @@ if st.session_state.query_text.strip():
 # slider top-k
 k = st.slider("Top-K", 1, 10, 5)
 
+# skema pembobotan
+weight = st.selectbox("Pembobotan", WEIGHTS, index=0)
+
+# panel debug: rincian waktu per tahap query (nonaktif = tanpa overhead)
+debug = st.sidebar.checkbox("🐞 Debug: profil query", False)
+
 # pencarian otomatis (enter)
 run = bool(st.session_state.query_text.strip())
 
@@ -109,8 +127,11 @@ def detect_category(f):
     if any(x in f for x in ["mie","nasi"]): return "🍜 Karbohidrat"
     return "🍽️ Makanan"
 
-# highlight kata
-def highlight(text, query):
+# highlight kata: span dari doc store jika ada, selain itu regex per kata query
+def highlight(result, query):
+    if "highlights" in result:
+        return highlight_html(result["snippet"], result["highlights"])
+    text = result["snippet"]
     for w in query.split():
         text = re.sub(
             rf"(\b{re.escape(w)}\b)",
@@ -126,12 +147,22 @@ def file_link(fname):
 
 # tampilkan hasil
 if run:
-    results = vsm.rank(st.session_state.query_text, k=k)
+    if debug:
+        with tracing.trace("search") as trace:
+            results = engine.rank(st.session_state.query_text, k=k, weight=weight)
+        with st.sidebar:
+            st.markdown(f"**Total:** {trace.elapsed() * 1000:.3f} ms")
+            st.table([{"tahap": "  " * sp["depth"] + sp["name"], "ms": sp["ms"]} for sp in trace.to_dict()["spans"]])
+            st.json(dict(trace.counters, **(engine.last_query_stats or {})))
+            if engine.result_cache is not None:
+                st.caption(f"cache: {engine.result_cache.stats()}")
+    else:
+        results = engine.rank(st.session_state.query_text, k=k, weight=weight)
     st.markdown("<h2 class='fade-in'>📌 Hasil Pencarian</h2>", unsafe_allow_html=True)
 
     for r in results:
         cat = detect_category(r["doc_id"])
-        snippet = highlight(r["snippet"], st.session_state.query_text)
+        snippet = highlight(r, st.session_state.query_text)
         link = file_link(r["doc_id"])
 
         st.markdown(
@@ -0,0 +1,253 @@
+# src/doc_store.py
+# Doc store: teks mentah semua dokumen dalam satu blob UTF-8 (mmap) + token hasil
+# preprocessing dengan offset byte ke teks mentah. Snippet dibuat per query
+# (jendela token dengan kata query terbanyak) beserta posisi highlight, tanpa
+# membuka file per hasil dan tanpa menyimpan dokumen utuh di RAM.
+#
+#   python src/doc_store.py build
+import os
+import re
+import json
+import html
+import time
+import argparse
+import numpy as np
+from packed_store import iter_processed, manifest_generation, corpus_fingerprint
+
+STORE_FORMAT = "stki-doc-store"
+STORE_VERSION = 1
+
+ARRAYS = [
+    "blob",        # uint8: teks mentah semua dokumen (UTF-8) berurutan
+    "doc_ptr",     # int64 [N+1] offset byte dokumen di blob
+    "tok_ptr",     # int64 [N+1] offset token per dokumen
+    "tok_term",    # int32 term id per token (urutan token = data/processed)
+    "tok_start",   # int32 offset byte awal token relatif terhadap dokumen (-1 = tidak ter-align)
+    "tok_end",     # int32 offset byte akhir token
+    "terms",       # kamus term terurut
+    "doc_ids",     # nama file per doc id
+]
+
+_WS_RE = re.compile(r"\s+")
+
+def default_store_dir():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, "data", "index", "docstore")
+
+def align_tokens(tokens, analyzed):
+    """
+    Memetakan token data/processed ke (token, start, end) hasil analyze_with_spans
+    secara berurutan (subsequence). Token yang tidak ditemukan mendapat span (-1, -1).
+    """
+    spans = []
+    j = 0
+    for t in tokens:
+        k = j
+        while k < len(analyzed) and analyzed[k][0] != t:
+            k += 1
+        if k < len(analyzed):
+            spans.append((analyzed[k][1], analyzed[k][2]))
+            j = k + 1
+        else:
+            spans.append((-1, -1))
+    return spans
+
+# MEMBANGUN STORE
+def build_store(raw_dir, processed_dir, store_dir):
+    from preprocess import analyze_with_spans, load_stem_dictionary
+    start = time.perf_counter()
+    load_stem_dictionary()
+    corpus = corpus_fingerprint(processed_dir)
+
+    vocab = {}
+    blobs, doc_ptr, tok_ptr = [], [0], [0]
+    tok_term, tok_start, tok_end = [], [], []
+    unaligned = 0
+    filenames = []
+    for fname, text in iter_processed(processed_dir):
+        filenames.append(fname)
+        tokens = text.split()
+        raw_path = os.path.join(raw_dir, fname)
+        raw = ""
+        if os.path.exists(raw_path):
+            with open(raw_path, encoding="utf-8") as f:
+                raw = f.read()
+        spans = align_tokens(tokens, analyze_with_spans(raw))
+
+        # offset karakter → offset byte
+        data = raw.encode("utf-8")
+        byte_at = np.zeros(len(raw) + 1, dtype=np.int64)
+        byte_at[1:] = np.cumsum([len(c.encode("utf-8")) for c in raw]) if raw else []
+        for t, (s, e) in zip(tokens, spans):
+            tok_term.append(vocab.setdefault(t, len(vocab)))
+            tok_start.append(byte_at[s] if s >= 0 else -1)
+            tok_end.append(byte_at[e] if s >= 0 else -1)
+            unaligned += s < 0
+        blobs.append(data)
+        doc_ptr.append(doc_ptr[-1] + len(data))
+        tok_ptr.append(len(tok_term))
+
+    terms = sorted(vocab)
+    remap = np.empty(len(vocab), dtype=np.int32)
+    for new_id, term in enumerate(terms):
+        remap[vocab[term]] = new_id
+    arrays = {
+        "blob": np.frombuffer(b"".join(blobs), dtype=np.uint8),
+        "doc_ptr": np.array(doc_ptr, dtype=np.int64),
+        "tok_ptr": np.array(tok_ptr, dtype=np.int64),
+        "tok_term": remap[np.array(tok_term, dtype=np.int64)] if tok_term else np.zeros(0, dtype=np.int32),
+        "tok_start": np.array(tok_start, dtype=np.int32),
+        "tok_end": np.array(tok_end, dtype=np.int32),
+        "terms": np.array(terms, dtype=str),
+        "doc_ids": np.array(filenames, dtype=str),
+    }
+    os.makedirs(store_dir, exist_ok=True)
+    for name in ARRAYS:
+        np.save(os.path.join(store_dir, name + ".npy"), arrays[name])
+    meta = {"format": STORE_FORMAT, "version": STORE_VERSION, "n_docs": len(filenames),
+            "n_tokens": len(tok_term), "unaligned_tokens": int(unaligned),
+            "generation": manifest_generation(processed_dir), "raw_dir": os.path.abspath(raw_dir),
+            "corpus": corpus}
+    # meta.json ditulis terakhir: store dianggap valid hanya jika meta ada
+    with open(os.path.join(store_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    print(f"[INFO] Doc store built: {meta['n_docs']} docs, {meta['n_tokens']} tokens "
+          f"({unaligned} unaligned) in {time.perf_counter() - start:.2f}s → {store_dir}")
+    return meta
+
+# MEMBACA STORE
+class DocStore:
+    def __init__(self, store_dir=None, mmap=True):
+        self.store_dir = store_dir or default_store_dir()
+        with open(os.path.join(self.store_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != STORE_FORMAT or self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Format doc store tidak dikenali di {self.store_dir}: "
+                             f"{self.meta.get('format')} v{self.meta.get('version')}")
+        mode = "r" if mmap else None
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(self.store_dir, name + ".npy"), mmap_mode=mode))
+        self.generation = self.meta["generation"]
+
+    @classmethod
+    def open(cls, processed_dir=None, store_dir=None):
+        """Store jika ada dan dibangun dari processed_dir yang belum berubah (sidik korpus sama); selain itu None"""
+        store_dir = store_dir or default_store_dir()
+        if not os.path.exists(os.path.join(store_dir, "meta.json")):
+            return None
+        store = cls(store_dir)
+        if processed_dir is None:
+            return store
+        corpus, current = store.meta.get("corpus"), corpus_fingerprint(processed_dir)
+        if corpus is not None and corpus["processed_dir"] != current["processed_dir"]:
+            return None   # store milik korpus lain
+        if corpus != current:
+            print("[WARN] doc store is stale; rebuild with `python src/doc_store.py build`")
+            return None
+        return store
+
+    def matches(self, doc_ids):
+        """True jika urutan doc id sama dengan ranker (doc id dipakai langsung sebagai indeks)"""
+        return len(doc_ids) == len(self.doc_ids) and all(a == b for a, b in zip(doc_ids, self.doc_ids))
+
+    def _term_ids(self, terms):
+        ids = []
+        for t in terms:
+            i = int(np.searchsorted(self.terms, t))
+            if i < len(self.terms) and self.terms[i] == t:
+                ids.append(i)
+        return np.array(ids, dtype=np.int32)
+
+    def raw_text(self, doc):
+        return self.blob[self.doc_ptr[doc]:self.doc_ptr[doc + 1]].tobytes().decode("utf-8", "replace")
+
+    def snippet(self, doc, query_terms=(), window=24):
+        """
+        Snippet terbaik untuk query: jendela `window` token yang memuat term query
+        berbeda terbanyak (lalu kemunculan terbanyak). Return
+        {"text": str, "highlights": [[start, end], ...]} dengan offset karakter di text.
+        """
+        lo, hi = int(self.tok_ptr[doc]), int(self.tok_ptr[doc + 1])
+        toks = np.asarray(self.tok_term[lo:hi])
+        starts = np.asarray(self.tok_start[lo:hi])
+        ends = np.asarray(self.tok_end[lo:hi])
+        qids = self._term_ids(query_terms)
+        hits = np.flatnonzero(np.isin(toks, qids) & (starts >= 0)) if len(qids) else np.zeros(0, dtype=np.int64)
+
+        first = 0
+        if len(hits):
+            best = None
+            for i, p in enumerate(hits):
+                j = int(np.searchsorted(hits, p + window))
+                score = (len(set(toks[hits[i:j]].tolist())), j - i)
+                if best is None or score > best[0]:
+                    best = (score, int(p))
+            # sedikit konteks sebelum kata query pertama
+            first = max(0, best[1] - window // 6)
+        last = min(len(toks), first + window) - 1
+
+        aligned = np.flatnonzero(starts[first:last + 1] >= 0) + first
+        if not len(aligned):
+            return {"text": "", "highlights": []}
+        byte_lo, byte_hi = int(starts[aligned[0]]), int(ends[aligned[-1]])
+        marks = [(int(starts[i]), int(ends[i])) for i in hits if first <= i <= last]
+
+        base = int(self.doc_ptr[doc])
+        raw = lambda a, b: self.blob[base + a:base + b].tobytes().decode("utf-8", "replace")
+        text = "… " if aligned[0] > 0 else ""
+        highlights = []
+        pos = byte_lo
+        for s, e in marks:
+            if s < pos:
+                continue
+            text += _WS_RE.sub(" ", raw(pos, s))
+            highlights.append([len(text), len(text) + len(raw(s, e))])
+            text += raw(s, e)
+            pos = e
+        text += _WS_RE.sub(" ", raw(pos, byte_hi))
+        if aligned[-1] < len(toks) - 1:
+            text += " …"
+        return {"text": text, "highlights": highlights}
+
+    def top_terms(self, doc, top_n=4):
+        """(term, tf) terbanyak di dokumen, urutan seri = kemunculan pertama (seperti Counter.most_common)"""
+        lo, hi = int(self.tok_ptr[doc]), int(self.tok_ptr[doc + 1])
+        uniq, first, counts = np.unique(np.asarray(self.tok_term[lo:hi]), return_index=True, return_counts=True)
+        order = np.lexsort((first, -counts))[:top_n]
+        return [(str(self.terms[uniq[i]]), int(counts[i])) for i in order]
+
+def highlight_html(text, highlights, tag="mark", style="background:yellow; color:black;"):
+    """Menyisipkan <mark> pada span highlight; teks lain di-escape"""
+    out, pos = [], 0
+    for s, e in highlights or ():
+        out.append(html.escape(text[pos:s]))
+        out.append(f"<{tag} style='{style}'>{html.escape(text[s:e])}</{tag}>")
+        pos = e
+    out.append(html.escape(text[pos:]))
+    return "".join(out)
+
+def main():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Doc store: teks mentah + offset token untuk snippet")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="bangun store dari data/*.txt + data/processed")
+    p_build.add_argument("--raw", default=os.path.join(base, "data"))
+    p_build.add_argument("--processed", default=os.path.join(base, "data", "processed"))
+    p_build.add_argument("--out", default=default_store_dir())
+    p_show = sub.add_parser("snippet", help="tampilkan snippet dokumen untuk query")
+    p_show.add_argument("doc_id")
+    p_show.add_argument("--query", default="")
+    p_show.add_argument("--store", default=default_store_dir())
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        build_store(args.raw, args.processed, args.out)
+    else:
+        store = DocStore(args.store)
+        doc = [str(d) for d in store.doc_ids].index(args.doc_id)
+        snip = store.snippet(doc, args.query.lower().split())
+        print(snip["text"])
+        print(snip["highlights"])
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,17 @@ import os
 import json
 import math
 import numpy as np
-import matplotlib.pyplot as plt
 from collections import Counter, defaultdict
+from term_matrix import TermDocMatrix
+from packed_store import iter_processed
 
 # --- utilities to load processed corpus ---
 def load_corpus_processed(processed_dir):
     filenames = []
     corpus = []
-    for fname in sorted(os.listdir(processed_dir)):
-        if fname.endswith(".txt"):
-            filenames.append(fname)
-            with open(os.path.join(processed_dir, fname), encoding="utf-8") as f:
-                corpus.append(f.read().split())
+    for fname, text in iter_processed(processed_dir):
+        filenames.append(fname)
+        corpus.append(text.split())
     return filenames, corpus
 
 # --- IDF computation ---
@@ -76,9 +75,10 @@ def bm25_score(query_tokens, doc_tokens, bm25_index, k1=1.5, b=0.75):
 
 # --- similarity ---
 def cosine_sim(a, b):
-    if np.linalg.norm(a) == 0 or np.linalg.norm(b) == 0:
+    na, nb = np.linalg.norm(a), np.linalg.norm(b)
+    if na == 0 or nb == 0:
         return 0.0
-    return float(np.dot(a,b) / (np.linalg.norm(a)*np.linalg.norm(b)))
+    return float(np.dot(a,b) / (na*nb))
 
 # --- ranking wrappers ---
 def rank_tfidf(query_tokens, corpus, idf, idx, sublinear=False):
@@ -87,8 +87,8 @@ def rank_tfidf(query_tokens, corpus, idf, idx, sublinear=False):
     scores = [cosine_sim(qvec, dv) for dv in doc_vecs]
     return scores
 
-def rank_bm25(query_tokens, corpus, bm25_index):
-    return [bm25_score(query_tokens, doc, bm25_index) for doc in corpus]
+def rank_bm25(query_tokens, corpus, bm25_index, k1=1.5, b=0.75):
+    return [bm25_score(query_tokens, doc, bm25_index, k1=k1, b=b) for doc in corpus]
 
 # --- evaluation metrics ---
 def precision_at_k(retrieved, relevant, k):
@@ -112,58 +112,145 @@ def apk(retrieved, relevant, k):
             score += hits / i
     return score / min(len(relevant), k) if relevant else 0.0
 
+# --- sparse batched scoring (one shared tf matrix, one product per model) ---
+MODELS = ["tfidf", "tfidf_sublinear", "bm25"]
+
+def tfidf_doc_matrix(matrix, sublinear=False):
+    """
+    term x doc CSR with the same weights as tfidf_vector (smooth idf over the whole
+    vocab), each doc column l2-normalized: the dot product with a normalized query
+    is then the cosine (the 1/len(doc) factor cancels out).
+    """
+    from scipy.sparse import csr_matrix
+    tf = matrix.tf
+    df = np.diff(tf.indptr)
+    idf = np.log((matrix.N + 1) / (df + 1)) + 1
+    f = np.asarray(tf.data, dtype=np.float64)
+    if sublinear:
+        f = 1.0 + np.log(f)
+    data = f * np.repeat(idf, df)
+    norms = np.sqrt(np.bincount(tf.indices, weights=data ** 2, minlength=matrix.N))
+    norms[norms == 0] = 1.0
+    return csr_matrix((data / norms[tf.indices], tf.indices, tf.indptr), shape=tf.shape, copy=False), idf
+
+def query_matrix(queries, term_index, weight, idf=None):
+    """Q x V CSR; tfidf: l2-normalized like tfidf_vector, bm25: term counts (repeated terms count twice)"""
+    from scipy.sparse import csr_matrix
+    rows, cols, vals = [], [], []
+    for q, query in enumerate(queries):
+        counts = Counter(t for t in query.lower().split() if t in term_index)
+        ids = np.array([term_index[t] for t in counts], dtype=np.int64)
+        v = np.array(list(counts.values()), dtype=np.float64)
+        if weight != "bm25" and len(ids):
+            if weight == "tfidf_sublinear":
+                v = 1.0 + np.log(v)
+            v = v * idf[ids]
+            v = v / np.linalg.norm(v)
+        rows.extend([q] * len(ids))
+        cols.extend(ids.tolist())
+        vals.extend(v.tolist())
+    return csr_matrix((vals, (rows, cols)), shape=(len(queries), len(term_index)))
+
+def rank_batch(q_mat, doc_matrix, k, max_bytes=64 * 2**20):
+    """
+    Top-k doc ids per query (Q x k). Scores are densified per chunk of queries
+    (bounded by max_bytes); the order is exactly np.argsort(scores)[::-1], like
+    the per-query loop, so ties land in the same place.
+    """
+    n_docs = doc_matrix.shape[1]
+    chunk = max(1, max_bytes // (8 * max(1, n_docs)))
+    tops = []
+    for start in range(0, q_mat.shape[0], chunk):
+        scores = (q_mat[start:start + chunk] @ doc_matrix).toarray()
+        tops.append(np.argsort(scores, axis=1)[:, ::-1][:, :k])
+    return np.vstack(tops) if tops else np.zeros((0, min(k, n_docs)), dtype=np.int64)
+
+def model_matrices(matrix, queries, term_index, model, k1=1.5, b=0.75, cache=True):
+    """(doc matrix term x doc, query matrix Q x V) for one model"""
+    if model == "bm25":
+        return matrix.weighted("bm25", k1, b, cache=cache), query_matrix(queries, term_index, "bm25")
+    doc_matrix, idf = tfidf_doc_matrix(matrix, sublinear=model == "tfidf_sublinear")
+    return doc_matrix, query_matrix(queries, term_index, model, idf)
+
+# --- metrics vectorized over queries ---
+def relevance_keys(relevant, doc_index):
+    """(query, doc) relevant pairs encoded as q * n_docs + doc, built once per gold set"""
+    n_docs = len(doc_index)
+    return np.array([q * n_docs + doc_index[d] for q, rel in enumerate(relevant) for d in rel if d in doc_index],
+                    dtype=np.int64)
+
+def hits_matrix(top, rel_keys, n_docs):
+    """hits[q, i] = True if the doc at rank i+1 of query q is relevant"""
+    return np.isin(np.arange(len(top), dtype=np.int64)[:, None] * n_docs + top, rel_keys)
+
+def metrics_from_hits(hits, n_relevant, k):
+    """
+    Per-query metrics (arrays of length Q). Sums use cumsum (sequential) so
+    the values match precision_at_k / recall_at_k / apk bit for bit.
+    """
+    n_rel = np.asarray(n_relevant, dtype=np.int64)
+    has_rel = n_rel > 0
+    zeros = np.zeros(len(n_rel))
+    ranks = np.arange(1, hits.shape[1] + 1)
+    discounts = 1.0 / np.log2(ranks + 1)
+    n_hits = hits.sum(axis=1)
+
+    prec_at_i = np.cumsum(hits, axis=1) / ranks
+    ap_sum = np.cumsum(np.where(hits, prec_at_i, 0.0), axis=1)[:, -1] if hits.shape[1] else zeros
+    dcg = np.cumsum(np.where(hits, discounts, 0.0), axis=1)[:, -1] if hits.shape[1] else zeros
+    ideal = np.concatenate([[0.0], np.cumsum(discounts)])[np.minimum(n_rel, hits.shape[1])]
+    first = np.argmax(hits, axis=1)
+    return {
+        "P": n_hits / k,
+        "R": np.divide(n_hits, n_rel, out=zeros.copy(), where=has_rel),
+        "AP": np.divide(ap_sum, np.minimum(n_rel, k), out=zeros.copy(), where=has_rel),
+        "nDCG": np.divide(dcg, ideal, out=zeros.copy(), where=ideal > 0),
+        "RR": np.where(hits.any(axis=1), 1.0 / (first + 1), 0.0),
+    }
+
+def summarize(per_query):
+    """Mean over queries; F1 from the mean precision and recall"""
+    P, R, MAP, NDCG, MRR = (float(np.mean(per_query[name])) if len(per_query[name]) else 0.0
+                            for name in ("P", "R", "AP", "nDCG", "RR"))
+    F1 = (2*P*R/(P+R)) if (P+R)>0 else 0.0
+    return {"Precision@k":P, "Recall@k":R, "F1":F1, "MAP@k":MAP, "nDCG@k":NDCG, "MRR@k":MRR}
+
 # --- run evaluation across gold queries ---
-def evaluate_all(processed_dir, gold_path, k=5):
-    filenames, corpus = load_corpus_processed(processed_dir)
-    df, idf = compute_df_idf(corpus)
-    vocab, idx = build_vocab(corpus)
-    bm25_index = build_bm25_index(corpus)
+def evaluate_all(processed_dir, gold_path, k=5, k1=1.5, b=0.75):
+    matrix = TermDocMatrix.from_processed_dir(processed_dir)
+    term_index = {str(t): i for i, t in enumerate(matrix.terms)}
+    doc_index = {d: i for i, d in enumerate(matrix.doc_ids)}
 
     # load gold
     with open(gold_path, encoding="utf-8") as f:
         gold = json.load(f)
-
-    models = ["tfidf", "tfidf_sublinear", "bm25"]
-    agg = {m: {"P":[], "R":[], "AP":[]} for m in models}
-
-    for query, relevant in gold.items():
-        q_tokens = query.lower().split()  # assume preprocessed queries in gold are simple; if raw, use preprocess_text
-        # TF-IDF
-        scores_tfidf = rank_tfidf(q_tokens, corpus, idf, idx, sublinear=False)
-        ranked_tfidf = [filenames[i] for i in np.argsort(scores_tfidf)[::-1]]
-        scores_sub = rank_tfidf(q_tokens, corpus, idf, idx, sublinear=True)
-        ranked_sub = [filenames[i] for i in np.argsort(scores_sub)[::-1]]
-        scores_b = rank_bm25(q_tokens, corpus, bm25_index)
-        ranked_b = [filenames[i] for i in np.argsort(scores_b)[::-1]]
-
-        for name, ranked in [("tfidf", ranked_tfidf), ("tfidf_sublinear", ranked_sub), ("bm25", ranked_b)]:
-            p = precision_at_k(ranked, relevant, k)
-            r = recall_at_k(ranked, relevant, k)
-            ap = apk(ranked, relevant, k)
-            agg[name]["P"].append(p)
-            agg[name]["R"].append(r)
-            agg[name]["AP"].append(ap)
+    # assume preprocessed queries in gold are simple; if raw, use preprocess_text
+    queries = list(gold.keys())
+    relevant = [gold[q] for q in queries]
+    n_relevant = [len(r) for r in relevant]
+    rel_keys = relevance_keys(relevant, doc_index)
 
     results = {}
-    for m in models:
-        P = float(np.mean(agg[m]["P"])) if agg[m]["P"] else 0.0
-        R = float(np.mean(agg[m]["R"])) if agg[m]["R"] else 0.0
-        MAP = float(np.mean(agg[m]["AP"])) if agg[m]["AP"] else 0.0
-        F1 = (2*P*R/(P+R)) if (P+R)>0 else 0.0
-        results[m] = {"Precision@k":P, "Recall@k":R, "F1":F1, "MAP@k":MAP}
+    for m in MODELS:
+        doc_matrix, q_mat = model_matrices(matrix, queries, term_index, m, k1, b)
+        top = rank_batch(q_mat, doc_matrix, k)
+        per_query = metrics_from_hits(hits_matrix(top, rel_keys, matrix.N), n_relevant, k)
+        results[m] = summarize(per_query)
 
     return results
 
 # --- plotting helper ---
 def plot_results(results, out_path=None):
-    labels = ["Precision@k", "Recall@k", "F1", "MAP@k"]
+    # imported here: evaluate_all / sweep.py do not need matplotlib
+    import matplotlib.pyplot as plt
+    labels = ["Precision@k", "Recall@k", "F1", "MAP@k", "nDCG@k", "MRR@k"]
     models = list(results.keys())
     vals = [[results[m][lab] for lab in labels] for m in models]
 
     x = np.arange(len(labels))
     width = 0.2
 
-    fig, ax = plt.subplots(figsize=(9,5))
+    fig, ax = plt.subplots(figsize=(11,5))
     for i, m in enumerate(models):
         ax.bar(x + (i - (len(models)-1)/2)*width, vals[i], width, label=m)
 
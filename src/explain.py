@@ -0,0 +1,123 @@
+# src/explain.py
+# Penjelasan hasil ranking langsung dari matriks bobot sparse:
+# - top-N term per dokumen: tabel lengkap disimpan bersama model (VSM, BM25); tanpa
+#   tabel, dihitung hanya untuk dokumen yang diminta lalu di-cache
+# - rincian skor per term query: bobot query × bobot dokumen, dicari dengan binary
+#   search di baris sparse → biaya sebanding jumlah nonzero, bukan ukuran kosakata.
+import os
+import numpy as np
+
+TOP_N = 10
+
+def _row_top(cols, vals, n):
+    """n entri terbesar satu baris (hanya bobot > 0); seri diurutkan berdasarkan kolom"""
+    vals = np.asarray(vals)
+    sel = np.flatnonzero(vals > 0)
+    if len(sel) > n:
+        sel = sel[np.argpartition(-vals[sel], n - 1)[:n]]
+    row_cols = np.asarray(cols)[sel]
+    order = np.lexsort((row_cols, -vals[sel]))
+    return row_cols[order], vals[sel][order]
+
+def top_n_per_row(matrix, n=TOP_N):
+    """
+    n entri terbesar tiap baris matriks CSR → (ptr, col, val); seri diurutkan
+    berdasarkan kolom (term id) agar deterministik. Hanya bobot > 0.
+    """
+    matrix = matrix.tocsr()
+    indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+    ptr = np.zeros(matrix.shape[0] + 1, dtype=np.int64)
+    cols, vals = [], []
+    for r in range(matrix.shape[0]):
+        lo, hi = indptr[r], indptr[r + 1]
+        row_cols, row_vals = _row_top(indices[lo:hi], data[lo:hi], n)
+        cols.append(row_cols)
+        vals.append(row_vals)
+        ptr[r + 1] = ptr[r] + len(row_cols)
+    col = np.concatenate(cols).astype(np.int32) if cols else np.zeros(0, dtype=np.int32)
+    val = np.concatenate(vals).astype(np.float64) if vals else np.zeros(0)
+    return ptr, col, val
+
+class Explainer:
+    """
+    matrix: CSR bobot dengan indices terurut per baris. term_major=True untuk
+    term × doc (impact BM25, TermDocMatrix), False untuk doc × term (tfidf_matrix VSM).
+    top: (ptr, col, val) hasil top_n_per_row atas orientasi doc × term; tanpa tabel,
+    top term dihitung per dokumen yang diminta (bukan untuk semua dokumen).
+    """
+    def __init__(self, matrix, terms, term_major, top=None, top_n=TOP_N):
+        if not matrix.has_sorted_indices:
+            matrix = matrix.sorted_indices()
+        self.matrix = matrix
+        self.terms = terms
+        self.term_major = term_major
+        self.top_n = top_n
+        self.top = top
+        self._doc_major = None
+        self._doc_top = {}           # doc → (term ids, bobot) jika tabel top tidak ada
+
+    def doc_major(self):
+        """Orientasi doc × term (CSR); untuk matriks term-major ditranspos sekali"""
+        if not self.term_major:
+            return self.matrix
+        if self._doc_major is None:
+            self._doc_major = self.matrix.T.tocsr()
+        return self._doc_major
+
+    def top_terms(self, doc, top_n=5):
+        if self.top is not None:
+            ptr, term, weight = self.top
+            lo = ptr[doc]
+            hi = min(ptr[doc + 1], lo + top_n)
+            term, weight = term[lo:hi], weight[lo:hi]
+        else:
+            if doc not in self._doc_top:
+                m = self.doc_major()
+                lo, hi = m.indptr[doc], m.indptr[doc + 1]
+                self._doc_top[doc] = _row_top(m.indices[lo:hi], m.data[lo:hi], self.top_n)
+            term, weight = self._doc_top[doc]
+            term, weight = term[:top_n], weight[:top_n]
+        return [(str(self.terms[t]), float(w)) for t, w in zip(term, weight)]
+
+    def weight(self, doc, term):
+        """Bobot dokumen untuk satu term (0 jika tidak ada): binary search di baris sparse"""
+        row, col = (term, doc) if self.term_major else (doc, term)
+        lo, hi = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        i = lo + int(np.searchsorted(self.matrix.indices[lo:hi], col))
+        if i < hi and self.matrix.indices[i] == col:
+            return float(self.matrix.data[i])
+        return 0.0
+
+    def contributions(self, doc, term_ids, query_weights):
+        """Rincian skor per term query: kontribusi = bobot query × bobot dokumen (jumlahnya = skor)"""
+        out = []
+        for t, q in zip(term_ids, query_weights):
+            w = self.weight(doc, int(t))
+            out.append({"term": str(self.terms[t]), "query_weight": float(q),
+                        "doc_weight": w, "contribution": float(q) * w})
+        out.sort(key=lambda c: -c["contribution"])
+        return out
+
+    def explain(self, doc, term_ids, query_weights, top_n=5):
+        contributions = self.contributions(doc, term_ids, query_weights)
+        return {"score": sum(c["contribution"] for c in contributions),
+                "contributions": contributions,
+                "top_terms": self.top_terms(doc, top_n)}
+
+    # SIMPAN / MUAT tabel top-N bersama model
+    def save_top(self, path):
+        if self.top is None:
+            self.top = top_n_per_row(self.doc_major(), self.top_n)
+        for name, arr in zip(("top_ptr", "top_term", "top_weight"), self.top):
+            np.save(os.path.join(path, name + ".npy"), arr)
+
+def load_top(path, mmap=True):
+    """Tabel top-N yang disimpan model; None jika belum ada (dihitung saat dibutuhkan)"""
+    names = ("top_ptr", "top_term", "top_weight")
+    if not all(os.path.exists(os.path.join(path, n + ".npy")) for n in names):
+        return None
+    mode = "r" if mmap else None
+    return tuple(np.load(os.path.join(path, n + ".npy"), mmap_mode=mode) for n in names)
+
+def format_contributions(contributions):
+    return ", ".join(f"{c['term']}={c['contribution']:.4f}" for c in contributions)
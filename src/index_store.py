@@ -0,0 +1,376 @@
+# src/index_store.py
+# Index terbalik posisional di disk: dibangun sekali (`python src/index_store.py build`)
+# lalu dibuka dengan mmap saat query oleh jalur boolean, VSM dan BM25.
+import os
+import json
+import time
+import shutil
+import argparse
+from collections import defaultdict
+import numpy as np
+from packed_store import iter_processed, manifest_generation, corpus_fingerprint
+
+INDEX_FORMAT = "stki-positional-index"
+INDEX_VERSION = 1
+
+# nama array di folder index (masing-masing satu file .npy)
+ARRAYS = [
+    "terms",       # kamus term terurut (unicode fixed-width) → binary search
+    "term_ptr",    # int64 [V+1] offset postings per term
+    "post_docs",   # int32 [P] doc id per posting (terurut per term)
+    "post_tf",     # int32 [P] term frequency per posting
+    "pos_ptr",     # int64 [P+1] offset posisi per posting
+    "positions",   # int32 posisi token dalam dokumen
+    "doc_lens",    # int32 [N] panjang dokumen (jumlah token)
+    "doc_ids",     # nama file per doc id
+    "snippets",    # 120 karakter pertama tiap dokumen
+]
+
+def default_index_dir():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, "data", "index")
+
+# MEMBANGUN INDEX
+def _index_arrays(postings, doc_ids, doc_lens, snippets):
+    """postings (term → [(doc, posisi)]) + data per dokumen → array index (lihat ARRAYS)"""
+    terms = sorted(postings)
+    term_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    post_docs, post_tf, pos_ptr, positions = [], [], [0], []
+    for i, term in enumerate(terms):
+        for doc, pos_list in postings[term]:
+            post_docs.append(doc)
+            post_tf.append(len(pos_list))
+            positions.extend(pos_list)
+            pos_ptr.append(len(positions))
+        term_ptr[i + 1] = len(post_docs)
+    return {
+        "terms": np.array(terms, dtype=str),
+        "term_ptr": term_ptr,
+        "post_docs": np.array(post_docs, dtype=np.int32),
+        "post_tf": np.array(post_tf, dtype=np.int32),
+        "pos_ptr": np.array(pos_ptr, dtype=np.int64),
+        "positions": np.array(positions, dtype=np.int32),
+        "doc_lens": np.array(doc_lens, dtype=np.int32),
+        "doc_ids": np.array(doc_ids, dtype=str),
+        "snippets": np.array(snippets, dtype=str),
+    }
+
+def build_index(processed_dir, index_dir, names=None):
+    """
+    Membangun index posisional dari korpus data/processed (packed store atau *.txt)
+    dan menyimpannya ke index_dir. names: subset dokumen (mis. satu shard, lihat shards.py).
+    """
+    start = time.perf_counter()
+    # sidik diambil sebelum korpus dibaca: perubahan selama build membuat index basi
+    corpus = corpus_fingerprint(processed_dir)
+    postings = defaultdict(list)   # term → [(doc, positions)]
+    filenames = []
+    doc_lens = []
+    snippets = []
+    for doc, (fname, text) in enumerate(iter_processed(processed_dir, names)):
+        text = text.strip()
+        filenames.append(fname)
+        tokens = text.split()
+        doc_positions = defaultdict(list)
+        for pos, token in enumerate(tokens):
+            doc_positions[token].append(pos)
+        for token, pos_list in doc_positions.items():
+            postings[token].append((doc, pos_list))
+        doc_lens.append(len(tokens))
+        snippets.append(text[:120].replace("\n", " "))
+
+    arrays = _index_arrays(postings, filenames, doc_lens, snippets)
+    os.makedirs(index_dir, exist_ok=True)
+    for name in ARRAYS:
+        np.save(os.path.join(index_dir, name + ".npy"), arrays[name])
+
+    total_tokens = int(sum(doc_lens))
+    meta = {
+        "format": INDEX_FORMAT,
+        "version": INDEX_VERSION,
+        "n_docs": len(filenames),
+        "n_terms": len(arrays["terms"]),
+        "n_postings": len(arrays["post_docs"]),
+        "total_tokens": total_tokens,
+        "avgdl": total_tokens / max(1, len(filenames)),
+        "generation": manifest_generation(processed_dir),
+        "processed_dir": os.path.abspath(processed_dir),
+        "corpus": corpus,
+    }
+    # meta.json ditulis terakhir: index dianggap valid hanya jika meta ada
+    with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+
+    print(f"[INFO] Index built: {meta['n_docs']} docs, {meta['n_terms']} terms, "
+          f"{meta['n_postings']} postings in {time.perf_counter() - start:.2f}s → {index_dir}")
+    return meta
+
+# MEMBANGUN INDEX BERTAHAP (memori terbatas)
+class IndexWriter:
+    """
+    Index dari aliran (doc_id, token) tanpa menampung seluruh korpus: dokumen
+    dikumpulkan per segmen (segment_docs), tiap segmen di-spill ke disk sebagai
+    index kecil, lalu finish() menggabungkan semua segmen ke format yang sama
+    dengan build_index. Memori puncak ~ satu segmen + kamus term global.
+    """
+
+    def __init__(self, index_dir, segment_docs=10000, generation=0, source=None):
+        self.index_dir = index_dir
+        self.segment_docs = segment_docs
+        self.generation = generation
+        self.source = source
+        self.seg_dir = os.path.join(index_dir, "_segments")
+        self.segments = []             # (folder, jumlah dokumen)
+        self._postings = defaultdict(list)
+        self._doc_ids, self._doc_lens, self._snippets = [], [], []
+        self.n_docs = 0
+        self.total_tokens = 0
+        os.makedirs(index_dir, exist_ok=True)
+        # index lama tidak valid selama dibangun ulang
+        if os.path.exists(os.path.join(index_dir, "meta.json")):
+            os.remove(os.path.join(index_dir, "meta.json"))
+        shutil.rmtree(self.seg_dir, ignore_errors=True)
+        os.makedirs(self.seg_dir)
+
+    def add(self, doc_id, tokens):
+        doc = len(self._doc_ids)
+        doc_positions = defaultdict(list)
+        for pos, token in enumerate(tokens):
+            doc_positions[token].append(pos)
+        for token, pos_list in doc_positions.items():
+            self._postings[token].append((doc, pos_list))
+        self._doc_ids.append(doc_id)
+        self._doc_lens.append(len(tokens))
+        self._snippets.append(" ".join(tokens)[:120])
+        self.n_docs += 1
+        self.total_tokens += len(tokens)
+        if len(self._doc_ids) >= self.segment_docs:
+            self.spill()
+
+    def spill(self):
+        """Tulis dokumen yang ditampung sebagai satu segmen (doc id lokal segmen)"""
+        if not self._doc_ids:
+            return
+        arrays = _index_arrays(self._postings, self._doc_ids, self._doc_lens, self._snippets)
+        seg = os.path.join(self.seg_dir, f"seg_{len(self.segments):05d}")
+        os.makedirs(seg)
+        for name in ARRAYS:
+            np.save(os.path.join(seg, name + ".npy"), arrays[name])
+        self.segments.append((seg, len(self._doc_ids)))
+        self._postings = defaultdict(list)
+        self._doc_ids, self._doc_lens, self._snippets = [], [], []
+
+    def abort(self):
+        """Buang segmen yang sudah di-spill (pembangunan gagal; index tetap tanpa meta.json)"""
+        shutil.rmtree(self.seg_dir, ignore_errors=True)
+        self.segments = []
+
+    def _load_segment(self, seg):
+        return {name: np.load(os.path.join(seg, name + ".npy"), mmap_mode="r") for name in ARRAYS}
+
+    def _segment_destinations(self, terms, term_ptr):
+        """Per segmen (urut): posisi tiap posting segmen di postings gabungan"""
+        cursor = term_ptr[:-1].copy()
+        for seg, _ in self.segments:
+            s = self._load_segment(seg)
+            g = np.searchsorted(terms, s["terms"])
+            df = np.diff(s["term_ptr"])
+            rows = np.repeat(np.arange(len(df)), df)
+            dest = cursor[g][rows] + (np.arange(len(rows)) - s["term_ptr"][rows])
+            cursor[g] += df
+            yield s, dest
+
+    def finish(self):
+        """Gabungkan segmen → index final (array ditulis lewat memmap, meta.json terakhir)"""
+        start = time.perf_counter()
+        self.spill()
+        segs = [self._load_segment(seg) for seg, _ in self.segments]
+        terms = (np.unique(np.concatenate([s["terms"] for s in segs])) if segs
+                 else np.array([], dtype=str))
+        df = np.zeros(len(terms), dtype=np.int64)
+        for s in segs:
+            df[np.searchsorted(terms, s["terms"])] += np.diff(s["term_ptr"])
+        term_ptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+        n_postings = int(term_ptr[-1])
+        n_positions = int(sum(len(s["positions"]) for s in segs))
+
+        def out(name, dtype, shape):
+            return np.lib.format.open_memmap(os.path.join(self.index_dir, name + ".npy"), mode="w+",
+                                             dtype=dtype, shape=shape)
+
+        np.save(os.path.join(self.index_dir, "terms.npy"), terms)
+        np.save(os.path.join(self.index_dir, "term_ptr.npy"), term_ptr)
+        post_docs = out("post_docs", np.int32, (n_postings,))
+        post_tf = out("post_tf", np.int32, (n_postings,))
+        offset = 0
+        for (s, dest), (_, n) in zip(self._segment_destinations(terms, term_ptr), self.segments):
+            # segmen = rentang doc berurutan → postings per term tetap terurut doc id
+            post_docs[dest] = s["post_docs"] + offset
+            post_tf[dest] = s["post_tf"]
+            offset += n
+        post_docs.flush()
+        pos_ptr = out("pos_ptr", np.int64, (n_postings + 1,))
+        pos_ptr[0] = 0
+        total = 0
+        for lo in range(0, n_postings, 1 << 20):
+            chunk = np.cumsum(post_tf[lo:lo + (1 << 20)], dtype=np.int64) + total
+            pos_ptr[lo + 1:lo + 1 + len(chunk)] = chunk
+            total = int(chunk[-1])
+        positions = out("positions", np.int32, (n_positions,))
+        for s, dest in self._segment_destinations(terms, term_ptr):
+            counts = np.diff(s["pos_ptr"])
+            shift = np.repeat(pos_ptr[dest] - s["pos_ptr"][:-1], counts)
+            positions[shift + np.arange(len(shift))] = s["positions"]
+        for arr in (post_tf, pos_ptr, positions):
+            arr.flush()
+        del post_docs, post_tf, pos_ptr, positions
+
+        # array per dokumen: disambung per segmen tanpa memuat semuanya sekaligus
+        for name, dtype in (("doc_lens", np.int32), ("doc_ids", None), ("snippets", None)):
+            if dtype is None:
+                width = max((s[name].dtype.itemsize // 4 for s in segs), default=1)
+                dtype = f"<U{max(1, width)}"
+            arr = out(name, dtype, (self.n_docs,))
+            lo = 0
+            for s in segs:
+                arr[lo:lo + len(s[name])] = s[name]
+                lo += len(s[name])
+            arr.flush()
+            del arr
+        del segs
+        shutil.rmtree(self.seg_dir, ignore_errors=True)
+
+        meta = {
+            "format": INDEX_FORMAT,
+            "version": INDEX_VERSION,
+            "n_docs": self.n_docs,
+            "n_terms": len(terms),
+            "n_postings": n_postings,
+            "total_tokens": self.total_tokens,
+            "avgdl": self.total_tokens / max(1, self.n_docs),
+            "generation": self.generation,
+            "processed_dir": None,
+            "corpus": None,
+            "source": self.source,
+            "segments": len(self.segments),
+        }
+        with open(os.path.join(self.index_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        print(f"[INFO] Index merged: {meta['n_docs']} docs, {meta['n_terms']} terms, {n_postings} postings "
+              f"from {len(self.segments)} segments in {time.perf_counter() - start:.2f}s → {self.index_dir}")
+        return meta
+
+# MEMBACA INDEX (mmap)
+class IndexReader:
+    """Akses read-only ke index di disk; array dibuka dengan mmap sehingga biaya buka ~konstan"""
+
+    def __init__(self, index_dir=None, mmap=True):
+        self.index_dir = index_dir or default_index_dir()
+        with open(os.path.join(self.index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != INDEX_FORMAT or self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Format index tidak dikenali di {self.index_dir}: "
+                             f"{self.meta.get('format')} v{self.meta.get('version')}")
+        mode = "r" if mmap else None
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(self.index_dir, name + ".npy"), mmap_mode=mode))
+
+        self.N = self.meta["n_docs"]
+        self.avgdl = self.meta["avgdl"]
+        self.generation = self.meta["generation"]
+
+    @staticmethod
+    def exists(index_dir=None):
+        return os.path.exists(os.path.join(index_dir or default_index_dir(), "meta.json"))
+
+    def is_stale(self):
+        """
+        True jika korpus sumber berubah sejak index dibangun: sidik korpus folder processed
+        yang tercatat di meta (bukan folder default) dibandingkan dengan kondisinya sekarang.
+        Index hasil ingest.py (tanpa folder processed) tidak pernah basi.
+        """
+        if self.meta.get("processed_dir", "") is None:
+            return False
+        corpus = self.meta.get("corpus")
+        return corpus is None or corpus != corpus_fingerprint(corpus["processed_dir"])
+
+    def fingerprint(self):
+        """
+        Identitas sumber index untuk artefak turunan (model VSM/BM25/LSI): sidik korpus
+        saat dibangun, atau untuk index hasil ingest folder index + ukuran + waktu tulis.
+        """
+        if self.meta.get("corpus") is not None:
+            return self.meta["corpus"]
+        meta_path = os.path.join(self.index_dir, "meta.json")
+        return {"index_dir": os.path.abspath(self.index_dir), "n_docs": self.N,
+                "n_postings": self.meta["n_postings"], "mtime": os.stat(meta_path).st_mtime_ns}
+
+    # --- kamus term ---
+    def term_id(self, term):
+        i = int(np.searchsorted(self.terms, term))
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return -1
+
+    def prefix_term_ids(self, prefix):
+        """Rentang term id yang diawali prefix (kamus terurut → dua binary search)"""
+        lo = int(np.searchsorted(self.terms, prefix, side="left"))
+        hi = int(np.searchsorted(self.terms, prefix + "\U0010ffff", side="left"))
+        return range(lo, hi)
+
+    def df(self, term):
+        t = self.term_id(term)
+        return 0 if t < 0 else int(self.term_ptr[t + 1] - self.term_ptr[t])
+
+    # --- postings ---
+    def postings(self, term):
+        """(doc_ids, tfs) untuk term; array kosong jika term tidak ada"""
+        t = self.term_id(term) if isinstance(term, str) else term
+        if t < 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+        lo, hi = self.term_ptr[t], self.term_ptr[t + 1]
+        return self.post_docs[lo:hi], self.post_tf[lo:hi]
+
+    def term_positions(self, term):
+        """dict doc → array posisi term di dokumen tersebut"""
+        t = self.term_id(term) if isinstance(term, str) else term
+        if t < 0:
+            return {}
+        lo, hi = self.term_ptr[t], self.term_ptr[t + 1]
+        ptr = self.pos_ptr[lo:hi + 1]
+        return {int(d): self.positions[ptr[i]:ptr[i + 1]] for i, d in enumerate(self.post_docs[lo:hi])}
+
+    def doc_set(self, term):
+        """Himpunan nama file yang mengandung term (format index boolean lama)"""
+        docs, _ = self.postings(term)
+        return {str(self.doc_ids[d]) for d in docs}
+
+    # --- dokumen ---
+    def doc_name(self, doc):
+        return str(self.doc_ids[doc])
+
+    def snippet(self, doc):
+        return str(self.snippets[doc])
+
+# CLI: python src/index_store.py build | info
+def main():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Index terbalik posisional (on-disk, mmap)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="bangun index dari data/processed")
+    p_build.add_argument("--processed", default=os.path.join(base, "data", "processed"))
+    p_build.add_argument("--out", default=default_index_dir())
+    p_info = sub.add_parser("info", help="tampilkan metadata index")
+    p_info.add_argument("--index", default=default_index_dir())
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        build_index(args.processed, args.out)
+    else:
+        start = time.perf_counter()
+        reader = IndexReader(args.index)
+        print(json.dumps(reader.meta, indent=1))
+        print(f"[INFO] opened in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+# src/ingest.py
+# Ingestion streaming: dokumen dibaca lazily dari JSONL (boleh .gz), arsip tar / zip
+# atau folder .txt, dianalisis sebagai generator lalu dimasukkan ke IndexWriter
+# (index_store.py) per batch berukuran tetap. Tiga tahap (baca → analisis → tulis)
+# berjalan di thread terpisah dan dihubungkan queue berkapasitas tetap, sehingga
+# tahap yang cepat tertahan (back-pressure) alih-alih menumpuk dokumen di memori.
+# Memori puncak ~ queue × batch + satu segmen index, berapa pun ukuran korpus.
+#
+#   python src/ingest.py resep.jsonl.gz arsip.tar --out data/index/ingest --workers 4
+#   python src/ingest.py data --out /tmp/idx --analyzer preprocess
+#   python src/search_engine.py --index data/index/ingest --model bm25 --query "ayam goreng"
+import os
+import io
+import gzip
+import json
+import time
+import queue
+import tarfile
+import zipfile
+import argparse
+import threading
+from collections import deque
+from multiprocessing import Pool
+
+from index_store import IndexWriter, default_index_dir
+from sysinfo import peak_rss_mb
+
+ANALYZERS = ("preprocess", "split")
+# field teks yang digabung bila record JSONL tidak punya field "text"
+TEXT_FIELDS = ("title", "judul", "ingredients", "bahan", "steps", "langkah")
+
+# SUMBER DOKUMEN (generator (doc_id, teks), dibaca satu per satu)
+class SkipLog:
+    """Baris/dokumen yang dilewati (JSON rusak, bukan objek, id ganda); beberapa contoh pertama dicetak"""
+
+    def __init__(self, show=10):
+        self.show = show
+        self.counts = {}
+        self.examples = []
+
+    def add(self, kind, where, reason):
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        if len(self.examples) < self.show:
+            self.examples.append(f"{where}: {reason}")
+            print(f"[WARN] dilewati {where}: {reason}")
+
+def _record_text(record, text_fields):
+    parts = []
+    for field in text_fields:
+        value = record.get(field)
+        if isinstance(value, list):
+            parts.extend(str(v) for v in value)
+        elif value is not None:
+            parts.append(str(value))
+    return "\n".join(parts)
+
+def _iter_json_lines(lines, name, id_field, text_fields, skipped=None):
+    """Baris rusak (UTF-8/JSON tidak valid, bukan objek) dilewati dan dicatat di skipped"""
+    skipped = skipped if skipped is not None else SkipLog()
+    for lineno, line in enumerate(lines, 1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+        except ValueError as e:          # UnicodeDecodeError dan JSONDecodeError
+            skipped.add("malformed", f"{name}:{lineno}", str(e))
+            continue
+        if not isinstance(record, dict):
+            skipped.add("malformed", f"{name}:{lineno}", f"bukan objek JSON ({type(record).__name__})")
+            continue
+        fields = text_fields or (("text",) if "text" in record else TEXT_FIELDS)
+        doc_id = record.get(id_field)
+        yield (str(doc_id) if doc_id is not None else f"{name}:{lineno}"), _record_text(record, fields)
+
+def iter_jsonl(path, id_field="id", text_fields=None, skipped=None):
+    """Satu record JSON per baris; doc id dari id_field, fallback nama_file:baris"""
+    # dibaca sebagai bytes: byte UTF-8 rusak hanya menggugurkan barisnya sendiri
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        yield from _iter_json_lines(f, os.path.basename(path), id_field, text_fields, skipped)
+
+def _iter_members(name, fileobj, id_field, text_fields, skipped=None):
+    """Satu anggota arsip: .txt = satu dokumen, .jsonl = banyak dokumen"""
+    if name.endswith(".txt"):
+        yield name, fileobj.read().decode("utf-8")
+    elif name.endswith(".jsonl"):
+        yield from _iter_json_lines(io.BufferedReader(fileobj), name, id_field, text_fields, skipped)
+
+def iter_tar(path, id_field="id", text_fields=None, skipped=None):
+    """Mode stream tar ("r|*"): arsip dibaca berurutan sekali jalan, kompresi gz/bz2/xz otomatis"""
+    with tarfile.open(path, "r|*") as tar:
+        for member in tar:
+            if member.isfile():
+                yield from _iter_members(member.name, tar.extractfile(member), id_field, text_fields, skipped)
+
+def iter_zip(path, id_field="id", text_fields=None, skipped=None):
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if not info.is_dir():
+                with zf.open(info) as f:
+                    yield from _iter_members(info.filename, f, id_field, text_fields, skipped)
+
+def iter_directory(path, id_field="id", text_fields=None, skipped=None):
+    """Folder .txt (terurut nama, seperti preprocess_directory) + .jsonl di dalamnya"""
+    for fname in sorted(os.listdir(path)):
+        full = os.path.join(path, fname)
+        if fname.endswith(".txt"):
+            with open(full, encoding="utf-8") as f:
+                yield fname, f.read()
+        elif fname.endswith((".jsonl", ".jsonl.gz")):
+            yield from iter_jsonl(full, id_field, text_fields, skipped)
+
+def open_source(path, id_field="id", text_fields=None, skipped=None):
+    """Pilih pembaca menurut jenis sumber"""
+    if os.path.isdir(path):
+        return iter_directory(path, id_field, text_fields, skipped)
+    if path.endswith((".jsonl", ".jsonl.gz", ".ndjson")):
+        return iter_jsonl(path, id_field, text_fields, skipped)
+    if path.endswith(".zip"):
+        return iter_zip(path, id_field, text_fields, skipped)
+    if tarfile.is_tarfile(path):
+        return iter_tar(path, id_field, text_fields, skipped)
+    raise ValueError(f"Sumber tidak dikenal: {path} (folder, .jsonl[.gz], .tar[.gz|.bz2|.xz] atau .zip)")
+
+def iter_sources(paths, id_field="id", text_fields=None, skipped=None):
+    """Semua sumber berurutan; doc id yang sudah pernah muncul dilewati (yang pertama dipakai)"""
+    skipped = skipped if skipped is not None else SkipLog()
+    seen = set()
+    for path in paths:
+        for doc_id, text in open_source(path, id_field, text_fields, skipped):
+            if doc_id in seen:
+                skipped.add("duplicate", path, f"doc id ganda {doc_id!r} (dokumen pertama dipakai)")
+                continue
+            seen.add(doc_id)
+            yield doc_id, text
+
+# ANALYZER (per batch; di worker pool untuk workers > 1)
+_analyze = None
+
+def _init_worker(analyzer, stem_dict_path=None):
+    """Initializer pool: analyzer (dan kamus stem) dimuat sekali per proses"""
+    global _analyze
+    if analyzer == "split":
+        _analyze = str.split
+    elif analyzer == "preprocess":
+        import preprocess
+        preprocess._init_worker(stem_dict_path)
+        _analyze = preprocess.analyze
+    else:
+        raise ValueError(f"Analyzer tidak dikenal: {analyzer} (pilihan: {', '.join(ANALYZERS)})")
+
+def _analyze_batch(batch):
+    """[(doc_id, teks)] → ([(doc_id, token)], detik kerja)"""
+    start = time.perf_counter()
+    out = [(doc_id, _analyze(text)) for doc_id, text in batch]
+    return out, time.perf_counter() - start
+
+def _take(docs, n):
+    """n dokumen berikutnya dari generator (kurang dari n di akhir aliran)"""
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= n:
+            break
+    return batch
+
+# PIPELINE
+class StageStats:
+    """Statistik satu tahap: kerja, menunggu input (kelaparan) dan menunggu output penuh (back-pressure)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.docs = 0
+        self.units = 0          # karakter (baca) / token (analisis, tulis)
+        self.busy = 0.0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+        self.elapsed = 0.0
+
+    def to_dict(self, unit):
+        elapsed = max(self.elapsed, 1e-9)
+        return {"docs": self.docs, unit: self.units, "seconds": round(self.elapsed, 3),
+                "busy_s": round(self.busy, 3), "starved_s": round(self.wait_in, 3),
+                "blocked_s": round(self.wait_out, 3), "docs_per_s": round(self.docs / elapsed, 1),
+                f"{unit}_per_s": round(self.units / elapsed, 1)}
+
+class _Stopped(Exception):
+    """Pipeline dihentikan (tahap lain gagal): put/get yang sedang menunggu dibatalkan"""
+
+class _Pipe:
+    """
+    queue.Queue berkapasitas tetap yang mencatat waktu tunggu put/get dan isi maksimum.
+    Selama menunggu, event stop dicek berkala sehingga tahap yang tertahan bisa berhenti.
+    """
+
+    def __init__(self, maxsize, stop):
+        self.q = queue.Queue(maxsize)
+        self.stop = stop
+        self.high_water = 0
+
+    def put(self, item, stats):
+        t0 = time.perf_counter()
+        while True:
+            try:
+                self.q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                if self.stop.is_set():
+                    raise _Stopped()
+        stats.wait_out += time.perf_counter() - t0
+        self.high_water = max(self.high_water, self.q.qsize())
+
+    def get(self, stats):
+        t0 = time.perf_counter()
+        while True:
+            try:
+                item = self.q.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self.stop.is_set():
+                    raise _Stopped()
+        stats.wait_in += time.perf_counter() - t0
+        return item
+
+    def fail(self, error, stats):
+        """Teruskan error ke tahap berikutnya (diabaikan jika pipeline sudah dihentikan)"""
+        try:
+            self.put(_Failed(error), stats)
+        except _Stopped:
+            pass
+
+_DONE = object()
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+def ingest(sources, index_dir=None, analyzer="preprocess", workers=1, batch_size=256, queue_size=8,
+           segment_docs=5000, id_field="id", text_fields=None, stem_dict_path=None, progress_every=10.0):
+    """
+    Baca → analisis → IndexWriter dengan queue terbatas di antara tahap. Return laporan
+    (meta index + statistik per tahap + isi queue maksimum + peak RSS).
+    """
+    index_dir = index_dir or os.path.join(default_index_dir(), "ingest")
+    if stem_dict_path is None:
+        base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        candidate = os.path.join(base, "data", "processed", "stem_dict.json")
+        stem_dict_path = candidate if os.path.exists(candidate) else None
+    read, analyze, write = StageStats("read"), StageStats("analyze"), StageStats("write")
+    skipped = SkipLog()
+    stop = threading.Event()
+    raw_q, token_q = _Pipe(queue_size, stop), _Pipe(queue_size, stop)
+    start = time.perf_counter()
+
+    def reader():
+        try:
+            docs = iter_sources(sources, id_field, text_fields, skipped)
+            while True:
+                t0 = time.perf_counter()
+                batch = _take(docs, batch_size)
+                read.busy += time.perf_counter() - t0
+                if not batch:
+                    break
+                read.docs += len(batch)
+                read.units += sum(len(text) for _, text in batch)
+                raw_q.put(batch, read)
+            raw_q.put(_DONE, read)
+        except _Stopped:
+            pass
+        except Exception as e:
+            raw_q.fail(e, read)
+        read.elapsed = time.perf_counter() - start
+
+    def analyzer_stage():
+        pool = None
+        try:
+            if workers > 1:
+                pool = Pool(workers, initializer=_init_worker, initargs=(analyzer, stem_dict_path))
+            else:
+                _init_worker(analyzer, stem_dict_path)
+            # paling banyak 2 batch per worker sedang dikerjakan; hasil dikirim sesuai urutan input
+            inflight = deque()
+
+            def emit(result):
+                docs, seconds = result
+                analyze.busy += seconds
+                analyze.docs += len(docs)
+                analyze.units += sum(len(tokens) for _, tokens in docs)
+                token_q.put(docs, analyze)
+
+            while True:
+                item = raw_q.get(analyze)
+                if item is _DONE or isinstance(item, _Failed):
+                    break
+                if pool is None:
+                    emit(_analyze_batch(item))
+                    continue
+                inflight.append(pool.apply_async(_analyze_batch, (item,)))
+                while len(inflight) >= 2 * workers:
+                    emit(inflight.popleft().get())
+            while inflight:
+                emit(inflight.popleft().get())
+            token_q.put(item, analyze)
+        except _Stopped:
+            pass
+        except Exception as e:
+            token_q.fail(e, analyze)
+        finally:
+            if pool is not None:
+                if stop.is_set():
+                    pool.terminate()
+                else:
+                    pool.close()
+                pool.join()
+        analyze.elapsed = time.perf_counter() - start
+
+    threads = [threading.Thread(target=reader, daemon=True), threading.Thread(target=analyzer_stage, daemon=True)]
+    for t in threads:
+        t.start()
+
+    writer = IndexWriter(index_dir, segment_docs=segment_docs, source=[os.path.abspath(s) for s in sources])
+    last_report = time.perf_counter()
+    try:
+        while True:
+            item = token_q.get(write)
+            if item is _DONE:
+                break
+            if isinstance(item, _Failed):
+                raise item.error
+            t0 = time.perf_counter()
+            for doc_id, tokens in item:
+                writer.add(doc_id, tokens)
+            write.busy += time.perf_counter() - t0
+            write.docs += len(item)
+            write.units += sum(len(tokens) for _, tokens in item)
+            if progress_every and time.perf_counter() - last_report >= progress_every:
+                last_report = time.perf_counter()
+                print(f"[INFO] {write.docs} docs indexed ({write.docs / (last_report - start):.1f} docs/s), "
+                      f"queues raw={raw_q.q.qsize()}/{queue_size} tokens={token_q.q.qsize()}/{queue_size}")
+    except BaseException:
+        # writer gagal / error tahap lain / Ctrl-C: lepaskan thread yang tertahan di queue dan hentikan pool
+        stop.set()
+        for t in threads:
+            t.join()
+        writer.abort()
+        raise
+    for t in threads:
+        t.join()
+    stream_rss = peak_rss_mb()
+    t0 = time.perf_counter()
+    try:
+        meta = writer.finish()
+    except BaseException:
+        writer.abort()
+        raise
+    merge_seconds = time.perf_counter() - t0
+    write.elapsed = time.perf_counter() - start
+
+    return {
+        "index": meta,
+        "index_dir": index_dir,
+        "seconds": round(time.perf_counter() - start, 3),
+        "merge_seconds": round(merge_seconds, 3),
+        "stages": {"read": read.to_dict("chars"), "analyze": analyze.to_dict("tokens"),
+                   "write": write.to_dict("tokens")},
+        "queues": {"raw": {"capacity": queue_size, "high_water": raw_q.high_water},
+                   "tokens": {"capacity": queue_size, "high_water": token_q.high_water}},
+        "skipped": {"malformed": skipped.counts.get("malformed", 0),
+                    "duplicates": skipped.counts.get("duplicate", 0), "examples": skipped.examples},
+        "settings": {"analyzer": analyzer, "workers": workers, "batch_size": batch_size,
+                     "segment_docs": segment_docs},
+        # merge menulis array final lewat memmap: halaman file yang dipetakan ikut terhitung di RSS
+        "stream_peak_rss_mb": stream_rss,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def format_report(report):
+    lines = [f"[INFO] ingest: {report['index']['n_docs']} docs in {report['seconds']:.2f}s "
+             f"(merge {report['merge_seconds']:.2f}s, {report['index']['segments']} segments), "
+             f"peak RSS {report['stream_peak_rss_mb']} MB streaming / {report['peak_rss_mb']} MB incl. merge"]
+    for name, s in report["stages"].items():
+        unit = "chars" if name == "read" else "tokens"
+        lines.append(f"  {name:<8} {s['docs_per_s']:>10.1f} docs/s {s[unit + '_per_s']:>12.1f} {unit}/s  "
+                     f"busy={s['busy_s']:.2f}s starved={s['starved_s']:.2f}s blocked={s['blocked_s']:.2f}s")
+    queues = ", ".join(f"{n} {q['high_water']}/{q['capacity']}" for n, q in report["queues"].items())
+    lines.append(f"  queue high-water: {queues}")
+    skipped = report.get("skipped")
+    if skipped and (skipped["malformed"] or skipped["duplicates"]):
+        lines.append(f"  skipped: {skipped['malformed']} malformed lines, {skipped['duplicates']} duplicate ids")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion streaming (JSONL / tar / zip / folder) → index on-disk")
+    parser.add_argument("sources", nargs="+", help="folder, .jsonl[.gz], .tar[.gz|.bz2|.xz] atau .zip")
+    parser.add_argument("--out", default=os.path.join(default_index_dir(), "ingest"))
+    parser.add_argument("--analyzer", choices=ANALYZERS, default="preprocess",
+                        help="split: teks sudah berupa token hasil preprocess")
+    parser.add_argument("--workers", type=int, default=1, help="proses analyzer (default 1 = di proses ini)")
+    parser.add_argument("--batch", type=int, default=256, help="dokumen per batch antar tahap")
+    parser.add_argument("--queue", type=int, default=8, help="kapasitas queue antar tahap (batch)")
+    parser.add_argument("--segment-docs", type=int, default=5000, help="dokumen per segmen index sebelum spill")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--text-field", nargs="+", default=None,
+                        help=f"field teks JSONL (default: text, atau {', '.join(TEXT_FIELDS)})")
+    parser.add_argument("--report", default=None, help="simpan laporan throughput sebagai JSON")
+    args = parser.parse_args()
+
+    report = ingest(args.sources, args.out, args.analyzer, args.workers, args.batch, args.queue,
+                    args.segment_docs, args.id_field, args.text_field)
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+if __name__ == "__main__":
+    main()
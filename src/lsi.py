@@ -0,0 +1,439 @@
+# src/lsi.py
+# Latent Semantic Indexing: matriks tfidf (term × doc, TermDocMatrix) difaktorkan offline
+# dengan truncated SVD W ≈ U·Σ·Vᵀ. Embedding dokumen = Uᵀ·d (= Σ·v_d), embedding query =
+# Uᵀ·q (fold-in), skor = cosine di ruang laten. Kata yang sering muncul bersama (sinonim,
+# nama daerah untuk masakan/bahan yang sama) berbagi arah laten, sehingga dokumen tetap
+# terangkat walaupun tidak memuat kata query.
+#
+# Query dilayani index IVF (inverted file): embedding dikelompokkan k-means sferis ke
+# nlist sentroid dan disimpan berurutan per list; query hanya memindai nprobe list dengan
+# sentroid terdekat (nprobe ↑ → recall ↑, latensi ↑). Routing memakai embedding yang
+# dikurangi rata-ratanya: arah laten pertama LSI dimiliki hampir semua dokumen dan tanpa
+# pemusatan k-means menghasilkan list yang sangat timpang. exact=True / nprobe ≥ nlist →
+# scan penuh, dan search_exact_batch → scan penuh berbatch (acuan benchmark recall).
+#
+#   python src/lsi.py build --dim 128 [--dtype int8] [--nlist 64]
+#   python src/lsi.py query --query "ayam goreng" [--nprobe 8 | --exact]
+#   python src/lsi.py bench --nprobe 1 2 4 8 16
+#
+# Layout folder (default data/index/lsi), semua array dibuka mmap:
+#   meta.json                   dim, dtype, nlist, generation, sidik sumber (ditulis terakhir)
+#   terms.npy, idf.npy          kamus + idf tfidf untuk vektorisasi query
+#   proj.npy                    U (term × dim, float32): proyeksi query
+#   emb.npy [+ scale.npy]       embedding dokumen ter-normalisasi l2, urut list IVF
+#                               (float32, atau int8 + skala float32 per baris)
+#   order.npy                   doc id tiap baris emb
+#   centroids.npy, list_ptr.npy sentroid IVF + baris awal tiap list
+#   mean.npy                    rata-rata embedding (pemusatan untuk routing IVF)
+#   doc_ids.npy, snippets.npy
+import os
+import json
+import time
+import argparse
+import numpy as np
+from index_store import IndexReader, default_index_dir
+from term_matrix import TermDocMatrix, vectorize_query
+from topk import top_k_rows
+import tracing
+
+LSI_FORMAT = "stki-lsi"
+LSI_VERSION = 1
+DTYPES = ("float32", "int8")
+
+def default_lsi_dir():
+    return os.path.join(default_index_dir(), "lsi")
+
+# MEMBANGUN INDEX
+def _normalize_rows(x):
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+def _chunk_rows(n_cols, max_bytes, itemsize=4):
+    return max(1, max_bytes // (itemsize * max(1, n_cols)))
+
+def _assign(x, centroids, max_bytes):
+    """Sentroid terdekat (dot product) + kemiripannya untuk tiap baris, dihitung per chunk"""
+    assign = np.zeros(len(x), dtype=np.int64)
+    best = np.zeros(len(x), dtype=np.float32)
+    step = _chunk_rows(len(centroids), max_bytes)
+    for lo in range(0, len(x), step):
+        sims = x[lo:lo + step] @ centroids.T
+        assign[lo:lo + step] = sims.argmax(axis=1)
+        best[lo:lo + step] = sims.max(axis=1)
+    return assign, best
+
+def spherical_kmeans(x, n_clusters, n_iter=20, seed=0, train_per_list=256, max_bytes=64 * 2**20):
+    """
+    k-means pada vektor ter-normalisasi (kemiripan = dot product), dilatih pada sampel
+    maks train_per_list baris per cluster lalu semua baris di-assign. Inisialisasi dari
+    baris acak; cluster kosong diisi ulang dengan baris yang paling jauh dari sentroidnya.
+    Return (sentroid ter-normalisasi float32, assignment per baris).
+    """
+    from scipy.sparse import csr_matrix
+
+    n = len(x)
+    n_clusters = max(1, min(n_clusters, n))
+    rng = np.random.default_rng(seed)
+    train = x if n <= train_per_list * n_clusters else x[np.sort(rng.choice(n, train_per_list * n_clusters,
+                                                                            replace=False))]
+    centroids = np.array(train[rng.choice(len(train), n_clusters, replace=False)], dtype=np.float32)
+    for _ in range(n_iter):
+        assign, best = _assign(train, centroids, max_bytes)
+        # jumlah vektor per cluster lewat matriks one-hot sparse (cluster × baris)
+        members = csr_matrix((np.ones(len(train), dtype=np.float32), (assign, np.arange(len(train)))),
+                             shape=(n_clusters, len(train)))
+        sums = np.asarray(members @ train, dtype=np.float32)
+        empty = np.flatnonzero(np.bincount(assign, minlength=n_clusters) == 0)
+        if len(empty):
+            sums[empty] = train[np.argsort(best, kind="stable")[:len(empty)]]
+        new = _normalize_rows(sums).astype(np.float32)
+        converged = np.allclose(new, centroids, atol=1e-6)
+        centroids = new
+        if converged:
+            break
+    return centroids, _assign(x, centroids, max_bytes)[0]
+
+def quantize_int8(x):
+    """Kuantisasi simetris per baris: x ≈ q · scale, q ∈ [-127, 127]"""
+    scale = np.abs(x).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    q = np.round(x / scale[:, None]).astype(np.int8)
+    return q, scale.astype(np.float32)
+
+def build_lsi(engine, dim=128, dtype="float32", nlist=None, n_iter=4, seed=0):
+    """
+    Truncated SVD (randomized) atas matriks tfidf engine → array index LSI + meta.
+    nlist default ≈ √N; dim dibatasi rank maksimum matriks.
+    """
+    from sklearn.utils.extmath import randomized_svd
+
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype tidak dikenal: {dtype} (pilihan: {', '.join(DTYPES)})")
+    W = engine.weighted("tfidf")
+    dim = max(1, min(dim, min(W.shape) - 1))
+    with tracing.span("svd"):
+        U, S, Vt = randomized_svd(W, dim, n_iter=n_iter, random_state=seed)
+    emb = _normalize_rows((S[:, None] * Vt).T).astype(np.float32)
+
+    nlist = nlist or int(round(np.sqrt(engine.N)))
+    mean = emb.mean(axis=0)
+    with tracing.span("kmeans"):
+        centroids, assign = spherical_kmeans(_normalize_rows(emb - mean).astype(np.float32), nlist, seed=seed)
+    # baris diurutkan per list IVF (stabil → dalam list tetap urut doc id)
+    order = np.argsort(assign, kind="stable")
+    list_ptr = np.zeros(len(centroids) + 1, dtype=np.int64)
+    list_ptr[1:] = np.cumsum(np.bincount(assign, minlength=len(centroids)))
+    arrays = {
+        "terms": np.asarray(engine.terms),
+        "idf": np.asarray(engine.tfidf_idf(), dtype=np.float64),
+        "proj": U.astype(np.float32),
+        "order": order.astype(np.int64),
+        "centroids": centroids,
+        "list_ptr": list_ptr,
+        "mean": mean.astype(np.float32),
+        "doc_ids": np.array(engine.doc_ids, dtype=str),
+        "snippets": np.asarray(engine.snippets),
+    }
+    if dtype == "int8":
+        arrays["emb"], arrays["scale"] = quantize_int8(emb[order])
+    else:
+        arrays["emb"] = emb[order]
+    # variansi yang tertangkap: ‖Σ‖² / ‖W‖²_F
+    explained = float((S ** 2).sum() / max(float(W.multiply(W).sum()), 1e-12))
+    meta = {"format": LSI_FORMAT, "version": LSI_VERSION, "n_docs": engine.N, "n_terms": len(engine.terms),
+            "dim": int(dim), "dtype": dtype, "nlist": len(centroids), "seed": seed,
+            "explained_variance": round(explained, 4), "generation": engine.generation, "corpus": engine.corpus}
+    return arrays, meta
+
+def save_lsi(out_dir, arrays, meta):
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, "meta.json")
+    # index tidak valid selama ditulis ulang
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    stale = os.path.join(out_dir, "scale.npy")
+    if "scale" not in arrays and os.path.exists(stale):
+        os.remove(stale)
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, name + ".npy"), arr)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+
+def load_engine(index_dir=None, processed_dir=None):
+    """Matriks tf dari index on-disk jika ada, selain itu scan korpus processed"""
+    if processed_dir is None and IndexReader.exists(index_dir):
+        return TermDocMatrix.from_index(IndexReader(index_dir))
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return TermDocMatrix.from_processed_dir(processed_dir or os.path.join(base, "data", "processed"))
+
+def build(out_dir=None, index_dir=None, processed_dir=None, **params):
+    start = time.perf_counter()
+    engine = load_engine(index_dir, processed_dir)
+    arrays, meta = build_lsi(engine, **params)
+    out_dir = out_dir or default_lsi_dir()
+    save_lsi(out_dir, arrays, meta)
+    print(f"[INFO] LSI index: {meta['n_docs']} docs x {meta['dim']} dim ({meta['dtype']}), "
+          f"{meta['nlist']} lists, explained variance {meta['explained_variance']:.3f} "
+          f"in {time.perf_counter() - start:.2f}s → {out_dir}")
+    return meta
+
+# QUERY
+class LSIIndex:
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        self.terms = arrays["terms"]
+        self.idf = np.asarray(arrays["idf"])
+        self.proj = arrays["proj"]
+        self.emb = arrays["emb"]
+        self.scale = arrays.get("scale")
+        self.order = arrays["order"]
+        self.centroids = np.asarray(arrays["centroids"])
+        self.list_ptr = np.asarray(arrays["list_ptr"])
+        self.mean = np.asarray(arrays["mean"])
+        self.doc_ids = [str(d) for d in arrays["doc_ids"]]
+        self.snippets = arrays["snippets"]
+        self.generation = meta["generation"]
+        self.corpus = meta.get("corpus")
+        self.N = meta["n_docs"]
+        self.nlist = meta["nlist"]
+        self.last_query_stats = None
+
+    @classmethod
+    def load(cls, path=None, mmap=True):
+        path = path or default_lsi_dir()
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != LSI_FORMAT or meta.get("version") != LSI_VERSION:
+            raise ValueError(f"Format index LSI tidak dikenali di {path}: "
+                             f"{meta.get('format')} v{meta.get('version')}")
+        mode = "r" if mmap else None
+        names = ["terms", "idf", "proj", "emb", "order", "centroids", "list_ptr", "mean", "doc_ids", "snippets"]
+        if meta["dtype"] == "int8":
+            names.append("scale")
+        return cls({n: np.load(os.path.join(path, n + ".npy"), mmap_mode=mode) for n in names}, meta)
+
+    @staticmethod
+    def exists(path=None):
+        return os.path.exists(os.path.join(path or default_lsi_dir(), "meta.json"))
+
+    @classmethod
+    def open(cls, source, make_engine, path=None, **params):
+        """
+        Index tersimpan jika dibangun dari sumber yang sama dan belum berubah (source: sidik
+        korpus atau IndexReader.fingerprint); selain itu make_engine() → TermDocMatrix
+        difaktorkan di memori. Engine hanya dimuat jika index tersimpan tidak bisa dipakai.
+        """
+        if cls.exists(path):
+            lsi = cls.load(path)
+            if lsi.corpus == source:
+                return lsi
+            print("[WARN] saved LSI index is stale or built from another corpus; "
+                  "rebuild with `python src/lsi.py build`")
+        engine = make_engine()
+        with tracing.span("build_lsi"):
+            return cls(*build_lsi(engine, **params))
+
+    def embed(self, query):
+        """Query tfidf (sama dengan skema tfidf TermDocMatrix) → Uᵀ·q ter-normalisasi; nol jika tak ada term dikenal"""
+        ids, vals = vectorize_query(query, self.terms, "tfidf", lambda: self.idf)
+        q = np.zeros(self.proj.shape[1], dtype=np.float32)
+        if len(ids):
+            q = (vals.astype(np.float32) @ np.asarray(self.proj[ids])).astype(np.float32)
+            norm = np.linalg.norm(q)
+            if norm > 0:
+                q /= norm
+        return q
+
+    def _scores(self, lo, hi, Q):
+        """Skor baris emb[lo:hi] terhadap query (dim) atau matriks query (dim × q)"""
+        block = self.emb[lo:hi]
+        if self.scale is None:
+            return block @ Q
+        s = block.astype(np.float32) @ Q
+        scale = np.asarray(self.scale[lo:hi])
+        return s * (scale if s.ndim == 1 else scale[:, None])
+
+    def _scan(self, ranges, q, step=1 << 16):
+        """Skor query untuk rentang baris [(lo, hi)], per potongan step baris (salinan int8→float32 terbatas)"""
+        parts = [self._scores(a, min(hi, a + step), q) for lo, hi in ranges for a in range(lo, hi, step)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def _top(self, scores, rows, k):
+        """k skor tertinggi; seri diurutkan doc id (hasil IVF dan exact sebanding)"""
+        docs = self.order[rows]
+        if len(scores) > k:
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = np.flatnonzero(scores >= kth)
+            scores, docs = scores[keep], docs[keep]
+        pick = np.lexsort((docs, -scores))[:k]
+        return [(int(docs[i]), float(scores[i])) for i in pick]
+
+    def search(self, query, k=5, nprobe=8, exact=False):
+        """[(doc, skor)] top-k; nprobe list IVF terdekat, atau scan penuh jika exact / nprobe ≥ nlist"""
+        with tracing.span("analyze"):
+            q = self.embed(query)
+        if not q.any():
+            self.last_query_stats = {"n_docs": self.N, "scored": 0, "pruned": self.N, "mode": "lsi"}
+            return []
+        with tracing.span("score"):
+            if exact or nprobe >= self.nlist:
+                n_probed = self.nlist
+                ranges = [(0, len(self.order))]
+                mode = "lsi-exact"
+            else:
+                n_probed = max(1, nprobe)
+                probe = np.argsort(-(self.centroids @ (q - self.mean)), kind="stable")[:n_probed]
+                ranges = [(int(self.list_ptr[l]), int(self.list_ptr[l + 1])) for l in probe]
+                mode = f"lsi-ivf(nprobe={n_probed})"
+            scores = self._scan(ranges, q)
+            rows = np.concatenate([np.arange(lo, hi) for lo, hi in ranges])
+        with tracing.span("sort"):
+            top = self._top(np.asarray(scores), rows, k)
+        self.last_query_stats = {"n_docs": self.N, "scored": len(rows), "pruned": self.N - len(rows),
+                                 "mode": mode, "lists_probed": n_probed}
+        tracing.count("docs_scored", len(rows))
+        tracing.count("lists_probed", n_probed)
+        return top
+
+    def search_exact_batch(self, queries, k=5, max_bytes=64 * 2**20):
+        """
+        Scan penuh untuk banyak query sekaligus: matriks query (dim × q) dikalikan dengan
+        emb per chunk baris (memori skor dibatasi max_bytes); top-k chunk digabung dengan
+        top-k berjalan. Return list [(doc, skor)] per query.
+        """
+        Q = np.stack([self.embed(q) for q in queries], axis=1) if queries else np.zeros((self.proj.shape[1], 0))
+        n_rows, n_q = len(self.order), Q.shape[1]
+        best_rows = np.zeros((n_q, 0), dtype=np.int64)
+        best_scores = np.zeros((n_q, 0), dtype=np.float32)
+        step = _chunk_rows(n_q, max_bytes)
+        for lo in range(0, n_rows, step):
+            hi = min(n_rows, lo + step)
+            scores = np.concatenate([best_scores, self._scores(lo, hi, Q).T], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(lo, hi), (n_q, hi - lo))], axis=1)
+            top = top_k_rows(scores, k)
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+        results = []
+        for qi in range(n_q):
+            if not Q[:, qi].any():
+                results.append([])
+                continue
+            results.append(self._top(best_scores[qi], best_rows[qi], k))
+        return results
+
+    def rank(self, query, k=5, nprobe=8, exact=False):
+        return [{"doc_id": self.doc_ids[d], "score": score, "snippet": str(self.snippets[d])}
+                for d, score in self.search(query, k, nprobe, exact)]
+
+# BENCHMARK RECALL
+def bench(lsi, queries, k=10, nprobes=(1, 2, 4, 8, 16), reference=None):
+    """
+    Recall@k IVF terhadap scan penuh berbatch + latensi per query. reference: index LSI
+    lain atas korpus yang sama (mis. float32) sebagai acuan → ikut mengukur kehilangan
+    akibat kuantisasi int8.
+    """
+    from benchmark import percentiles
+
+    start = time.perf_counter()
+    truth = lsi.search_exact_batch(queries, k)
+    batch_ms = (time.perf_counter() - start) * 1000 / max(1, len(queries))
+    if reference is not None:
+        if reference.doc_ids != lsi.doc_ids:
+            raise ValueError("index acuan berisi dokumen yang berbeda")
+        truth = reference.search_exact_batch(queries, k)
+    keep = [i for i, t in enumerate(truth) if t]
+    report = {"queries": len(keep), "k": k, "n_docs": lsi.N, "dim": lsi.proj.shape[1], "dtype": lsi.meta["dtype"],
+              "nlist": lsi.nlist, "reference": reference.meta["dtype"] if reference is not None else "exact",
+              "exact_batch_ms_per_query": round(batch_ms, 4), "runs": []}
+    for nprobe in list(nprobes) + ["exact"]:
+        exact = nprobe == "exact"
+        samples, recalls, scored = [], [], []
+        for i in keep:
+            t0 = time.perf_counter()
+            got = lsi.search(queries[i], k, 0 if exact else nprobe, exact)
+            samples.append((time.perf_counter() - t0) * 1000)
+            expected = {d for d, _ in truth[i]}
+            recalls.append(len(expected & {d for d, _ in got}) / len(expected))
+            scored.append(lsi.last_query_stats["scored"])
+        report["runs"].append({"nprobe": nprobe, "recall": round(float(np.mean(recalls)), 4) if recalls else None,
+                               "scored_frac": round(float(np.mean(scored)) / max(1, lsi.N), 4) if scored else None,
+                               "latency": percentiles(samples)})
+    return report
+
+def format_bench(report):
+    lines = [f"[BENCH] LSI {report['n_docs']} docs x {report['dim']} dim ({report['dtype']}), "
+             f"{report['nlist']} lists, {report['queries']} queries, recall@{report['k']} vs {report['reference']}; "
+             f"exact batch {report['exact_batch_ms_per_query']:.4f} ms/query"]
+    for run in report["runs"]:
+        lat = run["latency"]
+        if not lat.get("n"):
+            continue
+        lines.append(f"  nprobe={str(run['nprobe']):<6} recall={run['recall']:.4f} scored={run['scored_frac'] * 100:5.1f}% "
+                     f"p50={lat['p50_ms']:.4f}ms p95={lat['p95_ms']:.4f}ms qps={lat['qps']}")
+    return "\n".join(lines)
+
+def _bench_queries(lsi, n, seed, gold_path):
+    """Query gold.json (jika ada) + query sintetis dari kosakata index (benchmark.generate_queries)"""
+    from benchmark import generate_queries
+
+    queries = []
+    if gold_path and os.path.exists(gold_path):
+        with open(gold_path, "r", encoding="utf-8") as f:
+            queries.extend(json.load(f))
+    # df dikembalikan dari idf smooth: idf = ln((1+N)/(1+df)) + 1; term tanpa idf (0) tidak dipilih sebagai kepala
+    idf = np.asarray(lsi.idf)
+    df = np.where(idf > 0, (1 + lsi.N) * np.exp(1 - idf) - 1, 0.0)
+    queries.extend(" ".join(q) for q in generate_queries(lsi.terms, df, n, seed))
+    return queries
+
+def main():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Latent semantic index (truncated SVD) + ANN IVF")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="SVD matriks tfidf + k-means IVF, simpan ke disk")
+    p_build.add_argument("--index", default=None, help="index on-disk sumber (default data/index jika ada)")
+    p_build.add_argument("--processed", default=None, help="scan folder processed, bukan index on-disk")
+    p_build.add_argument("--out", default=default_lsi_dir())
+    p_build.add_argument("--dim", type=int, default=128)
+    p_build.add_argument("--dtype", choices=DTYPES, default="float32")
+    p_build.add_argument("--nlist", type=int, default=None, help="jumlah list IVF (default √N)")
+    p_build.add_argument("--n-iter", type=int, default=4, help="iterasi power randomized SVD")
+    p_build.add_argument("--seed", type=int, default=0)
+    p_query = sub.add_parser("query", help="query ke index LSI")
+    p_query.add_argument("--lsi", default=default_lsi_dir())
+    p_query.add_argument("--query", required=True)
+    p_query.add_argument("--k", type=int, default=5)
+    p_query.add_argument("--nprobe", type=int, default=8)
+    p_query.add_argument("--exact", action="store_true", help="scan penuh, tanpa IVF")
+    p_bench = sub.add_parser("bench", help="recall@k dan latensi IVF vs scan penuh")
+    p_bench.add_argument("--lsi", default=default_lsi_dir())
+    p_bench.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    p_bench.add_argument("--queries", type=int, default=500)
+    p_bench.add_argument("--k", type=int, default=10)
+    p_bench.add_argument("--seed", type=int, default=0)
+    p_bench.add_argument("--gold", default=os.path.join(base, "data", "gold.json"))
+    p_bench.add_argument("--reference", default=None, help="index LSI acuan (mis. float32 untuk mengukur int8)")
+    p_bench.add_argument("--report", default=None, help="simpan laporan JSON")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        build(args.out, args.index, args.processed, dim=args.dim, dtype=args.dtype, nlist=args.nlist,
+              n_iter=args.n_iter, seed=args.seed)
+    elif args.cmd == "query":
+        lsi = LSIIndex.load(args.lsi)
+        for i, r in enumerate(lsi.rank(args.query, args.k, args.nprobe, args.exact), 1):
+            print(f"{i}. {r['doc_id']:<30} score={r['score']:.4f}")
+        stats = lsi.last_query_stats
+        print(f"[INFO] {stats['mode']}: scored {stats['scored']} / {stats['n_docs']} docs")
+    else:
+        lsi = LSIIndex.load(args.lsi)
+        reference = LSIIndex.load(args.reference) if args.reference else None
+        report = bench(lsi, _bench_queries(lsi, args.queries, args.seed, args.gold), args.k, args.nprobe, reference)
+        print(format_bench(report))
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+# src/packed_store.py
+# Korpus hasil preprocessing dalam satu file data + offset (pengganti ribuan file
+# kecil di data/processed/*.txt). Dokumen dikelompokkan per blok (block_docs);
+# tanpa kompresi blok = byte UTF-8 apa adanya (akses langsung lewat mmap), dengan
+# kompresi tiap blok di-zlib terpisah sehingga akses acak cukup membuka satu blok.
+#
+#   python src/packed_store.py convert                  # data/processed/*.txt → data/processed/packed/
+#   python src/packed_store.py convert --compression zlib --remove-files
+#   python src/packed_store.py cat ayam_geprek.txt
+#
+# Layout folder (default data/processed/packed):
+#   data.bin       blok dokumen berurutan (mentah atau zlib)
+#   doc_ptr.npy    int64 [N+1] offset byte dokumen pada aliran tanpa kompresi
+#   block_ptr.npy  int64 [B+1] offset byte blok di data.bin
+#   doc_ids.npy    nama file per doc id (terurut nama, sama dengan urutan listdir lama)
+#   meta.json      format, kompresi, ukuran blok, generation manifest, digest isi
+#                  (nama + teks dokumen) saat store ditulis (ditulis terakhir)
+#
+# Semua loader memakai iter_processed / read_processed: store dipakai jika ada dan
+# segar (generation sama dengan manifest), selain itu kembali membaca file .txt.
+# Cek basi di jalur query hanya membaca manifest / meta store (tanpa scan folder);
+# scan penuh file .txt hanya dilakukan saat verifikasi eksplisit (enable_verify /
+# `python src/packed_store.py verify`).
+import os
+import json
+import mmap
+import time
+import zlib
+import hashlib
+import shutil
+import argparse
+from array import array
+from collections import OrderedDict
+import numpy as np
+
+STORE_FORMAT = "stki-packed-store"
+STORE_VERSION = 1
+STORE_DIRNAME = "packed"
+COMPRESSIONS = ("none", "zlib")
+
+def default_packed_dir(processed_dir):
+    return os.path.join(processed_dir, STORE_DIRNAME)
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+_MANIFESTS = {}   # path manifest → (mtime, {"generation", "corpus_digest"})
+
+def _manifest_head(processed_dir):
+    """generation + corpus_digest manifest; dibaca ulang hanya jika mtime manifest berubah"""
+    path = os.path.abspath(os.path.join(processed_dir, "manifest.json"))
+    mtime = _mtime(path)
+    if mtime is None:
+        return None
+    hit = _MANIFESTS.get(path)
+    if hit is None or hit[0] != mtime:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        hit = _MANIFESTS[path] = (mtime, {"generation": manifest.get("generation", 0),
+                                          "corpus_digest": manifest.get("corpus_digest")})
+    return hit[1]
+
+def manifest_generation(processed_dir):
+    """Generation manifest preprocessing (0 jika belum ada manifest)"""
+    head = _manifest_head(processed_dir)
+    return head["generation"] if head is not None else 0
+
+def manifest_digest(files):
+    """Digest daftar nama + sha256 sumber per dokumen (entri manifest["files"]), ditulis saat preprocessing"""
+    h = hashlib.sha256()
+    for name in sorted(files):
+        h.update(f"{name}\t{files[name]['sha256']}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def _packed_meta(processed_dir):
+    path = os.path.join(default_packed_dir(processed_dir), "meta.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+# VERIFIKASI (scan penuh, hanya jika diminta)
+_VERIFY = {"enabled": False, "results": {}}   # folder → daftar masalah (hasil scan, sekali per proses)
+
+def enable_verify(enabled=True):
+    """Aktifkan scan penuh folder processed pada cek basi (mis. `search_engine.py --verify`)"""
+    _VERIFY["enabled"] = enabled
+    _VERIFY["results"].clear()
+
+def _txt_files(processed_dir):
+    """{nama: (ukuran, mtime)} file .txt di processed_dir (scan folder)"""
+    files = {}
+    if os.path.isdir(processed_dir):
+        with os.scandir(processed_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".txt") and entry.is_file():
+                    st = entry.stat()
+                    files[entry.name] = (st.st_size, st.st_mtime_ns)
+    return files
+
+def verify_corpus(processed_dir):
+    """
+    Bandingkan file .txt yang ada dengan yang tercatat saat preprocessing (manifest dan
+    packed store): nama yang hilang/baru, file yang diubah setelah manifest ditulis, dan
+    isi yang berbeda dengan store. Return daftar masalah (kosong = konsisten).
+    """
+    problems = []
+    txt = _txt_files(processed_dir)
+    manifest_path = os.path.join(processed_dir, "manifest.json")
+    recorded = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            recorded = set(json.load(f).get("files", {}))
+        manifest_mtime = _mtime(manifest_path)
+        newer = sorted(n for n, (_, mtime) in txt.items() if mtime > manifest_mtime)
+        if newer:
+            problems.append(f"{len(newer)} file .txt diubah setelah manifest ditulis (mis. {newer[0]})")
+    store = None
+    if PackedStore.exists(default_packed_dir(processed_dir)):
+        store = PackedStore(default_packed_dir(processed_dir))
+        if recorded is None:
+            recorded = set(store.doc_ids)
+    if txt and recorded is not None:
+        missing, extra = sorted(recorded - set(txt)), sorted(set(txt) - recorded)
+        if missing:
+            problems.append(f"{len(missing)} dokumen tercatat tanpa file .txt (mis. {missing[0]})")
+        if extra:
+            problems.append(f"{len(extra)} file .txt tidak tercatat (mis. {extra[0]})")
+    if txt and store is not None:
+        differ = []
+        for doc, name in enumerate(store.doc_ids):
+            if name in txt:
+                with open(os.path.join(processed_dir, name), "rb") as f:
+                    if f.read() != store._bytes(doc):
+                        differ.append(name)
+        if differ:
+            problems.append(f"{len(differ)} file .txt berbeda dengan packed store (mis. {differ[0]})")
+    return problems
+
+def _verified(processed_dir):
+    """Daftar masalah hasil verify_corpus (di-cache per proses); [] jika verifikasi tidak aktif"""
+    if not _VERIFY["enabled"]:
+        return []
+    key = os.path.abspath(processed_dir)
+    if key not in _VERIFY["results"]:
+        problems = _VERIFY["results"][key] = verify_corpus(processed_dir)
+        for problem in problems:
+            print(f"[WARN] {key}: {problem}; artefak turunan dibangun ulang dari file .txt")
+    return _VERIFY["results"][key]
+
+def _scan_digest(processed_dir):
+    h = hashlib.sha256()
+    for name, (size, mtime) in sorted(_txt_files(processed_dir).items()):
+        h.update(f"{name}\t{size}\t{mtime}\n".encode("utf-8"))
+    return "scan:" + h.hexdigest()
+
+def corpus_fingerprint(processed_dir):
+    """
+    Sidik korpus untuk cek basi artefak turunan (index, doc store, model): folder
+    absolut, generation manifest, dan digest yang dicatat saat korpus ditulis —
+    manifest["corpus_digest"] (nama + sha256 sumber), atau digest isi packed store
+    untuk korpus tanpa manifest. Tanpa keduanya dipakai mtime folder (file yang
+    ditambah/dihapus/di-rename terdeteksi, file yang diedit di tempat tidak).
+    Tidak ada scan folder kecuali verifikasi aktif (enable_verify): jika file .txt
+    tidak cocok dengan catatan, digest diganti hasil scan sehingga artefak dibangun ulang.
+    """
+    head = _manifest_head(processed_dir)
+    digest = head["corpus_digest"] if head is not None else None
+    if digest is None:
+        meta = _packed_meta(processed_dir)
+        digest = meta.get("corpus_digest") if meta is not None else None
+    if digest is None:
+        digest = f"dir:{_mtime(processed_dir)}"
+    if _verified(processed_dir):
+        digest = _scan_digest(processed_dir)
+    return {"processed_dir": os.path.abspath(processed_dir),
+            "generation": head["generation"] if head is not None else 0, "digest": digest}
+
+# MENULIS STORE
+class PackedWriter:
+    """
+    Menulis store secara berurutan (memori ~ satu blok + offset); folder sementara
+    menggantikan store lama hanya setelah close() berhasil.
+    """
+
+    def __init__(self, store_dir, compression="none", block_docs=64, generation=0, processed_dir=None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Kompresi tidak dikenal: {compression} (pilihan: {', '.join(COMPRESSIONS)})")
+        self.store_dir = store_dir
+        self.tmp_dir = store_dir.rstrip(os.sep) + ".tmp"
+        self.compression = compression
+        self.block_docs = block_docs
+        self.generation = generation
+        self.processed_dir = processed_dir or os.path.dirname(os.path.abspath(store_dir))
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self._data = open(os.path.join(self.tmp_dir, "data.bin"), "wb")
+        self._digest = hashlib.sha256()
+        self.doc_ptr = array("q", [0])
+        self.block_ptr = array("q", [0])
+        self.doc_ids = []
+        self._block = []
+
+    def add(self, doc_id, text):
+        data = text.encode("utf-8")
+        self._digest.update(f"{doc_id}\t{len(data)}\n".encode("utf-8"))
+        self._digest.update(data)
+        self.doc_ids.append(doc_id)
+        self.doc_ptr.append(self.doc_ptr[-1] + len(data))
+        self._block.append(data)
+        if len(self._block) >= self.block_docs:
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self._block:
+            return
+        data = b"".join(self._block)
+        if self.compression == "zlib":
+            data = zlib.compress(data, 6)
+        self._data.write(data)
+        self.block_ptr.append(self.block_ptr[-1] + len(data))
+        self._block = []
+
+    def close(self):
+        self._flush_block()
+        self._data.close()
+        np.save(os.path.join(self.tmp_dir, "doc_ptr.npy"), np.frombuffer(self.doc_ptr, dtype=np.int64))
+        np.save(os.path.join(self.tmp_dir, "block_ptr.npy"), np.frombuffer(self.block_ptr, dtype=np.int64))
+        np.save(os.path.join(self.tmp_dir, "doc_ids.npy"), np.array(self.doc_ids, dtype=str))
+        meta = {
+            "format": STORE_FORMAT,
+            "version": STORE_VERSION,
+            "n_docs": len(self.doc_ids),
+            "compression": self.compression,
+            "block_docs": self.block_docs,
+            "raw_bytes": int(self.doc_ptr[-1]),
+            "stored_bytes": int(self.block_ptr[-1]),
+            "generation": self.generation,
+            # nama + isi semua dokumen: sidik korpus tanpa manifest (corpus_fingerprint)
+            "corpus_digest": self._digest.hexdigest(),
+        }
+        # meta.json ditulis terakhir: store dianggap valid hanya jika meta ada
+        with open(os.path.join(self.tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+        os.replace(self.tmp_dir, self.store_dir)
+        _OPEN.pop(os.path.abspath(self.store_dir), None)
+        return meta
+
+def convert_directory(processed_dir, store_dir=None, compression="none", block_docs=64, remove_files=False):
+    """data/processed/*.txt → store (generation = manifest saat ini); remove_files menghapus .txt setelahnya"""
+    start = time.perf_counter()
+    store_dir = store_dir or default_packed_dir(processed_dir)
+    filenames = sorted(f for f in os.listdir(processed_dir) if f.endswith(".txt"))
+    writer = PackedWriter(store_dir, compression, block_docs, manifest_generation(processed_dir), processed_dir)
+    for fname in filenames:
+        with open(os.path.join(processed_dir, fname), encoding="utf-8") as f:
+            writer.add(fname, f.read())
+    meta = writer.close()
+    if remove_files:
+        for fname in filenames:
+            os.remove(os.path.join(processed_dir, fname))
+    print(f"[INFO] Packed {meta['n_docs']} docs: {meta['raw_bytes'] / 2**20:.2f} MB → "
+          f"{meta['stored_bytes'] / 2**20:.2f} MB ({compression}) in {time.perf_counter() - start:.2f}s → {store_dir}")
+    return meta
+
+# MEMBACA STORE
+class PackedStore:
+    """Akses read-only: teks per doc id (acak), batch, atau berurutan; data.bin dibuka dengan mmap"""
+
+    def __init__(self, store_dir, mmap_data=True, cache_blocks=8):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != STORE_FORMAT or self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Format store tidak dikenali di {store_dir}: "
+                             f"{self.meta.get('format')} v{self.meta.get('version')}")
+        self.doc_ptr = np.load(os.path.join(store_dir, "doc_ptr.npy"), mmap_mode="r")
+        self.block_ptr = np.load(os.path.join(store_dir, "block_ptr.npy"), mmap_mode="r")
+        self.doc_ids = [str(d) for d in np.load(os.path.join(store_dir, "doc_ids.npy"))]
+        self.N = self.meta["n_docs"]
+        self.generation = self.meta["generation"]
+        self.compressed = self.meta["compression"] != "none"
+        self.block_docs = self.meta["block_docs"]
+        path = os.path.join(store_dir, "data.bin")
+        if mmap_data and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with open(path, "rb") as f:
+                self.data = f.read()
+        self._index = None
+        self._blocks = OrderedDict()   # LRU blok yang sudah didekompresi
+        self.cache_blocks = cache_blocks
+
+    @staticmethod
+    def exists(store_dir):
+        return os.path.exists(os.path.join(store_dir, "meta.json"))
+
+    def is_stale(self, processed_dir):
+        """Basi jika generation manifest berbeda (atau, saat verifikasi aktif, file .txt tidak cocok)"""
+        return manifest_generation(processed_dir) != self.generation or bool(_verified(processed_dir))
+
+    def doc_index(self, doc_id):
+        """nama file → doc id (-1 jika tidak ada)"""
+        if self._index is None:
+            self._index = {d: i for i, d in enumerate(self.doc_ids)}
+        return self._index.get(doc_id, -1)
+
+    def sizes(self):
+        """Ukuran byte tiap dokumen (tanpa kompresi)"""
+        return np.diff(self.doc_ptr)
+
+    def _block(self, b):
+        block = self._blocks.get(b)
+        if block is None:
+            block = zlib.decompress(self.data[int(self.block_ptr[b]):int(self.block_ptr[b + 1])])
+            self._blocks[b] = block
+            if len(self._blocks) > self.cache_blocks:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(b)
+        return block
+
+    def _bytes(self, doc):
+        lo, hi = int(self.doc_ptr[doc]), int(self.doc_ptr[doc + 1])
+        if not self.compressed:
+            return self.data[lo:hi]
+        b = doc // self.block_docs
+        base = int(self.doc_ptr[b * self.block_docs])
+        return self._block(b)[lo - base:hi - base]
+
+    def text(self, doc):
+        return self._bytes(doc).decode("utf-8")
+
+    def tokens(self, doc):
+        return self.text(doc).split()
+
+    def texts(self, docs):
+        """Batch: blok dibaca sekali untuk semua doc di blok yang sama (urutan hasil = urutan docs)"""
+        docs = list(docs)
+        out = [None] * len(docs)
+        for i in sorted(range(len(docs)), key=lambda i: docs[i]):
+            out[i] = self.text(docs[i])
+        return out
+
+    def __iter__(self):
+        """(doc_id, teks) berurutan; tiap blok didekompresi sekali"""
+        for doc in range(self.N):
+            yield self.doc_ids[doc], self.text(doc)
+
+_OPEN = {}   # path store → (mtime meta, PackedStore)
+
+def open_processed(processed_dir):
+    """Store untuk processed_dir jika ada dan segar (lihat PackedStore.is_stale), selain itu None"""
+    store_dir = default_packed_dir(processed_dir)
+    meta_path = os.path.join(store_dir, "meta.json")
+    try:
+        mtime = os.stat(meta_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    key = os.path.abspath(store_dir)
+    cached = _OPEN.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = _OPEN[key] = (mtime, PackedStore(store_dir))
+    store = cached[1]
+    return None if store.is_stale(processed_dir) else store
+
+# AKSES KORPUS (store jika tersedia, fallback file .txt)
+def list_processed(processed_dir):
+    """(nama dokumen terurut, ukuran byte)"""
+    store = open_processed(processed_dir)
+    if store is not None:
+        return list(store.doc_ids), store.sizes().tolist()
+    names = sorted(f for f in os.listdir(processed_dir) if f.endswith(".txt"))
+    return names, [os.path.getsize(os.path.join(processed_dir, f)) for f in names]
+
+def iter_processed(processed_dir, names=None):
+    """Generator (nama, teks) untuk semua dokumen (atau subset names, urutan dipertahankan)"""
+    store = open_processed(processed_dir)
+    if store is not None:
+        if names is None:
+            yield from store
+        else:
+            for name in names:
+                doc = store.doc_index(name)
+                if doc < 0:
+                    raise FileNotFoundError(f"{name} tidak ada di store {store.store_dir}")
+                yield name, store.text(doc)
+        return
+    if names is None:
+        names = sorted(f for f in os.listdir(processed_dir) if f.endswith(".txt"))
+    for name in names:
+        with open(os.path.join(processed_dir, name), encoding="utf-8") as f:
+            yield name, f.read()
+
+def read_processed(processed_dir, name):
+    """Teks satu dokumen; FileNotFoundError jika tidak ada"""
+    store = open_processed(processed_dir)
+    if store is not None:
+        doc = store.doc_index(name)
+        if doc < 0:
+            raise FileNotFoundError(f"{name} tidak ada di store {store.store_dir}")
+        return store.text(doc)
+    with open(os.path.join(processed_dir, name), encoding="utf-8") as f:
+        return f.read()
+
+def main():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    default_processed = os.path.join(base, "data", "processed")
+    parser = argparse.ArgumentParser(description="Packed document store untuk data/processed")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_conv = sub.add_parser("convert", help="konversi folder .txt → store")
+    p_conv.add_argument("--processed", default=default_processed)
+    p_conv.add_argument("--out", default=None, help="default: <processed>/packed")
+    p_conv.add_argument("--compression", choices=COMPRESSIONS, default="none")
+    p_conv.add_argument("--block-docs", type=int, default=64, help="dokumen per blok (unit kompresi)")
+    p_conv.add_argument("--remove-files", action="store_true", help="hapus file .txt setelah dikonversi")
+    p_info = sub.add_parser("info", help="tampilkan metadata store")
+    p_info.add_argument("--processed", default=default_processed)
+    p_verify = sub.add_parser("verify", help="scan file .txt dan bandingkan dengan manifest / store")
+    p_verify.add_argument("--processed", default=default_processed)
+    p_cat = sub.add_parser("cat", help="tampilkan teks dokumen")
+    p_cat.add_argument("doc_id")
+    p_cat.add_argument("--processed", default=default_processed)
+    args = parser.parse_args()
+
+    if args.cmd == "convert":
+        convert_directory(args.processed, args.out, args.compression, args.block_docs, args.remove_files)
+    elif args.cmd == "info":
+        start = time.perf_counter()
+        store = PackedStore(default_packed_dir(args.processed))
+        print(json.dumps(store.meta, indent=1))
+        print(f"[INFO] opened in {(time.perf_counter() - start) * 1000:.2f} ms"
+              f"{' (stale)' if store.is_stale(args.processed) else ''}")
+    elif args.cmd == "verify":
+        problems = verify_corpus(args.processed)
+        for problem in problems:
+            print(f"[WARN] {problem}")
+        if problems:
+            print("Jalankan ulang `python src/preprocess.py` agar manifest dan store sesuai file .txt.")
+            raise SystemExit(1)
+        print(f"[OK] {args.processed} konsisten dengan manifest / store")
+    else:
+        print(read_processed(args.processed, args.doc_id))
+
+if __name__ == "__main__":
+    main()
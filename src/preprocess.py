@@ -1,21 +1,261 @@
 import os
 import re
+import json
 import string
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from Sastrawi.Stemmer.StemmerFactory import StemmerFactory
+import time
+import hashlib
+import argparse
+from collections import OrderedDict
+from multiprocessing import Pool
+
+# Versi analyzer: naikkan jika clean/tokenize/stopword/stemming berubah,
+# sehingga seluruh korpus otomatis diproses ulang pada run berikutnya.
+ANALYZER_VERSION = "1"
+MANIFEST_NAME = "manifest.json"
+STEM_DICT_NAME = "stem_dict.json"
+# artefak analyzer terkompilasi (stopword + kamus stem), dibuat hanya oleh
+# `python src/preprocess.py --compile-analyzer`; preprocess_directory menambah stem baru ke artefak yang ada
+ANALYZER_FORMAT = "stki-analyzer"
+ANALYZER_NAME = "analyzer.json"
+# daftar stopword NLTK 'indonesian' lengkap berisi 758 kata; daftar yang jauh lebih
+# pendek berarti data NLTK tidak lengkap dan tidak boleh dibekukan ke artefak
+MIN_STOPWORDS = 700
+
+def default_analyzer_path():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, "data", "processed", ANALYZER_NAME)
 
 # === Inisialisasi Stemmer dan Stopword Bahasa Indonesia ===
-factory = StemmerFactory()
-stemmer = factory.create_stemmer()
-stop_words = set(stopwords.words('indonesian'))
+# NLTK (~0.7 s import) dan Sastrawi hanya dimuat jika dibutuhkan: stopword dibaca
+# dari artefak analyzer, stemmer dibuat saat kata pertama di luar kamus stem.
+stemmer = None
+stop_words = None
+
+class _SetDictionary:
+    """
+    Pengganti ArrayDictionary Sastrawi: contains() lewat set, bukan scan list
+    ~30 ribu kata dasar (dipanggil puluhan kali per kata yang di-stem).
+    """
+    def __init__(self, words):
+        self.words = {w for w in words if w and w.strip()}
+
+    def contains(self, word):
+        return word in self.words
+
+    def count(self):
+        return len(self.words)
+
+def load_stemmer():
+    """Stemmer Sastrawi dengan kamus kata dasar berbasis set (dibuat sekali per proses)"""
+    global stemmer
+    if stemmer is None:
+        from Sastrawi.Stemmer.StemmerFactory import StemmerFactory
+        from Sastrawi.Stemmer.Stemmer import Stemmer
+        stemmer = Stemmer(_SetDictionary(StemmerFactory().get_words()))
+    return stemmer
+
+def nltk_stopwords() -> set:
+    from nltk.corpus import stopwords
+    return set(stopwords.words('indonesian'))
+
+def load_resources(path: str = None):
+    """Memuat stopword (+ kamus stem) dari artefak analyzer; NLTK hanya jika artefak tidak ada"""
+    global stop_words
+    if stop_words is None and not load_analyzer(path):
+        stop_words = nltk_stopwords()
+
+# CACHE STEMMING
+class StemCache:
+    """
+    Memoisasi Sastrawi: kamus stem dari disk (tidak pernah di-evict) ditambah
+    LRU in-memory berukuran terbatas untuk kata di luar kamus.
+    """
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self.dictionary = {}
+        self._lru = OrderedDict()
+        self._learned = {}
+        self.hits = 0
+        self.misses = 0
+
+    def stem(self, word: str) -> str:
+        root = self.dictionary.get(word)
+        if root is not None:
+            self.hits += 1
+            return root
+        root = self._lru.get(word)
+        if root is not None:
+            self._lru.move_to_end(word)
+            self.hits += 1
+            return root
+        self.misses += 1
+        root = load_stemmer().stem(word)
+        self._lru[word] = root
+        self._learned[word] = root
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+        return root
+
+    def drain_learned(self) -> dict:
+        """Mengambil (lalu mengosongkan) kata yang baru di-stem sejak pemanggilan terakhir"""
+        learned, self._learned = self._learned, {}
+        return learned
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "lru_size": len(self._lru), "dictionary_size": len(self.dictionary)}
+
+    def load(self, path: str) -> bool:
+        """Memuat kamus stem dari disk; diabaikan jika versi analyzer berbeda"""
+        if not os.path.exists(path):
+            return False
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("analyzer_version") != ANALYZER_VERSION:
+            return False
+        self.dictionary.update(data["stems"])
+        return True
+
+    def save(self, path: str, extra: dict = None):
+        """Menyimpan kamus + isi LRU (+ extra, mis. hasil worker) ke disk"""
+        stems = dict(self.dictionary)
+        stems.update(self._lru)
+        if extra:
+            stems.update(extra)
+        data = {"analyzer_version": ANALYZER_VERSION, "stems": stems}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, sort_keys=True)
+        os.replace(tmp_path, path)
+
+stem_cache = StemCache()
+
+def _stopwords_digest(words) -> str:
+    return hashlib.sha256("\n".join(sorted(words)).encode("utf-8")).hexdigest()
+
+def read_analyzer(path: str = None):
+    """
+    Isi artefak analyzer, atau None jika tidak ada / versi berbeda / daftar stopword
+    tidak cocok dengan jumlah & hash yang dicatat saat kompilasi (dengan peringatan).
+    """
+    path = path or default_analyzer_path()
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != ANALYZER_FORMAT or data.get("analyzer_version") != ANALYZER_VERSION:
+        return None
+    words = data.get("stopwords", [])
+    if (data.get("stopwords_count") != len(words) or data.get("stopwords_sha256") != _stopwords_digest(words)
+            or len(words) < MIN_STOPWORDS):
+        print(f"[WARN] artefak analyzer {path} tidak valid ({len(words)} stopword); memakai NLTK. "
+              f"Kompilasi ulang dengan `python src/preprocess.py --compile-analyzer`")
+        return None
+    return data
+
+def load_analyzer(path: str = None) -> bool:
+    """Memuat artefak analyzer: stopword + kamus stem (diabaikan jika tidak valid)"""
+    global stop_words
+    data = read_analyzer(path)
+    if data is None:
+        return False
+    stop_words = set(data["stopwords"])
+    stem_cache.dictionary.update(data["stems"])
+    return True
+
+def _write_analyzer(path: str, words, stems: dict):
+    words = sorted(words)
+    if len(words) < MIN_STOPWORDS:
+        raise ValueError(f"daftar stopword hanya {len(words)} kata (daftar NLTK 'indonesian' lengkap: 758); "
+                         f"pasang data NLTK lengkap: python -m nltk.downloader stopwords")
+    data = {"format": ANALYZER_FORMAT, "analyzer_version": ANALYZER_VERSION, "stopwords": words,
+            "stopwords_count": len(words), "stopwords_sha256": _stopwords_digest(words), "stems": stems}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def save_analyzer(path: str = None, extra: dict = None):
+    """Menulis artefak analyzer: stopword aktif + seluruh stem yang diketahui stem_cache"""
+    stems = dict(stem_cache.dictionary)
+    stems.update(stem_cache._lru)
+    stems.update(extra or {})
+    _write_analyzer(path or default_analyzer_path(), stop_words, stems)
+
+def update_analyzer(path: str, learned: dict) -> bool:
+    """Menambah stem baru ke artefak yang sudah ada dan valid; artefak baru hanya dibuat --compile-analyzer"""
+    data = read_analyzer(path)
+    if data is None or not learned:
+        return False
+    _write_analyzer(path, data["stopwords"], dict(data["stems"], **learned))
+    return True
+
+def compile_analyzer(input_dir: str, path: str = None) -> dict:
+    """
+    Membangun artefak analyzer dari sumbernya: stopword NLTK + stem Sastrawi untuk
+    setiap kata (bukan stopword) di file .txt pada input_dir. Setelah itu analisis
+    dokumen/query berkosakata sama tidak perlu mengimpor NLTK maupun Sastrawi.
+    """
+    global stop_words
+    stop_words = nltk_stopwords()
+    if len(stop_words) < MIN_STOPWORDS:
+        raise ValueError(f"daftar stopword NLTK hanya {len(stop_words)} kata (lengkap: 758); "
+                         f"pasang data NLTK lengkap: python -m nltk.downloader stopwords")
+    words = set()
+    for fname in sorted(os.listdir(input_dir)):
+        if fname.endswith(".txt"):
+            with open(os.path.join(input_dir, fname), "r", encoding="utf-8") as f:
+                words.update(t for t in fast_tokenize(f.read()) if t not in stop_words)
+    start = time.perf_counter()
+    misses = stem_cache.misses
+    for word in sorted(words):
+        stem_cache.stem(word)
+    elapsed = time.perf_counter() - start
+    path = path or default_analyzer_path()
+    save_analyzer(path)
+    return {"path": path, "stopwords": len(stop_words), "words": len(words),
+            "stemmed": stem_cache.misses - misses, "seconds": elapsed}
+
+def load_stem_dictionary(path: str = None) -> bool:
+    """Alias lama: kamus stem untuk analisis query dimuat lewat artefak analyzer (load_resources)"""
+    if path is not None:
+        return load_analyzer(path)
+    load_resources()
+    return bool(stem_cache.dictionary)
+
+load_resources()
+
+# TABEL TRANSLASI (dibangun sekali saat import)
+_PUNCT_TABLE = str.maketrans('', '', string.punctuation)
+
+class _FusedTable(dict):
+    """
+    Tabel str.translate gabungan untuk clean(): angka & tanda baca dihapus,
+    karakter non-ASCII → spasi. Entri non-ASCII diisi lazily saat pertama muncul.
+    """
+    def __missing__(self, code):
+        # re '\d' = digit Unicode (kategori Nd) = str.isdecimal
+        value = None if chr(code).isdecimal() else ord(' ')
+        self[code] = value
+        return value
+
+_FUSED_TABLE = _FusedTable({code: code for code in range(128)})
+_FUSED_TABLE.update(str.maketrans('', '', string.punctuation + string.digits))
+
+# kontraksi yang dipecah word_tokenize (Treebank) pada teks huruf kecil tanpa tanda baca
+_CONTRACTIONS = {
+    "cannot": ("can", "not"), "gimme": ("gim", "me"), "gonna": ("gon", "na"),
+    "gotta": ("got", "ta"), "lemme": ("lem", "me"), "wanna": ("wan", "na"),
+}
 
 # CLEANING TEXT
 def clean(text: str) -> str:
     """Membersihkan teks dari angka, tanda baca, dan ubah ke huruf kecil"""
     text = text.lower()                                # case folding
     text = re.sub(r'\d+', '', text)                    # hapus angka
-    text = text.translate(str.maketrans('', '', string.punctuation))  # hapus tanda baca
+    text = text.translate(_PUNCT_TABLE)                # hapus tanda baca
     text = re.sub(r'[^\x00-\x7f]', ' ', text)          # hapus karakter non-ASCII
     text = re.sub(r'\s+', ' ', text).strip()           # hapus spasi ganda
     return text
@@ -23,8 +263,28 @@ def clean(text: str) -> str:
 # TOKENIZATION 
 def tokenize(text: str) -> list:
     """Memecah teks menjadi token-token kata"""
+    from nltk.tokenize import word_tokenize
     return word_tokenize(text)
 
+# FUSED CLEAN + TOKENIZE
+def fast_tokenize(text: str) -> list:
+    """
+    Setara tokenize(clean(text)) tanpa regex maupun NLTK: case folding +
+    satu str.translate + split. Dokumen yang masih mengandung karakter kontrol
+    ASCII dialihkan ke word_tokenize agar token tetap identik.
+    """
+    words = text.lower().translate(_FUSED_TABLE).split()
+    tokens = []
+    for w in words:
+        if not w.isalpha():
+            return tokenize(" ".join(words))
+        pair = _CONTRACTIONS.get(w)
+        if pair is None:
+            tokens.append(w)
+        else:
+            tokens.extend(pair)
+    return tokens
+
 # STOPWORD REMOVAL
 def remove_stopwords(tokens: list) -> list:
     """Menghapus stopword Bahasa Indonesia"""
@@ -32,50 +292,316 @@ def remove_stopwords(tokens: list) -> list:
 
 # === 4. STEMMING ===
 def stem(tokens: list) -> list:
-    """Melakukan stemming pada setiap token"""
-    return [stemmer.stem(t) for t in tokens]
+    """Melakukan stemming pada setiap token (lewat stem_cache)"""
+    return [stem_cache.stem(t) for t in tokens]
 
 # PIPELINE LENGKAP (bersih → token → hapus stopword → stemming)
 def preprocess_text(text: str) -> list:
+    return analyze(text)
+
+def preprocess_text_reference(text: str) -> list:
+    """Pipeline asli langkah demi langkah (acuan untuk check_parity)"""
     cleaned = clean(text)
     tokens = tokenize(cleaned)
     tokens = remove_stopwords(tokens)
     tokens = stem(tokens)
     return tokens
 
+def analyze(text: str) -> list:
+    """Pipeline cepat: fast_tokenize lalu stopword + stemming dalam satu loop"""
+    stem_word = stem_cache.stem
+    return [stem_word(t) for t in fast_tokenize(text) if t not in stop_words]
+
+_CHUNK_RE = re.compile(r"\S+")
+
+def analyze_with_spans(text: str) -> list:
+    """
+    Seperti analyze(), tetapi tiap token membawa offset karakter (start, end) di
+    teks mentah: bagian huruf ASCII dari potongan non-spasi asalnya (tanpa tanda
+    baca di tepi). Dipakai doc_store untuk snippet dan highlight di teks asli.
+    """
+    stem_word = stem_cache.stem
+    out = []
+    for m in _CHUNK_RE.finditer(text):
+        chunk = m.group()
+        letters = [i for i, c in enumerate(chunk) if c.isascii() and c.isalpha()]
+        if not letters:
+            continue
+        start, end = m.start() + letters[0], m.start() + letters[-1] + 1
+        for t in fast_tokenize(chunk):
+            if t not in stop_words:
+                out.append((stem_word(t), start, end))
+    return out
+
+def analyze_stream(texts):
+    """Generator: menganalisis aliran dokumen satu per satu (memori konstan)"""
+    for text in texts:
+        yield analyze(text)
+
+def check_parity(input_dir: str) -> list:
+    """Membandingkan fast_tokenize dengan tokenize(clean(...)) untuk semua .txt; return file yang berbeda"""
+    mismatches = []
+    for fname in sorted(os.listdir(input_dir)):
+        if fname.endswith(".txt"):
+            with open(os.path.join(input_dir, fname), "r", encoding="utf-8") as f:
+                text = f.read()
+            if fast_tokenize(text) != tokenize(clean(text)):
+                mismatches.append(fname)
+    return mismatches
+
+# WORKER UNTUK MODE PARALEL
+def _init_worker(stem_dict_path=None):
+    """Initializer pool: tiap worker memuat stemmer, stopword & kamus stem tepat sekali"""
+    load_resources()
+    if stem_dict_path:
+        stem_cache.load(stem_dict_path)
+
+def _process_file(input_path):
+    """Membaca satu file, mengembalikan token + kata yang baru di-stem worker ini"""
+    with open(input_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return preprocess_text(text), stem_cache.drain_learned()
+
+# MANIFEST (path → hash, ukuran, mtime, jumlah token, versi analyzer)
+def file_hash(path: str) -> str:
+    """Menghitung sha256 isi file"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_manifest(output_dir: str) -> dict:
+    """Memuat manifest dari folder processed (kosong jika belum ada)"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"analyzer_version": ANALYZER_VERSION, "generation": 0, "files": {}, "removed": {}, "changes": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(output_dir: str, manifest: dict):
+    """Menyimpan manifest secara atomik (tulis file sementara lalu rename)"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def changed_documents(processed_dir: str, since_generation: int = None) -> dict:
+    """Daftar dokumen yang berubah untuk indexer hilir.
+
+    Tanpa since_generation → perubahan pada run terakhir. Dengan since_generation
+    → semua dokumen yang ditambah/diubah/dihapus setelah generasi tersebut.
+    Hasil: {"generation", "changed", "removed"} (nama file di processed_dir).
+    """
+    manifest = load_manifest(processed_dir)
+    generation = manifest.get("generation", 0)
+    if since_generation is None:
+        last = manifest.get("changes", {})
+        changed = sorted(last.get("added", []) + last.get("modified", []))
+        removed = sorted(last.get("removed", []))
+    else:
+        changed = sorted(f for f, e in manifest["files"].items() if e["generation"] > since_generation)
+        removed = sorted(f for f, g in manifest.get("removed", {}).items() if g > since_generation)
+    return {"generation": generation, "changed": changed, "removed": removed}
+
+def _plan_incremental(input_dir, output_dir, filenames, manifest, full, packed=()):
+    """
+    Memisahkan file baru/berubah dari file yang tidak berubah sejak run terakhir.
+    packed: nama dokumen di packed store lama (output yang tidak berupa file .txt).
+    """
+    old_files = {} if full else manifest["files"]
+    todo, unchanged = [], {}
+    for fname in filenames:
+        path = os.path.join(input_dir, fname)
+        st = os.stat(path)
+        old = old_files.get(fname)
+        has_output = fname in packed or os.path.exists(os.path.join(output_dir, fname))
+        if old and has_output and old["size"] == st.st_size and old["mtime"] == st.st_mtime_ns:
+            unchanged[fname] = old
+            continue
+        digest = file_hash(path)
+        if old and has_output and old["sha256"] == digest:
+            # hanya mtime yang berubah (mis. touch / checkout ulang)
+            unchanged[fname] = dict(old, mtime=st.st_mtime_ns)
+            continue
+        todo.append((fname, digest, st))
+    return todo, unchanged
+
 # PROSES SEMUA FILE DALAM FOLDER DATA/
-def preprocess_directory(input_dir: str, output_dir: str):
-    """Memproses semua file .txt di folder data/ dan menyimpannya di data/processed/"""
+def preprocess_directory(input_dir: str, output_dir: str, workers: int = 1, chunksize: int = 16,
+                         full: bool = False, write_files: bool = True, pack: bool = True,
+                         compression: str = "none"):
+    """Memproses semua file .txt di folder data/ dan menyimpannya di data/processed/
+
+    Hanya file baru atau berubah (menurut manifest) yang diproses ulang; output
+    milik file sumber yang sudah dihapus ikut dihapus. full=True memaksa
+    pemrosesan ulang seluruh korpus.
+
+    workers > 1 menjalankan preprocessing di process pool; hasil tetap ditulis
+    berurutan sesuai nama file sehingga output identik dengan mode serial.
+
+    pack=True menulis seluruh korpus ke packed store (data/processed/packed, lihat
+    packed_store.py) yang dibaca semua engine; dokumen yang tidak berubah disalin
+    dari store lama. write_files=False melewati file .txt per dokumen.
+    """
+    from packed_store import PackedWriter, default_packed_dir, open_processed, read_processed, manifest_digest
+
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    total = 0
-    for filename in os.listdir(input_dir):
-        if filename.endswith(".txt"):
-            input_path = os.path.join(input_dir, filename)
-            output_path = os.path.join(output_dir, filename)
+    manifest = load_manifest(output_dir)
+    if manifest.get("analyzer_version") != ANALYZER_VERSION:
+        full = True
 
-            with open(input_path, "r", encoding="utf-8") as f:
-                text = f.read()
+    filenames = sorted(f for f in os.listdir(input_dir) if f.endswith(".txt"))
+    old_store = open_processed(output_dir)
+    # salinan di store hanya dihitung sebagai output jika run ini menulis ulang store;
+    # tanpa store baru (pack=False) store lama menjadi basi, sehingga dokumen yang
+    # hanya ada di store harus diproses ulang ke file .txt
+    packed = set(old_store.doc_ids) if old_store is not None and pack else set()
+    todo, files = _plan_incremental(input_dir, output_dir, filenames, manifest, full, packed)
+    previous = manifest["files"]
+    removed = sorted(set(previous) - set(filenames))
+    generation = manifest.get("generation", 0) + 1
+    # store ditulis ulang hanya jika ada perubahan atau belum ada store yang segar
+    writer = None
+    if pack and (todo or removed or old_store is None):
+        writer = PackedWriter(default_packed_dir(output_dir), compression,
+                              generation=generation if todo or removed else manifest.get("generation", 0))
 
-            processed_tokens = preprocess_text(text)
+    for fname in removed:
+        output_path = os.path.join(output_dir, fname)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        print(f"[DEL] {fname}")
 
-            with open(output_path, "w", encoding="utf-8") as f_out:
-                f_out.write(" ".join(processed_tokens))
+    input_paths = [os.path.join(input_dir, fname) for fname, _, _ in todo]
+    stem_dict_path = os.path.join(output_dir, STEM_DICT_NAME)
+    stem_cache.load(stem_dict_path)
+    learned = {}
 
+    start = time.perf_counter()
+    if workers > 1 and len(todo) > 1:
+        pool = Pool(processes=workers, initializer=_init_worker, initargs=(stem_dict_path,))
+        # imap menjaga urutan hasil sama dengan urutan input
+        results = pool.imap(_process_file, input_paths, chunksize=chunksize)
+    else:
+        pool = None
+        results = map(_process_file, input_paths)
+
+    total = 0
+    total_tokens = 0
+    pending = zip(todo, results)
+    todo_names = {fname for fname, _, _ in todo}
+    try:
+        for filename in filenames:
+            if filename not in todo_names:
+                if writer is not None:
+                    # dokumen tidak berubah: salin dari store lama (atau file .txt)
+                    doc = old_store.doc_index(filename) if old_store is not None else -1
+                    writer.add(filename, old_store.text(doc) if doc >= 0 else read_processed(output_dir, filename))
+                continue
+            (_, digest, st), (processed_tokens, new_stems) = next(pending)
+            learned.update(new_stems)
+            text = " ".join(processed_tokens)
+            if write_files:
+                with open(os.path.join(output_dir, filename), "w", encoding="utf-8") as f_out:
+                    f_out.write(text)
+            if writer is not None:
+                writer.add(filename, text)
+
+            files[filename] = {
+                "sha256": digest,
+                "size": st.st_size,
+                "mtime": st.st_mtime_ns,
+                "tokens": len(processed_tokens),
+                "analyzer_version": ANALYZER_VERSION,
+                "generation": generation,
+            }
             print(f"[OK] {filename:<25} → {len(processed_tokens)} tokens")
             total += 1
+            total_tokens += len(processed_tokens)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if writer is not None:
+        writer.close()
+    elapsed = time.perf_counter() - start
 
-    print(f"\n✅ Semua {total} file di '{input_dir}' berhasil diproses.")
+    added = [f for f, _, _ in todo if f not in previous]
+    modified = [f for f, _, _ in todo if f in previous]
+    tombstones = {f: g for f, g in manifest.get("removed", {}).items() if f not in files}
+    if todo or removed:
+        tombstones.update({f: generation for f in removed})
+        manifest["generation"] = generation
+        manifest["changes"] = {"generation": generation, "added": added, "modified": modified, "removed": removed}
+    manifest["analyzer_version"] = ANALYZER_VERSION
+    manifest["files"] = files
+    # sidik korpus untuk cek basi artefak turunan (packed_store.corpus_fingerprint) tanpa scan folder
+    manifest["corpus_digest"] = manifest_digest(files)
+    manifest["removed"] = tombstones
+    save_manifest(output_dir, manifest)
+    if learned:
+        stem_cache.save(stem_dict_path, extra=learned)
+    update_analyzer(os.path.join(output_dir, ANALYZER_NAME), learned)
+
+    print(f"\n✅ {total} file baru/berubah, {len(removed)} dihapus, "
+          f"{len(filenames) - total} tidak berubah di '{input_dir}'.")
     print(f"Hasil tersimpan di: '{output_dir}'")
+    report_throughput(total, total_tokens, elapsed, workers)
+    if pool is None:
+        print(f"[INFO] stem cache: {stem_cache.stats()}")
+    return {"docs": total, "tokens": total_tokens, "seconds": elapsed,
+            "added": added, "modified": modified, "removed": removed}
+
+def report_throughput(docs, tokens, elapsed, workers=1):
+    """Mencetak throughput preprocessing (dokumen/detik dan token/detik)"""
+    elapsed = max(elapsed, 1e-9)
+    print(f"[INFO] {docs} docs, {tokens} tokens dalam {elapsed:.2f}s "
+          f"({docs / elapsed:.1f} docs/s, {tokens / elapsed:.1f} tokens/s, workers={workers})")
 
 # EKSEKUSI LANGSUNG SAAT FILE DIJALANKAN
 if __name__ == "__main__":
-    base_dir = os.path.dirname(os.path.dirname(__file__))  # naik satu folder dari src/
-    input_dir = os.path.join(base_dir, "data")
-    output_dir = os.path.join(base_dir, "data", "processed")
+    from packed_store import COMPRESSIONS
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # naik satu folder dari src/
+    parser = argparse.ArgumentParser(description="Preprocessing korpus resep")
+    parser.add_argument("--input", default=os.path.join(base_dir, "data"))
+    parser.add_argument("--output", default=os.path.join(base_dir, "data", "processed"))
+    parser.add_argument("--workers", type=int, default=1, help="jumlah proses worker (default 1 = serial)")
+    parser.add_argument("--chunksize", type=int, default=16, help="jumlah file per tugas worker")
+    parser.add_argument("--full", action="store_true", help="abaikan manifest, proses ulang semua file")
+    parser.add_argument("--no-pack", action="store_true", help="jangan tulis packed store (data/processed/packed)")
+    parser.add_argument("--no-files", action="store_true", help="hanya packed store, tanpa satu file .txt per dokumen")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none", help="kompresi per blok packed store")
+    parser.add_argument("--check-parity", action="store_true",
+                        help="cek token analyzer cepat identik dengan pipeline asli, tanpa menulis output")
+    parser.add_argument("--compile-analyzer", action="store_true",
+                        help=f"tulis artefak stopword + kamus stem kosakata --input ke <output>/{ANALYZER_NAME}")
+    args = parser.parse_args()
+
+    input_dir = args.input
+    output_dir = args.output
 
-    if os.path.exists(input_dir):
-        preprocess_directory(input_dir, output_dir)
+    if args.check_parity:
+        bad = check_parity(input_dir)
+        for fname in bad:
+            print(f"[DIFF] {fname}")
+        print(f"{'✅' if not bad else '❌'} parity: {len(bad)} file berbeda di '{input_dir}'")
+        raise SystemExit(1 if bad else 0)
+    elif args.compile_analyzer:
+        try:
+            info = compile_analyzer(input_dir, os.path.join(output_dir, ANALYZER_NAME))
+        except ValueError as e:
+            print(f"❌ artefak analyzer tidak ditulis: {e}")
+            raise SystemExit(1)
+        print(f"✅ {info['path']}: {info['stopwords']} stopword, {info['words']} kata "
+              f"({info['stemmed']} di-stem Sastrawi, {info['seconds']:.2f}s)")
+    elif os.path.exists(input_dir):
+        if args.no_pack and args.no_files:
+            parser.error("--no-pack dan --no-files tidak bisa dipakai bersamaan")
+        preprocess_directory(input_dir, output_dir, workers=args.workers, chunksize=args.chunksize, full=args.full,
+                             write_files=not args.no_files, pack=not args.no_pack, compression=args.compression)
     else:
         print(f"❌ Folder input tidak ditemukan: {input_dir}")
@@ -0,0 +1,82 @@
+# src/result_cache.py
+# Cache hasil ranking di depan ranker (VSM, BM25, matriks bersama, boolean).
+# Kunci = query yang sudah dianalisis (term id + bobot query, atau AST boolean)
+# + model/bobot/parameter; k tidak masuk kunci: permintaan k yang lebih kecil
+# dilayani dari entri k yang lebih besar. Cache dikosongkan otomatis saat
+# generation index berubah.
+import time
+import threading
+from collections import OrderedDict
+import tracing
+
+class ResultCache:
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl                # detik; None = tanpa kedaluwarsa
+        self.generation = None
+        self._entries = OrderedDict() # key → (k, results, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.generation = generation
+
+    def get(self, key, k, generation):
+        """Hasil top-k dari cache, atau None (miss)"""
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            # entri dengan k lebih kecil tidak cukup untuk permintaan ini
+            if entry is None or entry[0] < k:
+                self.misses += 1
+                tracing.count("cache_misses")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            tracing.count("cache_hits")
+            return [dict(r) for r in entry[1][:k]]
+
+    def put(self, key, k, results, generation):
+        with self._lock:
+            self._check_generation(generation)
+            old = self._entries.get(key)
+            if old is not None and old[0] >= k:
+                return
+            expires = time.monotonic() + self.ttl if self.ttl else None
+            self._entries[key] = (k, [dict(r) for r in results], expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions, "expirations": self.expirations,
+                "invalidations": self.invalidations, "generation": self.generation}
+
+def query_key(model, term_ids, weights, *params):
+    """Kunci query ter-analisis: urutan kata dan kata di luar kosakata tidak mengubah skor"""
+    pairs = sorted((int(t), float(w)) for t, w in zip(term_ids, weights))
+    return (model, params, tuple(pairs))
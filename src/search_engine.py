@@ -1,35 +1,52 @@
+import sys
+import time
+_IMPORT_START = time.perf_counter()
+# --timing-imports: install the import timer before any heavy module is loaded
+if "--timing-imports" in sys.argv:
+    import tracing
+    IMPORT_TIMER = tracing.ImportTimer().install()
+else:
+    IMPORT_TIMER = None
 import os
+import json
 import argparse
 import math
-from collections import Counter, defaultdict
+from contextlib import nullcontext
+from collections import Counter
 
-# prefer existing VSM class if available, else minimal fallback
+# persistent on-disk index (optional, built with `python src/index_store.py build`)
 try:
-    from vsm_ir import VSMRetrieval
-    VSM_AVAILABLE = True
+    from index_store import IndexReader
+    INDEX_AVAILABLE = True
 except Exception:
-    VSM_AVAILABLE = False
-
-# boolean IR (fallback simple)
-def build_inverted_index(processed_dir):
-    index = defaultdict(set)
-    for fname in sorted(os.listdir(processed_dir)):
-        if fname.endswith(".txt"):
-            with open(os.path.join(processed_dir, fname), encoding="utf-8") as f:
-                tokens = f.read().split()
-            for t in set(tokens):
-                index[t].add(fname)
-    return index
+    INDEX_AVAILABLE = False
 
-def boolean_retrieve(query_tokens, index, op="AND"):
-    sets = [index.get(t, set()) for t in query_tokens]
-    if not sets:
-        return []
-    if op == "AND":
-        result = set.intersection(*sets)
-    else:
-        result = set.union(*sets)
-    return sorted(list(result))
+# shared raw-tf matrix serving tfidf / tfidf_sublinear / bm25 (see term_matrix.py)
+try:
+    from term_matrix import TermDocMatrix
+    ENGINE_AVAILABLE = True
+except Exception:
+    ENGINE_AVAILABLE = False
+
+# doc store: raw text + token offsets for query-biased snippets (see doc_store.py)
+try:
+    from doc_store import DocStore
+    DOC_STORE_AVAILABLE = True
+except Exception:
+    DOC_STORE_AVAILABLE = False
+
+# processed corpus: packed store if built, else one .txt per document (see packed_store.py)
+from packed_store import iter_processed, read_processed, corpus_fingerprint, enable_verify
+
+# BM25 impact index (see bm25_ir.py)
+from bm25_ir import BM25Retrieval, default_bm25_dir
+
+# boolean IR (integer doc-id postings, see boolean_ir.py)
+from boolean_ir import BooleanIndex
+import boolean_query
+from explain import format_contributions
+import tracing
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
 # Simple BM25 implementation (corpus: list of token lists)
 def build_bm25(corpus):
@@ -61,45 +78,73 @@ def bm25_score_for_doc(query_tokens, doc_tokens, bm25_index, k1=1.5, b=0.75):
 # helper: explain top terms for a document using sklearn tfidf if available
 def explain_top_terms_from_vsm(vsm_obj, doc_index, top_n=5):
     """
-    Requires vsm_obj to have: vectorizer and tfidf_matrix (sparse)
-    Returns list of (term, weight) for top_n terms in the doc.
+    Requires vsm_obj to have: explainer() (VSMRetrieval, see explain.py)
+    Returns list of (term, weight) for top_n terms in the doc, read from the
+    precomputed sparse top-N table (no dense vocabulary-sized row).
     """
     try:
-        import numpy as np
-        # getattr to avoid breaking if attributes missing
-        vec = vsm_obj.tfidf_matrix[doc_index].toarray().flatten()
-        features = vsm_obj.vectorizer.get_feature_names_out()
-        top_idx = vec.argsort()[::-1][:top_n]
-        return [(features[i], float(vec[i])) for i in top_idx if vec[i] > 0]
+        return vsm_obj.explainer().top_terms(doc_index, top_n)
     except Exception:
         return []
 
-def run_vsm_cli(processed_dir, query, k=5, weight="tfidf"):
-    # Use VSMRetrieval if available (preferred)
-    if VSM_AVAILABLE:
-        vsm = VSMRetrieval(processed_dir=None)  # VSMRetrieval handles path automatically
-        vsm.load_processed_docs()
-        vsm.build_tfidf()
-        # if weight handled in VSMRetrieval, not here; VSMRetrieval.rank returns doc/score/snippet
-        results = vsm.rank(query, k=k)
-        # add explain (top terms per doc)
+def open_index(processed_dir, index_dir=None):
+    """Open the persistent index if it exists and its source corpus (recorded in its meta) is unchanged."""
+    if not INDEX_AVAILABLE or not IndexReader.exists(index_dir):
+        return None
+    with tracing.span("open_index"):
+        index = IndexReader(index_dir)
+    if index.is_stale():
+        source = index.meta.get("processed_dir") or processed_dir
+        print(f"[WARN] index is stale ({source} changed); rebuild with `python src/index_store.py build`")
+        return None
+    return index
+
+def open_doc_store(processed_dir, doc_ids=None):
+    """Doc store if built (`python src/doc_store.py build`), fresh, and in the same doc order; else None."""
+    if not DOC_STORE_AVAILABLE:
+        return None
+    store = DocStore.open(processed_dir)
+    if store is None or (doc_ids is not None and not store.matches(doc_ids)):
+        return None
+    return store
+
+def load_engine(processed_dir, index=None):
+    """
+    Shared term-document matrix: zero-copy from the on-disk index if given, else the saved
+    matrix (data/index/matrix, written by `term_matrix.py build`), else a scan of data/processed.
+    """
+    with tracing.span("load_model"):
+        if index is not None:
+            engine = TermDocMatrix.from_index(index)
+        else:
+            engine = TermDocMatrix.open(processed_dir)
+        engine.doc_store = open_doc_store(processed_dir, engine.doc_ids)
+    return engine
+
+def run_vsm_cli(processed_dir, query, k=5, weight="tfidf", index=None, prune=False, stats=None,
+                k1=1.5, b=0.75, engine=None, explain=False):
+    # one raw tf matrix, weighting (tfidf / tfidf_sublinear / bm25) derived lazily per query
+    if ENGINE_AVAILABLE:
+        engine = engine or load_engine(processed_dir, index)
+        results = engine.rank(query, k=k, weight=weight, k1=k1, b=b, prune=prune)
+        if stats is not None:
+            stats.update(engine.last_query_stats)
+        # add explain (top terms per doc under the same weighting, per-term score breakdown)
+        doc_index = {d: i for i, d in enumerate(engine.doc_ids)}
         explained = []
-        for r in results:
-            try:
-                doc_idx = vsm.doc_ids.index(r["doc_id"])
-                top_terms = explain_top_terms_from_vsm(vsm, doc_idx, top_n=4)
-            except Exception:
-                top_terms = []
-            explained.append({"doc_id": r["doc_id"], "score": r["score"], "snippet": r["snippet"], "top_terms": top_terms})
+        with tracing.span("explain"):
+            for r in results:
+                doc_idx = doc_index[r["doc_id"]]
+                top_terms = engine.top_terms(doc_idx, weight=weight, top_n=4, k1=k1, b=b)
+                item = {"doc_id": r["doc_id"], "score": r["score"], "snippet": r["snippet"], "top_terms": top_terms}
+                if explain:
+                    item["explanation"] = engine.explain(doc_idx, query, weight=weight, k1=k1, b=b)["contributions"]
+                explained.append(item)
         return explained
     else:
         # fallback: manual TF-IDF using simple tf-idf (not sklearn)
         # load corpus
-        docs = {}
-        for fname in sorted(os.listdir(processed_dir)):
-            if fname.endswith(".txt"):
-                with open(os.path.join(processed_dir, fname), encoding="utf-8") as f:
-                    docs[fname] = f.read().split()
+        docs = {fname: text.split() for fname, text in iter_processed(processed_dir)}
         # build idf
         N = len(docs)
         df = Counter()
@@ -141,95 +186,247 @@ def run_vsm_cli(processed_dir, query, k=5, weight="tfidf"):
         # prepare results with top_terms naive (most frequent tokens in doc)
         results = []
         for fname, score in scored[:k]:
-            with open(os.path.join(processed_dir, fname), encoding="utf-8") as f:
-                text = f.read()
-            tokens = text.split()
+            tokens = docs[fname]
             top_terms = Counter(tokens).most_common(4)
             snippet = " ".join(tokens[:25])
             results.append({"doc_id": fname, "score": score, "snippet": snippet, "top_terms": top_terms})
         return results
 
-def run_boolean_cli(processed_dir, query, k=5, op="OR"):
+def run_boolean_cli(processed_dir, query, k=5, op="OR", index=None, explain=False):
     """
-    Boolean retrieval sederhana:
-    - op: "OR" (default) agar hasil tidak terlalu ketat.
+    Boolean retrieval:
+    - query mendukung AND / OR / NOT, kurung, "frasa" dan prefix* (lihat boolean_query.py).
+    - op: operator default antar kata tanpa operator; "OR" (default) agar hasil tidak terlalu ketat.
+    - index: IndexReader opsional; jika ada hanya postings term query yang dibaca.
     - output: list of dict {doc_id, score, snippet, top_terms}
       sehingga kompatibel dengan printer di main().
     """
-    index = build_inverted_index(processed_dir)
-    qtokens = query.lower().split()
+    with tracing.span("analyze"):
+        ast = boolean_query.parse_query(query, default_op=op)
+        qtokens = boolean_query.query_terms(ast)
+    with tracing.span("load_model"):
+        if index is not None:
+            index = BooleanIndex.from_reader(index)
+        else:
+            index = BooleanIndex.from_processed_dir(processed_dir, with_positions=boolean_query.has_phrase(ast))
 
-    # gunakan AND kalau mau strict, OR kalau mau lebih longgar
-    matched = boolean_retrieve(qtokens, index, op=op)
+    # rencana eksekusi: operand diurutkan berdasarkan df, NOT sebagai pengurang kandidat
+    with tracing.span("plan"):
+        plan = boolean_query.plan(ast, index)
+    with tracing.span("execute"):
+        docs = boolean_query.execute(plan, index)
+        matched = index.names(docs)
+    tracing.count("docs_matched", len(matched))
 
     results = []
-    for fname in matched[:k]:
-        fpath = os.path.join(processed_dir, fname)
-        try:
-            with open(fpath, encoding="utf-8") as f:
-                tokens = f.read().split()
-        except FileNotFoundError:
-            tokens = []
-            snippet = ""
-        else:
-            snippet = " ".join(tokens[:25])
+    with tracing.span("snippets"):
+        for fname in matched[:k]:
+            tracing.count("snippet_file_reads")
+            try:
+                tokens = read_processed(processed_dir, fname).split()
+            except FileNotFoundError:
+                tokens = []
+                snippet = ""
+            else:
+                snippet = " ".join(tokens[:25])
 
-        # skor sederhana: jumlah kata query yang muncul di dokumen
-        tf_doc = Counter(tokens)
-        score = sum(1 for t in set(qtokens) if t in tf_doc)
+            # skor sederhana: jumlah kata query yang muncul di dokumen
+            tf_doc = Counter(tokens)
+            score = sum(1 for t in set(qtokens) if t in tf_doc)
 
-        # top_terms = kata query yang memang muncul di dokumen
-        top_terms = [t for t in qtokens if t in tf_doc]
+            # top_terms = kata query yang memang muncul di dokumen
+            top_terms = [t for t in qtokens if t in tf_doc]
 
-        results.append({
-            "doc_id": fname,
-            "score": float(score),
-            "snippet": snippet,
-            "top_terms": top_terms
-        })
+            results.append({
+                "doc_id": fname,
+                "score": float(score),
+                "snippet": snippet,
+                "top_terms": top_terms
+            })
+            if explain:
+                # tiap kata query yang cocok menyumbang 1 ke skor
+                results[-1]["explanation"] = [{"term": t, "contribution": 1.0} for t in dict.fromkeys(top_terms)]
     return results
 
 
-def run_bm25_cli(processed_dir, query, k=5):
-    # load corpus as token lists and filenames
-    filenames = []
-    corpus = []
-    for fname in sorted(os.listdir(processed_dir)):
-        if fname.endswith(".txt"):
-            filenames.append(fname)
-            with open(os.path.join(processed_dir, fname), encoding="utf-8") as f:
-                corpus.append(f.read().split())
-    bm25_index = build_bm25(corpus)
-    qtokens = query.lower().split()
-    scores = [(filenames[i], bm25_score_for_doc(qtokens, corpus[i], bm25_index)) for i in range(len(filenames))]
-    scores.sort(key=lambda x: x[1], reverse=True)
+def load_bm25(processed_dir, index=None, k1=1.5, b=0.75, bm25_dir=None):
+    """
+    Prefer the precomputed impact index (`python src/bm25_ir.py build`) when its k1/b
+    match and it was built from the same source, unchanged (the index passed in, else
+    processed_dir); else derive it from the on-disk index or the corpus.
+    """
+    with tracing.span("load_model"):
+        return _load_bm25(processed_dir, index, k1, b, bm25_dir)
+
+def _load_bm25(processed_dir, index, k1, b, bm25_dir):
+    bm25_dir = bm25_dir or default_bm25_dir()
+    if os.path.exists(os.path.join(bm25_dir, "meta.json")):
+        bm25 = BM25Retrieval.load(bm25_dir)
+        source = index.fingerprint() if index is not None else corpus_fingerprint(processed_dir)
+        if (bm25.k1, bm25.b) == (k1, b) and bm25.corpus == source:
+            return bm25
+    if index is not None:
+        return BM25Retrieval.from_index(index, k1=k1, b=b)
+    bm25 = BM25Retrieval(processed_dir, k1=k1, b=b)
+    bm25.load_processed_docs()
+    return bm25
+
+def run_bm25_cli(processed_dir, query, k=5, index=None, k1=1.5, b=0.75, prune=False, stats=None,
+                 explain=False):
+    bm25 = load_bm25(processed_dir, index=index, k1=k1, b=b)
+    scores = [(r["doc_id"], r["score"]) for r in bm25.rank(query, k=k, prune=prune)]
+    if stats is not None:
+        stats.update(bm25.last_query_stats)
+    store = open_doc_store(processed_dir, bm25.doc_ids)
+    doc_index = {d: i for i, d in enumerate(bm25.doc_ids)}
+    with tracing.span("explain"):
+        explainer = bm25.explainer()
     results = []
-    for fname, score in scores[:k]:
-        with open(os.path.join(processed_dir, fname), encoding="utf-8") as f:
-            snippet = " ".join(f.read().split()[:25])
-        # top terms naive
-        top_terms = Counter(open(os.path.join(processed_dir, fname), encoding="utf-8").read().split()).most_common(4)
-        results.append({"doc_id": fname, "score": score, "snippet": snippet, "top_terms": top_terms})
+    with tracing.span("snippets"):
+        for fname, score in scores[:k]:
+            doc = doc_index[fname]
+            # top terms by BM25 weight from the precomputed sparse table
+            item = {"doc_id": fname, "score": score, "top_terms": explainer.top_terms(doc, 4)}
+            if store is not None:
+                # no per-result file I/O: snippet from raw text + token offsets
+                snip = store.snippet(doc, query.lower().split())
+                item.update(snippet=snip["text"], highlights=snip["highlights"])
+            else:
+                tracing.count("snippet_file_reads")
+                item["snippet"] = " ".join(read_processed(processed_dir, fname).split()[:25])
+            if explain:
+                item["explanation"] = bm25.explain(doc, query)["contributions"]
+            results.append(item)
     return results
 
+def run_lsi_cli(processed_dir, query, k=5, index=None, nprobe=8, exact=False, stats=None, lsi_dir=None):
+    """
+    Latent semantic search (`python src/lsi.py build`); the saved index is used only when it
+    was built from the same source as `index` (else processed_dir), otherwise rebuilt in memory.
+    """
+    from lsi import LSIIndex
+    with tracing.span("load_model"):
+        source = index.fingerprint() if index is not None else corpus_fingerprint(processed_dir)
+        lsi = LSIIndex.open(source, lambda: load_engine(processed_dir, index), lsi_dir)
+    results = lsi.rank(query, k=k, nprobe=nprobe, exact=exact)
+    if stats is not None:
+        stats.update(lsi.last_query_stats)
+    store = open_doc_store(processed_dir, lsi.doc_ids)
+    if store is not None:
+        doc_index = {d: i for i, d in enumerate(lsi.doc_ids)}
+        with tracing.span("snippets"):
+            for r in results:
+                snip = store.snippet(doc_index[r["doc_id"]], query.lower().split())
+                r.update(snippet=snip["text"], highlights=snip["highlights"])
+    return results
+
+def run_sharded_cli(processed_dir, query, model="vsm", k=5, weight="tfidf", op="OR", k1=1.5, b=0.75,
+                    prune=False, stats=None, shards_dir=None):
+    """Scatter-gather ke index ter-shard (`python src/shards.py build`); skor sama dengan engine tanpa shard."""
+    from shards import ShardedIndex
+    with tracing.span("load_model"):
+        sharded = ShardedIndex(shards_dir or None)
+    with sharded:
+        if sharded.is_stale():
+            print("[WARN] shards are stale (data/processed changed); rebuild with `python src/shards.py build`")
+        if model == "boolean":
+            results, _ = sharded.boolean(query, k, op)
+            return results
+        # bm25 di mode shard = skema bobot bm25 pada matriks tf tiap shard
+        return sharded.rank(query, k, "bm25" if model == "bm25" else weight, k1, b, prune, stats)
+
 def main():
     parser = argparse.ArgumentParser(description="Mini Search Engine CLI - STKI UTS")
-    parser.add_argument("--model", choices=["boolean", "vsm", "bm25"], default="vsm")
-    parser.add_argument("--weight", choices=["tfidf", "tfidf_sublinear"], default="tfidf")
+    parser.add_argument("--model", choices=["boolean", "vsm", "bm25", "lsi"], default="vsm")
+    parser.add_argument("--weight", choices=["tfidf", "tfidf_sublinear", "bm25"], default="tfidf",
+                        help="skema bobot untuk --model vsm (semua dari satu matriks tf)")
     parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--op", choices=["AND", "OR"], default="OR", help="operator default query boolean")
+    parser.add_argument("--k1", type=float, default=1.5, help="BM25 k1")
+    parser.add_argument("--b", type=float, default=0.75, help="BM25 b")
     parser.add_argument("--query", type=str, required=True)
+    parser.add_argument("--index", type=str, default=None, help="folder index on-disk (default: data/index jika ada)")
+    parser.add_argument("--no-index", action="store_true", help="abaikan index on-disk, scan data/processed")
+    parser.add_argument("--prune", action="store_true", help="top-k block-max (vsm/bm25): lewati blok dokumen yang tidak mungkin masuk top-k")
+    parser.add_argument("--nprobe", type=int, default=8, help="lsi: jumlah list IVF yang dipindai (recall vs latensi)")
+    parser.add_argument("--exact", action="store_true", help="lsi: scan penuh tanpa IVF")
+    parser.add_argument("--explain", action="store_true", help="rincian skor per kata query untuk tiap hasil")
+    parser.add_argument("--server", type=str, default=None,
+                        help="mode klien: kirim query ke search_server.py (mis. http://127.0.0.1:8765)")
+    parser.add_argument("--shards", nargs="?", const="", default=None,
+                        help="mode shard: query ke semua shard paralel lalu gabung top-k (default data/index/shards)")
+    parser.add_argument("--verify", action="store_true",
+                        help="scan file .txt di data/processed dan bangun ulang artefak jika tidak cocok dengan manifest")
+    parser.add_argument("--profile", nargs="?", const="text", choices=["text", "json"], default=None,
+                        help="rincian waktu per tahap (import, load, analisis, scoring, sort, snippet) + counter")
+    parser.add_argument("--timing-imports", action="store_true",
+                        help="waktu import per paket: startup + import lazy selama query (scipy, sklearn, nltk, ...)")
     args = parser.parse_args()
 
+    with (tracing.trace("search") if args.profile else nullcontext()) as trace:
+        if trace is not None:
+            trace.add_span("imports", IMPORT_SECONDS, before=True)
+        _search(args, parser)
+    if trace is not None:
+        print(trace.format() if args.profile == "text" else json.dumps(trace.to_dict(), indent=1))
+    if IMPORT_TIMER is not None:
+        IMPORT_TIMER.uninstall()
+        print(IMPORT_TIMER.format() if args.profile != "json" else json.dumps(IMPORT_TIMER.to_dict(), indent=1))
+
+def _search(args, parser):
+
+    if args.verify:
+        enable_verify()
     base_dir = os.path.dirname(os.path.dirname(__file__))
     processed_dir = os.path.join(base_dir, "data", "processed")
+    index = None if args.no_index or args.server or args.shards is not None else open_index(processed_dir, args.index)
+    if index is not None and index.meta.get("processed_dir"):
+        # index built from another corpus: doc store / snippets come from that corpus too
+        processed_dir = index.meta["processed_dir"]
+    stats = {}
 
-    if args.model == "boolean":
-        results = run_boolean_cli(processed_dir, args.query, k=args.k)
+    if args.server:
+        # index sudah dimuat di server; klien hanya mengirim query
+        from search_server import SearchClient
+        try:
+            with tracing.span("request"):
+                response = SearchClient(args.server).search(
+                    args.query, model=args.model, k=args.k, weight=args.weight, op=args.op,
+                    k1=args.k1, b=args.b, prune=args.prune, explain=args.explain, profile=bool(args.profile))
+                if response.get("trace"):
+                    # tahap di sisi server sebagai anak span request
+                    for sp in response["trace"]["spans"]:
+                        tracing.current().add_span("server." + sp["name"], sp["ms"] / 1000)
+                    for name, n in response["trace"]["counters"].items():
+                        tracing.count(name, n)
+        except ValueError as e:
+            parser.error(f"server menolak query: {e}")
+        results, stats = response["results"], response["stats"]
+    elif args.shards is not None:
+        if args.model == "lsi":
+            parser.error("--model lsi tidak tersedia di mode --shards")
+        try:
+            results = run_sharded_cli(processed_dir, args.query, model=args.model, k=args.k, weight=args.weight,
+                                      op=args.op, k1=args.k1, b=args.b, prune=args.prune, stats=stats,
+                                      shards_dir=args.shards)
+        except ValueError as e:
+            parser.error(f"query tidak valid: {e}")
+    elif args.model == "boolean":
+        try:
+            results = run_boolean_cli(processed_dir, args.query, k=args.k, op=args.op, index=index,
+                                      explain=args.explain)
+        except ValueError as e:
+            parser.error(f"query boolean tidak valid: {e}")
+    elif args.model == "lsi":
+        results = run_lsi_cli(processed_dir, args.query, k=args.k, index=index, nprobe=args.nprobe,
+                              exact=args.exact, stats=stats)
     elif args.model == "bm25":
-        results = run_bm25_cli(processed_dir, args.query, k=args.k)
+        results = run_bm25_cli(processed_dir, args.query, k=args.k, index=index, k1=args.k1, b=args.b,
+                               prune=args.prune, stats=stats, explain=args.explain)
     else:
         # vsm
-        results = run_vsm_cli(processed_dir, args.query, k=args.k, weight=args.weight)
+        results = run_vsm_cli(processed_dir, args.query, k=args.k, weight=args.weight, index=index,
+                              prune=args.prune, stats=stats, k1=args.k1, b=args.b, explain=args.explain)
 
     # print nicely with explain (top_terms)
     if args.model == "vsm":
@@ -243,8 +440,12 @@ def main():
         if r.get("top_terms"):
             terms = ", ".join([t if isinstance(t, str) else f'{t[0]}({t[1]})' for t in (r['top_terms'])])
             print(f"    top_terms: {terms}")
+        if r.get("explanation"):
+            print(f"    explain: {format_contributions(r['explanation'])}")
         if r.get("snippet"):
             print(f"    snippet: {r['snippet'][:160]}...\n")
+    if stats:
+        print(f"[INFO] {stats['mode']}: scored {stats['scored']} / {stats['n_docs']} docs")
     print("Done.\n")
 
 if __name__ == "__main__":
@@ -0,0 +1,320 @@
+# src/search_server.py
+# Server pencarian lokal (asyncio, HTTP/JSON): index dibuka sekali saat start lalu
+# dipakai untuk semua query. Scoring (CPU-bound) dijalankan di thread pool agar
+# request yang datang bersamaan tetap dilayani.
+#
+#   python src/search_server.py --port 8765
+#   python src/search_engine.py --server http://127.0.0.1:8765 --query "ayam goreng"
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from search_engine import open_index, load_engine
+from boolean_ir import BooleanIndex
+import boolean_query
+from result_cache import ResultCache
+import tracing
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY = 1 << 20
+
+class SearchService:
+    """State yang dimuat sekali: matriks tf bersama (vsm/bm25) dan index boolean"""
+
+    def __init__(self, processed_dir=None, index_dir=None, use_index=True, cache_size=1024, cache_ttl=None):
+        base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.processed_dir = processed_dir or os.path.join(base, "data", "processed")
+        self.index_dir = index_dir
+        self.use_index = use_index
+        # satu cache untuk semua model; dikosongkan otomatis saat generation berubah
+        self.cache = ResultCache(cache_size, cache_ttl) if cache_size else None
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self.load()
+
+    def load(self):
+        start = time.perf_counter()
+        index = open_index(self.processed_dir, self.index_dir) if self.use_index else None
+        engine = load_engine(self.processed_dir, index)
+        if index is not None:
+            boolean = BooleanIndex.from_reader(index)
+        else:
+            boolean = BooleanIndex.from_processed_dir(self.processed_dir, with_positions=True)
+        engine.result_cache = self.cache
+        # tukar sekaligus: request yang sedang berjalan tetap memakai objek lama
+        self.engine, self.boolean = engine, boolean
+        self.doc_index = {d: i for i, d in enumerate(engine.doc_ids)}
+        self.generation = engine.generation
+        self._manifest_mtime = self._manifest_stat()
+        self.load_seconds = time.perf_counter() - start
+        print(f"[INFO] search service ready: {engine.N} docs, generation {self.generation} "
+              f"({self.load_seconds:.2f}s)")
+
+    def _manifest_stat(self):
+        try:
+            return os.stat(os.path.join(self.processed_dir, "manifest.json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh_if_stale(self):
+        """Muat ulang jika manifest preprocessing berubah (cek mtime, murah per request)"""
+        if self._manifest_stat() == self._manifest_mtime:
+            return False
+        with self._lock:
+            if self._manifest_stat() != self._manifest_mtime:
+                self.load()
+                return True
+        return False
+
+    def health(self):
+        return {"status": "ok", "generation": self.generation, "n_docs": self.engine.N,
+                "load_seconds": round(self.load_seconds, 3),
+                "cache": self.cache.stats() if self.cache is not None else None}
+
+    # QUERY
+    def search(self, query, model="vsm", k=5, weight="tfidf", op="OR", k1=1.5, b=0.75, prune=False,
+               analyze=False, explain=False, profile=False):
+        """
+        Satu query → {"results": [...], "stats": {...}, "took_ms": ...}.
+        analyze=True: query mentah dianalisis di server (pipeline preprocess yang sama dengan korpus).
+        Tiap query di-trace (agregat di /metrics); profile=True menyertakan trace-nya di respons.
+        """
+        with tracing.trace("search") as trace:
+            response = self._search(query, model, k, weight, op, k1, b, prune, analyze, explain)
+        if profile:
+            response["trace"] = trace.to_dict()
+        return response
+
+    def _search(self, query, model, k, weight, op, k1, b, prune, analyze, explain):
+        start = time.perf_counter()
+        if analyze:
+            from preprocess import preprocess_text
+            with tracing.span("preprocess"):
+                query = " ".join(preprocess_text(query))
+        stats = {}
+        if model == "boolean":
+            results = self._boolean(query, k, op, stats)
+            if explain:
+                for r in results:
+                    r["explanation"] = [{"term": t, "contribution": 1.0} for t in dict.fromkeys(r["top_terms"])]
+        elif model in ("vsm", "bm25"):
+            if model == "bm25":
+                weight = "bm25"
+            engine = self.engine
+            results = engine.rank(query, k=k, weight=weight, k1=k1, b=b, prune=prune, stats=stats)
+            with tracing.span("explain"):
+                for r in results:
+                    doc = self.doc_index[r["doc_id"]]
+                    r["top_terms"] = engine.top_terms(doc, weight=weight, top_n=4, k1=k1, b=b)
+                    if explain:
+                        r["explanation"] = engine.explain(doc, query, weight=weight, k1=k1, b=b)["contributions"]
+        else:
+            raise ValueError(f"Model tidak dikenal: {model}")
+        return {"query": query, "model": model, "results": results, "stats": stats,
+                "took_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    def _boolean(self, query, k, op, stats):
+        index, engine = self.boolean, self.engine
+        with tracing.span("analyze"):
+            ast = boolean_query.parse_query(query, default_op=op)
+        if self.cache is not None:
+            # AST sebagai kunci: spasi/penulisan operator yang berbeda tetap satu entri
+            key = ("boolean", repr(ast))
+            with tracing.span("cache"):
+                cached = self.cache.get(key, k, engine.generation)
+            if cached is not None:
+                stats.update(n_docs=engine.N, scored=0, pruned=0, mode="cache")
+                return cached
+        qtokens = boolean_query.query_terms(ast)
+        with tracing.span("plan"):
+            p = boolean_query.plan(ast, index)
+        with tracing.span("execute"):
+            docs = boolean_query.execute(p, index)
+        tracing.count("docs_matched", len(docs))
+        docs = docs[:k]
+        # skor sederhana (sama dengan run_boolean_cli): jumlah kata query yang muncul di dokumen
+        present = {t: set(index.get(t).seek_filter(docs).tolist()) for t in set(qtokens)}
+        results = []
+        for d in np.asarray(docs).tolist():
+            top_terms = [t for t in qtokens if d in present[t]]
+            results.append({"doc_id": engine.doc_ids[d], "score": float(len(set(top_terms))),
+                            "snippet": str(engine.snippets[d]), "top_terms": top_terms})
+        if self.cache is not None:
+            self.cache.put(key, k, results, engine.generation)
+        return results
+
+    def batch_search(self, queries, **params):
+        return [self.search(q, **params) for q in queries]
+
+# HTTP (minimal, satu request per koneksi)
+MAX_K = 1000                      # k lebih besar dipotong ke batas ini
+
+def _flag(v):
+    return v if isinstance(v, bool) else str(v).lower() in ("1", "true", "yes")
+
+def _top_k(v):
+    if isinstance(v, bool) or not isinstance(v, (int, str)) or not str(v).strip().lstrip("+").isdigit():
+        raise ValueError("harus bilangan bulat positif")
+    k = int(v)
+    if k < 1:
+        raise ValueError("harus bilangan bulat positif")
+    return min(k, MAX_K)
+
+def _non_negative(v):
+    x = float(v)
+    if not x >= 0:                # juga menolak NaN
+        raise ValueError("harus angka >= 0")
+    return x
+
+_SEARCH_PARAMS = {"model": str, "k": _top_k, "weight": str, "op": str, "k1": _non_negative, "b": _non_negative,
+                  "prune": _flag, "analyze": _flag, "explain": _flag, "profile": _flag}
+
+def _search_params(payload):
+    params = {}
+    for name, cast in _SEARCH_PARAMS.items():
+        if name in payload:
+            try:
+                params[name] = cast(payload[name])
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Parameter {name} tidak valid ({payload[name]!r}): {e}") from None
+    return params
+
+class SearchServer:
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=4):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        status, payload = 500, {"error": "internal error"}
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY:
+                raise ValueError("Body terlalu besar.")
+            body = await reader.readexactly(length) if length else b""
+            status, payload = await self.dispatch(request_line, body)
+        except (ValueError, KeyError, json.JSONDecodeError) as e:
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}.get(status, "Error")
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def dispatch(self, request_line, body):
+        if len(request_line) < 2:
+            raise ValueError("Request line tidak valid.")
+        method, target = request_line[0], request_line[1]
+        url = urlsplit(target)
+        if method == "GET":
+            payload = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        elif method == "POST":
+            payload = json.loads(body or b"{}")
+        else:
+            return 405, {"error": f"Method {method} tidak didukung."}
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+
+        if url.path == "/health":
+            return 200, dict(self.service.health(), requests=self.requests)
+        if url.path == "/metrics":
+            # agregat trace semua query: durasi per tahap (mean/p50/p95/p99) + counter
+            return 200, dict(tracing.metrics.snapshot(), requests=self.requests,
+                             cache=self.service.cache.stats() if self.service.cache is not None else None)
+        if url.path == "/search":
+            query = payload.get("q", payload.get("query"))
+            if not query:
+                raise ValueError("Parameter q (query) wajib diisi.")
+            params = _search_params(payload)
+            await loop.run_in_executor(self.pool, self.service.refresh_if_stale)
+            return 200, await loop.run_in_executor(self.pool, lambda: self.service.search(query, **params))
+        if url.path == "/batch_search":
+            queries = payload.get("queries")
+            if not isinstance(queries, list):
+                raise ValueError("Body harus berisi list 'queries'.")
+            params = _search_params(payload)
+            await loop.run_in_executor(self.pool, self.service.refresh_if_stale)
+            # tiap query dijadwalkan terpisah agar worker pool dipakai paralel
+            results = await asyncio.gather(*(
+                loop.run_in_executor(self.pool, lambda q=q: self.service.search(q, **params)) for q in queries))
+            return 200, {"results": list(results)}
+        return 404, {"error": f"Path {url.path} tidak ditemukan."}
+
+    async def serve_forever(self):
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"[INFO] listening on http://{self.host}:{self.port} (/search, /batch_search, /health, /metrics)")
+        async with server:
+            await server.serve_forever()
+
+# CLIENT
+class SearchClient:
+    """Klien HTTP untuk SearchServer (hanya pustaka standar: tanpa sklearn/NLTK di sisi klien)"""
+
+    def __init__(self, url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        req = urllib.request.Request(self.url + path, data=data,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            raise ValueError(json.loads(e.read().decode("utf-8")).get("error", str(e))) from None
+
+    def health(self):
+        return self._request("/health")
+
+    def search(self, query, **params):
+        return self._request("/search", dict(params, q=query))
+
+    def batch_search(self, queries, **params):
+        return self._request("/batch_search", dict(params, queries=list(queries)))["results"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Server pencarian lokal (HTTP/JSON)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=4, help="thread untuk scoring")
+    parser.add_argument("--processed", default=None)
+    parser.add_argument("--index", default=None, help="folder index on-disk (default: data/index jika ada)")
+    parser.add_argument("--no-index", action="store_true")
+    parser.add_argument("--cache-size", type=int, default=1024, help="jumlah entri cache hasil (0 = nonaktif)")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="umur entri cache (detik)")
+    args = parser.parse_args()
+
+    service = SearchService(args.processed, args.index, use_index=not args.no_index,
+                            cache_size=args.cache_size, cache_ttl=args.cache_ttl)
+    try:
+        asyncio.run(SearchServer(service, args.host, args.port, args.workers).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+# src/shards.py
+# Index ter-shard dengan scatter-gather top-k. Korpus dibagi menjadi N shard (rentang
+# dokumen berurutan, seimbang menurut ukuran file); tiap shard punya index_store
+# sendiri dan satu proses worker. Query dibobot sekali di koordinator dengan
+# statistik global (N, df, avgdl), dikirim ke semua shard, tiap shard mengembalikan
+# top-k lokal, lalu koordinator menggabungkan hasilnya. Karena idf/avgdl global dan
+# urutan term sama, skor identik dengan engine tanpa shard (TermDocMatrix.rank).
+#
+#   python src/shards.py build --shards 4
+#   python src/shards.py query --query "ayam goreng" --weight bm25
+#   python src/shards.py bench --queries 200
+#
+# Layout folder (default data/index/shards):
+#   meta.json            statistik global + offset doc tiap shard (ditulis terakhir)
+#   terms.npy, df.npy    kamus global terurut + df global
+#   shard_000/ ...       index posisional (format index_store) per shard
+import os
+import json
+import time
+import heapq
+import shutil
+import argparse
+import threading
+import multiprocessing
+from multiprocessing import Pool
+import numpy as np
+
+from index_store import IndexReader, build_index, default_index_dir
+from term_matrix import TermDocMatrix, WEIGHTS, vectorize_query, tfidf_idf, sklearn_mask
+from boolean_ir import BooleanIndex
+from packed_store import list_processed, manifest_generation, corpus_fingerprint
+import boolean_query
+import tracing
+
+SHARDS_FORMAT = "stki-shard-set"
+SHARDS_VERSION = 1
+
+def default_shards_dir():
+    return os.path.join(default_index_dir(), "shards")
+
+def _shard_name(i):
+    return f"shard_{i:03d}"
+
+# MEMBANGUN SHARD
+def partition(filenames, sizes, n_shards):
+    """Rentang berurutan [(start, stop)] dengan total ukuran kira-kira sama; urutan nama file dipertahankan"""
+    n_shards = max(1, min(n_shards, len(filenames)))
+    bounds = np.cumsum(np.asarray(sizes, dtype=np.float64))
+    total = bounds[-1] if len(bounds) else 0.0
+    cuts = [0]
+    for i in range(1, n_shards):
+        # batas shard i: dokumen pertama yang melewati i/N total ukuran, minimal satu dokumen per shard
+        cut = int(np.searchsorted(bounds, total * i / n_shards, side="right"))
+        cuts.append(min(max(cut, cuts[-1] + 1), len(filenames) - (n_shards - i)))
+    cuts.append(len(filenames))
+    return list(zip(cuts[:-1], cuts[1:]))
+
+def _build_shard(args):
+    processed_dir, shard_dir, filenames = args
+    return build_index(processed_dir, shard_dir, filenames)
+
+def build_shards(processed_dir, shards_dir=None, n_shards=4, workers=None):
+    """Bangun index tiap shard paralel (satu proses per shard) lalu gabungkan statistik global"""
+    shards_dir = shards_dir or default_shards_dir()
+    start = time.perf_counter()
+    corpus = corpus_fingerprint(processed_dir)
+    filenames, sizes = list_processed(processed_dir)
+    ranges = partition(filenames, sizes, n_shards)
+
+    os.makedirs(shards_dir, exist_ok=True)
+    # set shard tidak valid selama dibangun ulang
+    meta_path = os.path.join(shards_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for name in os.listdir(shards_dir):
+        if name.startswith("shard_") and name not in {_shard_name(i) for i in range(len(ranges))}:
+            shutil.rmtree(os.path.join(shards_dir, name))
+
+    jobs = [(processed_dir, os.path.join(shards_dir, _shard_name(i)), filenames[lo:hi])
+            for i, (lo, hi) in enumerate(ranges)]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        with Pool(workers) as pool:
+            metas = pool.map(_build_shard, jobs)
+    else:
+        metas = [_build_shard(job) for job in jobs]
+
+    # statistik global: kamus gabungan + df dijumlahkan dari semua shard
+    readers = [IndexReader(job[1]) for job in jobs]
+    terms = np.unique(np.concatenate([r.terms for r in readers])) if readers else np.array([], dtype=str)
+    df = np.zeros(len(terms), dtype=np.int64)
+    for r in readers:
+        df[np.searchsorted(terms, r.terms)] += np.diff(r.term_ptr)
+    np.save(os.path.join(shards_dir, "terms.npy"), terms)
+    np.save(os.path.join(shards_dir, "df.npy"), df)
+
+    total_tokens = int(sum(m["total_tokens"] for m in metas))
+    meta = {
+        "format": SHARDS_FORMAT,
+        "version": SHARDS_VERSION,
+        "n_shards": len(jobs),
+        "n_docs": len(filenames),
+        "n_terms": len(terms),
+        "total_tokens": total_tokens,
+        "avgdl": total_tokens / max(1, len(filenames)),
+        "generation": manifest_generation(processed_dir),
+        "processed_dir": os.path.abspath(processed_dir),
+        "corpus": corpus,
+        "shards": [{"dir": _shard_name(i), "offset": lo, "n_docs": hi - lo} for i, (lo, hi) in enumerate(ranges)],
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    print(f"[INFO] {meta['n_shards']} shards built: {meta['n_docs']} docs, {meta['n_terms']} terms "
+          f"in {time.perf_counter() - start:.2f}s ({workers} workers) → {shards_dir}")
+    return meta
+
+# SHARD (berjalan di proses worker)
+class Shard:
+    """Satu shard: matriks tf dari index shard dengan idf/avgdl global; doc id lokal + offset = doc id global"""
+
+    def __init__(self, shard_dir, offset, n_docs, avgdl, terms, df):
+        self.reader = IndexReader(shard_dir)
+        self.offset = offset
+        self.matrix = TermDocMatrix.from_index(self.reader)
+        self.matrix.set_corpus_stats(n_docs, df[np.searchsorted(terms, self.matrix.terms)], avgdl)
+        self._boolean = None
+
+    def _local_ids(self, terms, vals):
+        """Term global (string) → term id lokal; term yang tidak ada di shard ini dilewati"""
+        local = self.matrix.terms
+        ids = np.searchsorted(local, terms).astype(np.int64) if len(terms) else np.empty(0, dtype=np.int64)
+        found = (ids < len(local)) & (local[np.minimum(ids, len(local) - 1)] == np.asarray(terms, dtype=str))
+        return ids[found], np.asarray(vals, dtype=np.float64)[found]
+
+    def top(self, terms, vals, k, weight, k1, b, prune):
+        start = time.perf_counter()
+        ids, vals = self._local_ids(terms, vals)
+        top, stats = self.matrix.top_vector(ids, vals, k, weight, k1, b, prune)
+        m = self.matrix
+        hits = [(self.offset + d, s, m.doc_ids[d], str(m.snippets[d])) for d, s in top]
+        return hits, stats, time.perf_counter() - start
+
+    def boolean(self, query, op, k):
+        """Dokumen yang cocok di shard ini (NOT relatif terhadap dokumen shard; gabungan = hasil global)"""
+        start = time.perf_counter()
+        if self._boolean is None:
+            self._boolean = BooleanIndex.from_reader(self.reader)
+        ast = boolean_query.parse_query(query, default_op=op)
+        docs = boolean_query.execute(boolean_query.plan(ast, self._boolean), self._boolean)
+        top = np.asarray(docs[:k], dtype=np.int64)
+        # skor sederhana seperti run_boolean_cli: jumlah kata query yang muncul di dokumen
+        scores = np.zeros(len(top))
+        for t in set(boolean_query.query_terms(ast)):
+            scores += np.isin(top, self.reader.postings(t)[0])
+        hits = [(self.offset + int(d), float(s), self.reader.doc_name(d), self.reader.snippet(d))
+                for d, s in zip(top, scores)]
+        return hits, len(docs), time.perf_counter() - start
+
+def _open_shard(shards_dir, meta, i):
+    info = meta["shards"][i]
+    terms = np.load(os.path.join(shards_dir, "terms.npy"), mmap_mode="r")
+    df = np.load(os.path.join(shards_dir, "df.npy"), mmap_mode="r")
+    return Shard(os.path.join(shards_dir, info["dir"]), info["offset"], meta["n_docs"], meta["avgdl"], terms, df)
+
+def _shard_worker(conn, shards_dir, meta, i):
+    """Loop proses worker: (method, args) → (True, hasil) / (False, pesan error); None = berhenti"""
+    shard = _open_shard(shards_dir, meta, i)
+    conn.send(True)
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        method, args = msg
+        try:
+            conn.send((True, getattr(shard, method)(*args)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+    conn.close()
+
+# KOORDINATOR
+class ShardedIndex:
+    """
+    Scatter-gather: query dibobot dengan statistik global, dikirim ke semua shard
+    sekaligus, top-k lokal digabung (skor turun, seri → doc id global naik, sama
+    dengan top_k_indices). processes=False menjalankan shard di proses ini (debug/uji).
+    """
+
+    def __init__(self, shards_dir=None, processes=True):
+        self.shards_dir = shards_dir or default_shards_dir()
+        with open(os.path.join(self.shards_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != SHARDS_FORMAT or self.meta.get("version") != SHARDS_VERSION:
+            raise ValueError(f"Format shard tidak dikenali di {self.shards_dir}: "
+                             f"{self.meta.get('format')} v{self.meta.get('version')}")
+        self.terms = np.load(os.path.join(self.shards_dir, "terms.npy"), mmap_mode="r")
+        self.df = np.load(os.path.join(self.shards_dir, "df.npy"), mmap_mode="r")
+        self.N = self.meta["n_docs"]
+        self.generation = self.meta["generation"]
+        self._idf = None
+        self._lock = threading.Lock()     # satu query dalam pipa worker pada satu waktu
+        self._shards, self._conns, self._procs = [], [], []
+        n = self.meta["n_shards"]
+        if processes:
+            for i in range(n):
+                parent, child = multiprocessing.Pipe()
+                proc = multiprocessing.Process(target=_shard_worker, args=(child, self.shards_dir, self.meta, i),
+                                               daemon=True)
+                proc.start()
+                child.close()
+                self._conns.append(parent)
+                self._procs.append(proc)
+            for conn in self._conns:
+                conn.recv()
+        else:
+            self._shards = [_open_shard(self.shards_dir, self.meta, i) for i in range(n)]
+
+    @staticmethod
+    def exists(shards_dir=None):
+        return os.path.exists(os.path.join(shards_dir or default_shards_dir(), "meta.json"))
+
+    def is_stale(self):
+        """True jika korpus processed yang tercatat di meta berubah sejak shard dibangun"""
+        corpus = self.meta.get("corpus")
+        return corpus is None or corpus != corpus_fingerprint(corpus["processed_dir"])
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+        self._conns, self._procs = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _broadcast(self, method, *args):
+        """Kirim ke semua shard dulu (paralel), baru kumpulkan jawaban"""
+        if self._shards:
+            return [getattr(shard, method)(*args) for shard in self._shards]
+        with self._lock:
+            for conn in self._conns:
+                conn.send((method, args))
+            replies = [conn.recv() for conn in self._conns]
+        for ok, value in replies:
+            if not ok:
+                raise ValueError(value)
+        return [value for _, value in replies]
+
+    def tfidf_idf(self):
+        if self._idf is None:
+            self._idf = tfidf_idf(self.N, self.df, sklearn_mask(self.terms))
+        return self._idf
+
+    def vectorize_query(self, query, weight="tfidf"):
+        """Vektor query terhadap kamus global → (term, bobot); norma query sama dengan engine tanpa shard"""
+        ids, vals = vectorize_query(query, self.terms, weight, self.tfidf_idf)
+        return [str(self.terms[i]) for i in ids], vals
+
+    def rank(self, query, k=5, weight="tfidf", k1=1.5, b=0.75, prune=False, stats=None):
+        """Top-k {doc_id, score, snippet} gabungan semua shard"""
+        if weight not in WEIGHTS:
+            raise ValueError(f"Skema bobot tidak dikenal: {weight} (pilihan: {', '.join(WEIGHTS)})")
+        with tracing.span("analyze"):
+            terms, vals = self.vectorize_query(query, weight)
+        with tracing.span("scatter_gather"):
+            parts = self._broadcast("top", terms, vals, k, weight, k1, b, prune)
+            self._trace_shards(parts)
+        with tracing.span("merge"):
+            top = heapq.nsmallest(k, (hit for hits, _, _ in parts for hit in hits), key=lambda h: (-h[1], h[0]))
+        query_stats = {"n_docs": self.N, "scored": sum(s["scored"] for _, s, _ in parts),
+                       "pruned": sum(s["pruned"] for _, s, _ in parts), "shards": len(parts),
+                       "mode": "sharded/" + ("blockmax" if any(s["mode"] == "blockmax" for _, s, _ in parts)
+                                             else "exhaustive")}
+        if stats is not None:
+            stats.update(query_stats)
+        if tracing.active():
+            tracing.count("docs_scored", query_stats["scored"])
+        return [{"doc_id": doc_id, "score": score, "snippet": snippet} for _, score, doc_id, snippet in top]
+
+    def boolean(self, query, k=5, op="OR"):
+        """Dokumen yang cocok (urut doc id global = nama file) + jumlah total kecocokan"""
+        with tracing.span("scatter_gather"):
+            parts = self._broadcast("boolean", query, op, k)
+            self._trace_shards(parts)
+        matched = sum(n for _, n, _ in parts)
+        tracing.count("docs_matched", matched)
+        # shard berupa rentang doc id berurutan → gabungan cukup disambung sesuai urutan shard
+        hits = [hit for hits, _, _ in parts for hit in hits][:k]
+        return [{"doc_id": doc_id, "score": score, "snippet": snippet} for _, score, doc_id, snippet in hits], matched
+
+    @staticmethod
+    def _trace_shards(parts):
+        """Waktu kerja tiap shard (diukur di worker) sebagai anak span scatter_gather"""
+        t = tracing.current()
+        if t is not None:
+            for i, part in enumerate(parts):
+                t.add_span(f"shard{i}", part[-1])
+
+# CLI
+def _bench(args):
+    """Latensi unsharded (TermDocMatrix.rank) vs sharded + cek skor identik"""
+    import random
+    reader = IndexReader(args.index)
+    engine = TermDocMatrix.from_index(reader)
+    rng = random.Random(args.seed)
+    df = np.diff(reader.term_ptr)
+    # term dengan df ≥ 2 sebagai bahan query (seperti benchmark.py: query cenderung memakai term umum)
+    pool = [str(t) for t, d in zip(reader.terms, df) if d >= 2] or [str(t) for t in reader.terms]
+    queries = [" ".join(rng.choice(pool) for _ in range(rng.randint(1, 4))) for _ in range(args.queries)]
+    with ShardedIndex(args.shards) as sharded:
+        if sharded.N != engine.N:
+            raise SystemExit(f"[ERROR] index ({engine.N} docs) dan shard ({sharded.N} docs) berbeda korpus")
+        for weight in args.weights:
+            engine.weighted(weight, args.k1, args.b)
+            sharded.rank(queries[0], args.k, weight, args.k1, args.b)   # pemanasan worker
+            mismatched = 0
+            times = {"unsharded": [], "sharded": []}
+            for q in queries:
+                t0 = time.perf_counter()
+                expected = engine.rank(q, args.k, weight, args.k1, args.b, prune=args.prune)
+                t1 = time.perf_counter()
+                got = sharded.rank(q, args.k, weight, args.k1, args.b, prune=args.prune)
+                t2 = time.perf_counter()
+                times["unsharded"].append(t1 - t0)
+                times["sharded"].append(t2 - t1)
+                # skor identik bit per bit (block-max menjumlahkan kontribusi term dengan urutan yang sama
+                # dengan scoring penuh); toleransi hanya untuk berjaga-jaga
+                if ([r["doc_id"] for r in expected] != [r["doc_id"] for r in got]
+                        or not np.allclose([r["score"] for r in expected], [r["score"] for r in got], rtol=1e-12, atol=0)):
+                    mismatched += 1
+            line = ", ".join(f"{name} p50={np.percentile(v, 50) * 1000:.3f}ms p95={np.percentile(v, 95) * 1000:.3f}ms"
+                             for name, v in times.items())
+            print(f"[BENCH] {weight:<16} {line}, speedup={np.mean(times['unsharded']) / np.mean(times['sharded']):.2f}x, "
+                  f"mismatched={mismatched}/{len(queries)}")
+
+def main():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Index ter-shard + scatter-gather top-k multi-proses")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="bagi korpus ke N shard dan bangun index tiap shard paralel")
+    p_build.add_argument("--processed", default=os.path.join(base, "data", "processed"))
+    p_build.add_argument("--out", default=default_shards_dir())
+    p_build.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    p_build.add_argument("--workers", type=int, default=None, help="proses build (default: satu per shard, maks CPU)")
+    p_query = sub.add_parser("query", help="query ke semua shard")
+    p_query.add_argument("--shards", default=default_shards_dir())
+    p_query.add_argument("--query", required=True)
+    p_query.add_argument("--model", choices=["vsm", "boolean"], default="vsm")
+    p_query.add_argument("--weight", choices=WEIGHTS, default="tfidf")
+    p_query.add_argument("--op", choices=["AND", "OR"], default="OR")
+    p_query.add_argument("--k", type=int, default=5)
+    p_query.add_argument("--k1", type=float, default=1.5)
+    p_query.add_argument("--b", type=float, default=0.75)
+    p_query.add_argument("--prune", action="store_true")
+    p_bench = sub.add_parser("bench", help="latensi sharded vs index tunggal + cek skor identik")
+    p_bench.add_argument("--shards", default=default_shards_dir())
+    p_bench.add_argument("--index", default=default_index_dir(), help="index tunggal korpus yang sama")
+    p_bench.add_argument("--weights", nargs="+", choices=WEIGHTS, default=list(WEIGHTS))
+    p_bench.add_argument("--queries", type=int, default=200)
+    p_bench.add_argument("--k", type=int, default=10)
+    p_bench.add_argument("--k1", type=float, default=1.5)
+    p_bench.add_argument("--b", type=float, default=0.75)
+    p_bench.add_argument("--prune", action="store_true")
+    p_bench.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        build_shards(args.processed, args.out, args.shards, args.workers)
+    elif args.cmd == "query":
+        with ShardedIndex(args.shards) as sharded:
+            stats = {}
+            if args.model == "boolean":
+                results, matched = sharded.boolean(args.query, args.k, args.op)
+                print(f"[INFO] {matched} docs matched across {sharded.meta['n_shards']} shards")
+            else:
+                results = sharded.rank(args.query, args.k, args.weight, args.k1, args.b, args.prune, stats)
+            for i, r in enumerate(results, 1):
+                print(f"{i}. {r['doc_id']:<30} score={r['score']:.4f}")
+            if stats:
+                print(f"[INFO] {stats['mode']}: scored {stats['scored']} / {stats['n_docs']} docs "
+                      f"({stats['shards']} shards)")
+    else:
+        _bench(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# src/sweep.py
+# Sweep parameter evaluasi: grid konfigurasi (model tfidf / tfidf_sublinear / bm25,
+# k1 dan b BM25, analyzer query, k) dievaluasi paralel di process pool. Matriks tf
+# korpus dan query gold dibangun sekali di proses utama lalu dibagikan ke worker
+# lewat initializer. Satu ranking per konfigurasi dipakai untuk semua nilai k.
+# Output: ringkasan + metrik per query (CSV dan JSON) dengan uji signifikansi
+# paired bootstrap terhadap konfigurasi baseline.
+#
+#   python src/sweep.py --k1 0.5:2.0:0.1 --b 0:1:0.05 --k 5 10 --workers 4
+import os
+import csv
+import json
+import time
+import argparse
+from multiprocessing import Pool
+import numpy as np
+
+from term_matrix import TermDocMatrix
+from evaluation import (MODELS, model_matrices, query_matrix, rank_batch, relevance_keys, hits_matrix,
+                        metrics_from_hits, summarize)
+
+ANALYZERS = ("split", "preprocess")
+# kunci metrik per query (metrics_from_hits) → nama kolom ringkasan (summarize)
+METRICS = {"P": "Precision@k", "R": "Recall@k", "AP": "MAP@k", "nDCG": "nDCG@k", "RR": "MRR@k"}
+
+def parse_grid(values):
+    """['1.2', '0:1:0.25'] → [0.0, 0.25, 0.5, 0.75, 1.0, 1.2]; start:stop:step inklusif stop"""
+    out = []
+    for v in values:
+        if ":" in str(v):
+            start, stop, step = (float(x) for x in str(v).split(":"))
+            n = int(round((stop - start) / step)) + 1
+            out.extend(round(start + i * step, 10) for i in range(n))
+        else:
+            out.append(float(v))
+    return sorted(set(out))
+
+def analyze_queries(queries, analyzer):
+    if analyzer == "split":
+        # seperti evaluate_all: query gold dianggap sudah berupa token hasil preprocess
+        return list(queries)
+    if analyzer == "preprocess":
+        from preprocess import preprocess_text
+        return [" ".join(preprocess_text(q)) for q in queries]
+    raise ValueError(f"Analyzer tidak dikenal: {analyzer} (pilihan: {', '.join(ANALYZERS)})")
+
+def build_grid(models, k1s, bs, analyzers):
+    """Konfigurasi scoring; k tidak termasuk (ranking terpanjang dipotong per k)"""
+    grid = []
+    for analyzer in analyzers:
+        for model in models:
+            if model == "bm25":
+                grid.extend({"model": model, "analyzer": analyzer, "k1": k1, "b": b} for k1 in k1s for b in bs)
+            else:
+                grid.append({"model": model, "analyzer": analyzer, "k1": None, "b": None})
+    return grid
+
+def config_id(config):
+    parts = [config["model"], config["analyzer"]]
+    if config["model"] == "bm25":
+        parts += [f"k1={config['k1']:g}", f"b={config['b']:g}"]
+    return "/".join(parts)
+
+# WORKER
+_state = None
+_cache = {}
+
+def _init_worker(state):
+    """Initializer pool: state (matriks tf, query, relevansi) diterima sekali per worker"""
+    global _state
+    _state = state
+    _cache.clear()
+
+def _evaluate_config(config):
+    """Satu konfigurasi → (config, {k: metrik per query})"""
+    state = _state
+    model, analyzer = config["model"], config["analyzer"]
+    queries = state["queries"][analyzer]
+    matrix = state["matrix"]
+    if model == "bm25":
+        # bobot BM25 dihitung per (k1, b) tanpa disimpan; matriks query cukup sekali per analyzer
+        doc_matrix = matrix.weighted("bm25", config["k1"], config["b"], cache=False)
+        if (model, analyzer) not in _cache:
+            _cache[(model, analyzer)] = query_matrix(queries, state["term_index"], "bm25")
+        q_mat = _cache[(model, analyzer)]
+    else:
+        if (model, analyzer) not in _cache:
+            _cache[(model, analyzer)] = model_matrices(matrix, queries, state["term_index"], model)
+        doc_matrix, q_mat = _cache[(model, analyzer)]
+    ks = state["ks"]
+    top = rank_batch(q_mat, doc_matrix, max(ks))
+    hits = hits_matrix(top, state["rel_keys"], matrix.N)
+    return config, {k: metrics_from_hits(hits[:, :k], state["n_relevant"], k) for k in ks}
+
+# SIGNIFIKANSI
+def paired_bootstrap(per_query, baseline, n_resamples=10000, seed=0, chunk=1000):
+    """
+    Paired bootstrap atas query. per_query: C × Q, baseline: Q. Return (delta, p):
+    delta = selisih rata-rata terhadap baseline, p = p-value dua sisi (distribusi
+    bootstrap digeser ke hipotesis nol: fraksi resample dengan |mean* − delta| ≥ |delta|).
+    Resample yang sama dipakai untuk semua konfigurasi.
+    """
+    diffs = np.atleast_2d(per_query) - baseline
+    n_configs, n_queries = diffs.shape
+    delta = diffs.mean(axis=1)
+    if n_queries == 0:
+        return delta, np.ones(n_configs)
+    rng = np.random.default_rng(seed)
+    extreme = np.zeros(n_configs, dtype=np.int64)
+    for start in range(0, n_resamples, chunk):
+        size = min(chunk, n_resamples - start)
+        # jumlah kemunculan tiap query per resample (B × Q) → rata-rata resample = counts @ diffs.T / Q
+        counts = rng.multinomial(n_queries, np.full(n_queries, 1.0 / n_queries), size=size)
+        boot = counts @ diffs.T / n_queries
+        extreme += (np.abs(boot - delta) >= np.abs(delta) - 1e-12).sum(axis=0)
+    return delta, extreme / n_resamples
+
+# SWEEP
+def run_sweep(processed_dir, gold_path, grid, ks, workers=1, chunksize=16):
+    """Evaluasi semua konfigurasi grid; return (queries, [(config, {k: metrik per query})])"""
+    matrix = TermDocMatrix.from_processed_dir(processed_dir)
+    with open(gold_path, encoding="utf-8") as f:
+        gold = json.load(f)
+    queries = list(gold.keys())
+    relevant = [gold[q] for q in queries]
+    doc_index = {d: i for i, d in enumerate(matrix.doc_ids)}
+    state = {
+        "matrix": matrix,
+        "term_index": {str(t): i for i, t in enumerate(matrix.terms)},
+        "queries": {a: analyze_queries(queries, a) for a in sorted({c["analyzer"] for c in grid})},
+        "rel_keys": relevance_keys(relevant, doc_index),
+        "n_relevant": [len(r) for r in relevant],
+        "ks": sorted(set(ks)),
+    }
+    if workers > 1:
+        with Pool(workers, initializer=_init_worker, initargs=(state,)) as pool:
+            results = list(pool.imap(_evaluate_config, grid, chunksize=chunksize))
+    else:
+        _init_worker(state)
+        results = [_evaluate_config(c) for c in grid]
+    return queries, results
+
+def build_table(queries, results, baseline, metric="AP", n_resamples=10000, seed=0, alpha=0.05):
+    """Baris ringkasan per (konfigurasi, k) + uji terhadap baseline dengan k yang sama"""
+    base_id = config_id(baseline)
+    by_id = {config_id(c): per_k for c, per_k in results}
+    if base_id not in by_id:
+        raise ValueError(f"Baseline {base_id} tidak ada di grid.")
+    rows = []
+    for k in sorted(by_id[base_id]):
+        per_query = np.array([per_k[k][metric] for _, per_k in results])
+        delta, p = paired_bootstrap(per_query, by_id[base_id][k][metric], n_resamples, seed)
+        for i, (config, per_k) in enumerate(results):
+            row = {"config": config_id(config), **config, "k": k, **summarize(per_k[k]),
+                   "delta": float(delta[i]), "p_value": float(p[i]),
+                   "significant": bool(p[i] < alpha and config_id(config) != base_id)}
+            row["per_query"] = {name: per_k[k][name].tolist() for name in METRICS}
+            rows.append(row)
+    return rows
+
+def write_outputs(rows, queries, out_dir, meta):
+    os.makedirs(out_dir, exist_ok=True)
+    summary_cols = ["config", "model", "analyzer", "k1", "b", "k", *METRICS.values(), "F1",
+                    "delta", "p_value", "significant"]
+    with open(os.path.join(out_dir, "summary.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=summary_cols, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(os.path.join(out_dir, "per_query.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["config", "k", "query", *METRICS.values()])
+        for row in rows:
+            for qi, query in enumerate(queries):
+                writer.writerow([row["config"], row["k"], query, *(row["per_query"][m][qi] for m in METRICS)])
+    with open(os.path.join(out_dir, "sweep.json"), "w", encoding="utf-8") as f:
+        json.dump(dict(meta, queries=queries, results=rows), f, ensure_ascii=False, indent=1)
+
+def main():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Sweep parameter evaluasi (paralel) + paired bootstrap")
+    parser.add_argument("--processed", default=os.path.join(base, "data", "processed"))
+    parser.add_argument("--gold", default=os.path.join(base, "data", "gold.json"))
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=MODELS)
+    parser.add_argument("--k1", nargs="+", default=["0.5:2.0:0.25"], help="nilai atau rentang start:stop:step")
+    parser.add_argument("--b", nargs="+", default=["0:1:0.25"], help="nilai atau rentang start:stop:step")
+    parser.add_argument("--analyzers", nargs="+", choices=ANALYZERS, default=["split"])
+    parser.add_argument("--k", nargs="+", type=int, default=[5])
+    parser.add_argument("--baseline", default="bm25:1.5:0.75",
+                        help="model[:k1:b] pembanding, analyzer pertama (default: setelan evaluate_all)")
+    parser.add_argument("--metric", choices=list(METRICS), default="AP", help="metrik untuk uji signifikansi")
+    parser.add_argument("--bootstrap", type=int, default=10000, help="jumlah resample")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default=os.path.join(base, "reports", "sweep"))
+    args = parser.parse_args()
+
+    model, *params = args.baseline.split(":")
+    baseline = {"model": model, "analyzer": args.analyzers[0],
+                "k1": float(params[0]) if model == "bm25" else None,
+                "b": float(params[1]) if model == "bm25" else None}
+    grid = build_grid(args.models, parse_grid(args.k1), parse_grid(args.b), args.analyzers)
+    if config_id(baseline) not in {config_id(c) for c in grid}:
+        grid.append(baseline)
+
+    start = time.perf_counter()
+    queries, results = run_sweep(args.processed, args.gold, grid, args.k, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    rows = build_table(queries, results, baseline, args.metric, args.bootstrap, args.seed, args.alpha)
+    meta = {"baseline": config_id(baseline), "metric": METRICS[args.metric], "bootstrap": args.bootstrap,
+            "alpha": args.alpha, "seed": args.seed, "configs": len(grid), "seconds": round(elapsed, 3)}
+    write_outputs(rows, queries, args.out, meta)
+
+    print(f"[INFO] {len(grid)} configs x {len(set(args.k))} k x {len(queries)} queries "
+          f"in {elapsed:.2f}s ({args.workers} workers) → {args.out}")
+    column = METRICS[args.metric]
+    for k in sorted(set(args.k)):
+        best = sorted((r for r in rows if r["k"] == k), key=lambda r: -r[column])[:10]
+        print(f"\n=== top {len(best)} by {column} (k={k}, baseline {meta['baseline']}) ===")
+        for r in best:
+            mark = "*" if r["significant"] else " "
+            print(f"{r['config']:<36} {column}={r[column]:.4f}  delta={r['delta']:+.4f}  p={r['p_value']:.3f}{mark}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# src/sysinfo.py
+# Pengukuran memori proses yang dipakai bersama oleh benchmark.py dan ingest.py.
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def _own_peak_rss_mb():
+    # Linux: VmHWM di-reset saat exec (ru_maxrss ikut terbawa dari proses induk)
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    scale = 1 / 2**20 if sys.platform == "darwin" else 1 / 1024   # macOS: byte, Linux: KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+def peak_rss_mb(children=True):
+    """Peak RSS proses ini (dan child process yang sudah selesai, mis. worker preprocessing) dalam MB"""
+    own = _own_peak_rss_mb()
+    if own is None:
+        return None
+    if children and resource is not None:
+        scale = 1 / 2**20 if sys.platform == "darwin" else 1 / 1024
+        own = max(own, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+    return round(own, 1)
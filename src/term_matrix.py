@@ -0,0 +1,394 @@
+# src/term_matrix.py
+# Satu matriks term-frequency mentah (CSR term × doc, tata letak sama dengan postings
+# index_store) untuk semua skema bobot: tfidf, tfidf_sublinear dan bm25. Bobot turunan
+# dihitung sekali saat pertama dipakai lalu di-cache; struktur sparse (indices/indptr)
+# dipakai bersama sehingga tiap skema hanya menambah satu array data.
+import os
+import re
+import json
+import shutil
+import argparse
+from collections import Counter, OrderedDict
+import numpy as np
+from topk import BlockMax, blockmax_topk, top_k_indices
+from result_cache import query_key
+from explain import Explainer
+from packed_store import iter_processed, manifest_generation, corpus_fingerprint
+import tracing
+
+WEIGHTS = ("tfidf", "tfidf_sublinear", "bm25")
+
+# jumlah skema (weight, k1, b) yang cache turunannya (CSR bobot, Explainer, BlockMax) disimpan;
+# k1/b bebas per request tidak boleh menumpuk matriks tanpa batas
+MAX_SCHEMES = 4
+
+MATRIX_FORMAT = "stki-term-matrix"
+MATRIX_VERSION = 1
+
+def default_matrix_dir():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, "data", "index", "matrix")
+
+# token pattern default TfidfVectorizer: skema tfidf hanya memakai token \w\w+
+_SKLEARN_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+def tfidf_idf(n_docs, df, mask):
+    """idf smooth ala TfidfVectorizer; term yang tidak lolos token pattern sklearn diberi 0"""
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+    return np.where(mask, idf, 0.0)
+
+def bm25_idf(n_docs, df):
+    return np.log((n_docs - df + 0.5) / (df + 0.5) + 1e-9)
+
+def sklearn_mask(terms):
+    return np.array([bool(_SKLEARN_TOKEN_RE.fullmatch(str(t))) for t in terms], dtype=bool)
+
+def vectorize_query(query, terms, weight="tfidf", idf=None):
+    """
+    (term id, bobot query) terurut term id terhadap kamus terms.
+    idf: fungsi tanpa argumen → idf tfidf per term (hanya dipanggil untuk skema tfidf).
+    """
+    if weight == "bm25":
+        tokens = query.lower().split()
+    else:
+        tokens = _SKLEARN_TOKEN_RE.findall(query.lower().strip())
+    counts = Counter()
+    for t in tokens:
+        i = int(np.searchsorted(terms, t))
+        if i < len(terms) and terms[i] == t:
+            counts[i] += 1
+    ids = np.array(sorted(counts), dtype=np.int64)
+    vals = np.array([counts[i] for i in ids], dtype=np.float64)
+    if weight != "bm25" and len(ids):
+        if weight == "tfidf_sublinear":
+            vals = 1 + np.log(vals)
+        vals = vals * idf()[ids]
+        norm = np.linalg.norm(vals)
+        vals = vals / norm if norm > 0 else vals
+    return ids, vals
+
+def _scheme_key(weight, k1, b):
+    return (weight, k1, b) if weight == "bm25" else (weight,)
+
+class TermDocMatrix:
+    def __init__(self, terms, tf, doc_lens, doc_ids, snippets, generation=0, corpus=None):
+        self.terms = terms            # array term terurut (baris → term)
+        self.tf = tf                  # CSR term × doc berisi tf mentah
+        self.doc_lens = np.asarray(doc_lens, dtype=np.float64)
+        self.doc_ids = doc_ids
+        self.snippets = snippets
+        self.generation = generation
+        self.corpus = corpus          # sidik sumber (packed_store.corpus_fingerprint / IndexReader.fingerprint)
+        self._weighted = {}           # (weight, k1, b) → CSR bobot (struktur sama dengan tf)
+        self._explainers = {}         # (weight, k1, b) → Explainer (top-N term per dokumen)
+        self._block_max = {}          # (weight, k1, b) → topk.BlockMax untuk rank(prune=True)
+        self._schemes = OrderedDict() # LRU kunci skema di atas; entri tertua dibuang dari ketiganya
+        self._sklearn_terms = None
+        self.corpus_stats = None      # (n_docs, df per term, avgdl) global; None → statistik matriks ini
+        self.last_query_stats = None
+        self.result_cache = None      # result_cache.ResultCache opsional di depan rank()
+        self.doc_store = None         # doc_store.DocStore opsional → snippet bias-query + highlight
+
+    @property
+    def N(self):
+        return self.tf.shape[1]
+
+    # SUMBER DATA
+    @classmethod
+    def from_index(cls, index):
+        """Tanpa salinan: postings index_store (term_ptr/post_docs/post_tf) sudah berupa CSR term × doc"""
+        from scipy.sparse import csr_matrix
+        tf = csr_matrix((index.post_tf, index.post_docs, index.term_ptr),
+                        shape=(len(index.terms), index.N), copy=False)
+        return cls(index.terms, tf, index.doc_lens, [str(d) for d in index.doc_ids],
+                   index.snippets, index.generation, index.fingerprint())
+
+    @classmethod
+    def from_processed_dir(cls, processed_dir):
+        with tracing.span("load_corpus"):
+            return cls._from_processed_dir(processed_dir)
+
+    @classmethod
+    def _from_processed_dir(cls, processed_dir):
+        from scipy.sparse import csr_matrix
+        corpus = corpus_fingerprint(processed_dir)
+        vocab = {}
+        rows, cols, vals = [], [], []
+        doc_ids, doc_lens, snippets = [], [], []
+        for fname, text in iter_processed(processed_dir):
+            text = text.strip()
+            tokens = text.split()
+            doc = len(doc_ids)
+            doc_ids.append(fname)
+            doc_lens.append(len(tokens))
+            snippets.append(text[:120].replace("\n", " "))
+            for term, count in Counter(tokens).items():
+                rows.append(vocab.setdefault(term, len(vocab)))
+                cols.append(doc)
+                vals.append(count)
+
+        terms = sorted(vocab)
+        remap = np.empty(len(vocab), dtype=np.int64)
+        for new_id, term in enumerate(terms):
+            remap[vocab[term]] = new_id
+        tf = csr_matrix(
+            (np.array(vals, dtype=np.int32), (remap[np.array(rows, dtype=np.int64)], np.array(cols, dtype=np.int64))),
+            shape=(len(terms), len(doc_ids)),
+        )
+        tf.sort_indices()
+        generation = manifest_generation(processed_dir)
+        print(f"[INFO] Loaded {len(doc_ids)} documents.")
+        return cls(np.array(terms, dtype=str), tf, doc_lens, doc_ids, np.array(snippets, dtype=str), generation,
+                   corpus)
+
+    # SIMPAN / MUAT (array .npy, bisa mmap) → start berikutnya tanpa memindai korpus
+    def save(self, path):
+        """
+        Tulis ke folder sementara lalu tukar dengan os.replace: pembaca melihat matriks lama
+        atau baru secara utuh, tidak pernah campuran (meta.json ditulis terakhir di folder baru)
+        """
+        path = path.rstrip(os.sep)
+        tmp, old = path + ".tmp", path + ".old"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        arrays = {
+            "terms": np.asarray(self.terms, dtype=str),
+            "tf_data": self.tf.data,
+            "tf_indices": self.tf.indices,
+            "tf_indptr": self.tf.indptr,
+            "doc_lens": self.doc_lens,
+            "doc_ids": np.array(self.doc_ids, dtype=str),
+            "snippets": np.asarray(self.snippets, dtype=str),
+        }
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp, name + ".npy"), arr)
+        meta = {"format": MATRIX_FORMAT, "version": MATRIX_VERSION, "n_terms": self.tf.shape[0], "n_docs": self.N,
+                "generation": self.generation, "corpus": self.corpus}
+        # meta.json ditulis terakhir: matriks dianggap valid hanya jika meta ada
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        # folder lama disingkirkan dengan rename (proses yang masih mmap tetap membaca inode lama)
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        from scipy.sparse import csr_matrix
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != MATRIX_FORMAT or meta.get("version") != MATRIX_VERSION:
+            raise ValueError(f"Format term matrix tidak dikenali di {path}")
+        mode = "r" if mmap else None
+        arr = lambda name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mode)
+        tf = csr_matrix((arr("tf_data"), arr("tf_indices"), arr("tf_indptr")),
+                        shape=(meta["n_terms"], meta["n_docs"]), copy=False)
+        return cls(arr("terms"), tf, arr("doc_lens"), [str(d) for d in arr("doc_ids")], arr("snippets"),
+                   meta["generation"], meta.get("corpus"))
+
+    @classmethod
+    def open(cls, processed_dir, path=None):
+        """
+        Matriks tersimpan jika dibangun dari korpus yang sama dan belum berubah; jika
+        tidak, pindai korpus di memori. Read-only: matriks hanya ditulis oleh
+        `python src/term_matrix.py build`.
+        """
+        path = path or default_matrix_dir()
+        if os.path.exists(os.path.join(path, "meta.json")):
+            try:
+                engine = cls.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                # mis. sedang ditukar oleh build di proses lain
+                print(f"[WARN] saved term matrix unreadable ({e}); rescanning")
+            else:
+                if engine.corpus == corpus_fingerprint(processed_dir):
+                    print(f"[INFO] Loaded term matrix {engine.tf.shape} (terms x docs) from {path}")
+                    return engine
+                print("[WARN] saved term matrix is stale or built from another corpus; rescanning "
+                      "(rebuild: python src/term_matrix.py build)")
+        return cls.from_processed_dir(processed_dir)
+
+    # BOBOT TURUNAN (lazy + cache)
+    def weighted(self, weight="tfidf", k1=1.5, b=0.75, cache=True):
+        """cache=False: matriks dibuat tanpa disimpan (mis. sweep ribuan kombinasi k1/b)"""
+        from scipy.sparse import csr_matrix
+        if weight not in WEIGHTS:
+            raise ValueError(f"Skema bobot tidak dikenal: {weight} (pilihan: {', '.join(WEIGHTS)})")
+        key = _scheme_key(weight, k1, b)
+        if key in self._weighted:
+            self._touch(key)
+            return self._weighted[key]
+        with tracing.span("weights"):
+            if weight == "bm25":
+                data = self._bm25_data(k1, b)
+            else:
+                data = self._tfidf_data(sublinear=weight == "tfidf_sublinear")
+        matrix = csr_matrix((data, self.tf.indices, self.tf.indptr), shape=self.tf.shape, copy=False)
+        if cache:
+            self._touch(key)
+            self._weighted[key] = matrix
+            print(f"[INFO] {weight} weights derived from shared tf matrix {self.tf.shape} (terms x docs)")
+        return matrix
+
+    def set_corpus_stats(self, n_docs, df, avgdl):
+        """
+        Statistik korpus dari luar matriks ini (shard, lihat shards.py): idf dan avgdl
+        dihitung dari seluruh korpus sehingga bobot sama dengan engine tanpa shard.
+        df sejajar dengan self.terms.
+        """
+        self.corpus_stats = (n_docs, np.asarray(df), float(avgdl))
+        self._weighted.clear()
+        self._explainers.clear()
+        self._block_max.clear()
+        self._schemes.clear()
+
+    def _touch(self, key):
+        """Tandai skema baru dipakai; skema tertua di atas MAX_SCHEMES dibuang dari semua cache"""
+        self._schemes[key] = None
+        self._schemes.move_to_end(key)
+        while len(self._schemes) > MAX_SCHEMES:
+            old, _ = self._schemes.popitem(last=False)
+            for cache in (self._weighted, self._explainers, self._block_max):
+                cache.pop(old, None)
+
+    def _stats(self):
+        """(jumlah dokumen, df per term, avgdl) untuk idf/normalisasi panjang"""
+        if self.corpus_stats is not None:
+            return self.corpus_stats
+        return self.N, self._df(), float(self.doc_lens.sum()) / max(1, self.N)
+
+    def _df(self):
+        return np.diff(self.tf.indptr)
+
+    def _row_of_entry(self):
+        return np.repeat(np.arange(self.tf.shape[0]), self._df())
+
+    def tfidf_idf(self):
+        n_docs, df, _ = self._stats()
+        return tfidf_idf(n_docs, df, self._sklearn_mask())
+
+    def _sklearn_mask(self):
+        if self._sklearn_terms is None:
+            self._sklearn_terms = sklearn_mask(self.terms)
+        return self._sklearn_terms
+
+    def _tfidf_data(self, sublinear):
+        f = np.asarray(self.tf.data, dtype=np.float64)
+        if sublinear:
+            f = 1 + np.log(f)
+        data = f * self.tfidf_idf()[self._row_of_entry()]
+        # normalisasi l2 per dokumen (kolom)
+        norms = np.sqrt(np.bincount(self.tf.indices, weights=data ** 2, minlength=self.N))
+        norms[norms == 0] = 1.0
+        return data / norms[self.tf.indices]
+
+    def _bm25_data(self, k1, b):
+        n_docs, df, avgdl = self._stats()
+        idf = bm25_idf(n_docs, df)
+        f = np.asarray(self.tf.data, dtype=np.float64)
+        denom = f + k1 * (1 - b + b * self.doc_lens[self.tf.indices] / avgdl)
+        return idf[self._row_of_entry()] * (f * (k1 + 1)) / denom
+
+    # QUERY
+    def vectorize_query(self, query, weight="tfidf"):
+        """(term id, bobot query) terurut term id"""
+        return vectorize_query(query, self.terms, weight, self.tfidf_idf)
+
+    def score(self, query, weight="tfidf", k1=1.5, b=0.75):
+        """Skor semua dokumen: kombinasi linear baris matriks bobot untuk term query"""
+        ids, vals = self.vectorize_query(query, weight)
+        return self.score_vector(ids, vals, weight, k1, b)
+
+    def score_vector(self, ids, vals, weight="tfidf", k1=1.5, b=0.75):
+        from scipy.sparse import csr_matrix
+        W = self.weighted(weight, k1, b)
+        q_vec = csr_matrix((vals, (np.zeros(len(ids), dtype=np.int64), ids)), shape=(1, W.shape[0]))
+        return np.asarray((q_vec @ W).todense()).ravel()
+
+    def rank(self, query, k=5, weight="tfidf", k1=1.5, b=0.75, prune=False, stats=None):
+        """
+        Top-k {doc_id, score, snippet}; prune=True memakai block-max (topk.py).
+        stats (dict opsional) diisi statistik query ini — aman dipakai antar thread,
+        berbeda dengan last_query_stats yang dibagi.
+        """
+        with tracing.span("analyze"):
+            ids, vals = self.vectorize_query(query, weight)
+        cache = self.result_cache
+        if cache is not None:
+            key = query_key("matrix", ids, vals, weight, *((k1, b) if weight == "bm25" else ()))
+            with tracing.span("cache"):
+                cached = cache.get(key, k, self.generation)
+            if cached is not None:
+                query_stats = {"n_docs": self.N, "scored": 0, "pruned": 0, "mode": "cache"}
+                self.last_query_stats = query_stats
+                if stats is not None:
+                    stats.update(query_stats)
+                return cached
+        top, query_stats = self.top_vector(ids, vals, k, weight, k1, b, prune)
+        self.last_query_stats = query_stats
+        if stats is not None:
+            stats.update(query_stats)
+        results = [{"doc_id": self.doc_ids[d], "score": s, "snippet": str(self.snippets[d])} for d, s in top]
+        if self.doc_store is not None:
+            terms = [str(self.terms[t]) for t in ids]
+            with tracing.span("snippets"):
+                for r, (d, _) in zip(results, top):
+                    snip = self.doc_store.snippet(d, terms)
+                    r["snippet"], r["highlights"] = snip["text"], snip["highlights"]
+        if cache is not None:
+            cache.put(key, k, results, self.generation)
+        return results
+
+    def top_vector(self, ids, vals, k=5, weight="tfidf", k1=1.5, b=0.75, prune=False):
+        """Top-k [(doc, skor)] + statistik untuk vektor query yang sudah jadi (dipakai juga oleh shard)"""
+        top, query_stats = None, None
+        W = self.weighted(weight, k1, b)
+        if prune:
+            key = _scheme_key(weight, k1, b)
+            self._touch(key)
+            if key not in self._block_max:
+                self._block_max[key] = BlockMax.from_matrix(W)
+            with tracing.span("score"):
+                top, query_stats = blockmax_topk(W, self._block_max[key], ids, vals, k)
+            query_stats["mode"] = "blockmax" if top is not None else "exhaustive"
+        if top is None:
+            with tracing.span("score"):
+                scores = self.score_vector(ids, vals, weight, k1, b)
+            with tracing.span("sort"):
+                top = [(int(i), float(scores[i])) for i in top_k_indices(scores, k)]
+            query_stats = {"n_docs": self.N, "scored": self.N, "pruned": 0, "mode": "exhaustive"}
+        if tracing.active():
+            tracing.count("docs_scored", query_stats["scored"])
+            tracing.count("postings_read", int(sum(W.indptr[t + 1] - W.indptr[t] for t in ids)))
+        return top, query_stats
+
+    def explainer(self, weight="tfidf", k1=1.5, b=0.75):
+        key = _scheme_key(weight, k1, b)
+        if key not in self._explainers:
+            self._explainers[key] = Explainer(self.weighted(weight, k1, b), self.terms, term_major=True)
+        self._touch(key)
+        return self._explainers[key]
+
+    def top_terms(self, doc, weight="tfidf", top_n=5, k1=1.5, b=0.75):
+        """Term dengan bobot tertinggi di dokumen doc (dihitung per dokumen yang diminta, di-cache per skema)"""
+        return self.explainer(weight, k1, b).top_terms(doc, top_n)
+
+    def explain(self, doc, query, weight="tfidf", k1=1.5, b=0.75, top_n=5):
+        """Rincian skor dokumen per term query + top term dokumen"""
+        ids, vals = self.vectorize_query(query, weight)
+        return self.explainer(weight, k1, b).explain(doc, ids, vals, top_n)
+
+# BUILD
+if __name__ == "__main__":
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Matriks tf bersama: simpan hasil scan data/processed")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--processed", default=os.path.join(base, "data", "processed"))
+    parser.add_argument("--out", default=default_matrix_dir())
+    args = parser.parse_args()
+
+    engine = TermDocMatrix.from_processed_dir(args.processed)
+    engine.save(args.out)
+    print(f"[INFO] term matrix {engine.tf.shape} (terms x docs) saved to {args.out}")
@@ -0,0 +1,209 @@
+# src/topk.py
+# Top-k dengan dynamic pruning block-max. Doc id dibagi menjadi blok tetap berisi
+# BLOCK_SIZE dokumen; untuk tiap term disimpan bobot maksimum per blok sehingga batas
+# atas skor sebuah blok = Σ bobot query × maks blok term query. Blok diskor tepat
+# (vektor numpy) mulai dari batas atas tertinggi; blok yang batas atasnya tidak bisa
+# melewati skor ke-k tidak pernah dihitung.
+import os
+import numpy as np
+
+BLOCK_SIZE = 32
+# jika blok yang masih harus diskor melebihi fraksi ini, perkalian sparse penuh lebih cepat
+MAX_BLOCK_FRACTION = 0.25
+
+def top_k_indices(scores, k):
+    """
+    Indeks k skor tertinggi tanpa sort penuh (argpartition); seri diurutkan
+    berdasarkan indeks dokumen, sama dengan sort stabil atas nama file.
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        kth = np.partition(scores, n - k)[n - k]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:k]]
+
+class BlockMax:
+    """
+    Bobot maksimum per (term, blok doc id) dari matriks bobot CSR term × doc, disimpan
+    sebagai CSR term × blok (ptr, blocks, maxes). Bobot negatif (idf BM25) dipotong ke
+    0 karena dokumen tanpa term menyumbang 0; floor = bobot terkecil (<= 0) per term.
+    """
+    def __init__(self, ptr, blocks, maxes, floor, n_docs, block_size=BLOCK_SIZE):
+        self.ptr = ptr
+        self.blocks = blocks
+        self.maxes = maxes
+        self.floor = floor
+        self.n_docs = int(n_docs)
+        self.block_size = int(block_size)
+
+    @classmethod
+    def from_matrix(cls, matrix, block_size=BLOCK_SIZE):
+        if not matrix.has_sorted_indices:
+            matrix = matrix.sorted_indices()
+        n_terms, n_docs = matrix.shape
+        indptr = np.asarray(matrix.indptr)
+        data = np.asarray(matrix.data, dtype=np.float64)
+        rows = np.repeat(np.arange(n_terms), np.diff(indptr))
+        blk = np.asarray(matrix.indices) // block_size
+        floor = np.zeros(n_terms)
+        if len(blk):
+            starts = np.concatenate([[0], np.flatnonzero((rows[1:] != rows[:-1]) | (blk[1:] != blk[:-1])) + 1])
+            maxes = np.maximum(np.maximum.reduceat(data, starts), 0.0)
+            ptr = np.searchsorted(rows[starts], np.arange(n_terms + 1))
+            blocks = blk[starts]
+            nonempty = np.flatnonzero(np.diff(indptr))
+            floor[nonempty] = np.minimum(np.minimum.reduceat(data, indptr[nonempty]), 0.0)
+        else:
+            maxes, blocks, ptr = np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(n_terms + 1, dtype=np.int64)
+        return cls(ptr.astype(np.int64), blocks.astype(np.int32), maxes, floor, n_docs, block_size)
+
+    def bounds(self, ids, vals):
+        """
+        (batas atas, batas bawah) skor dokumen terbaik tiap blok untuk query (bobot
+        query > 0). Batas bawah: kontribusi maksimum satu term ditambah kontribusi
+        terkecil semua term negatif.
+        """
+        ub = np.zeros(-(-self.n_docs // self.block_size))
+        lb = np.zeros(len(ub))
+        shift = 0.0
+        for t, w in zip(ids, vals):
+            lo, hi = self.ptr[t], self.ptr[t + 1]
+            blocks, contrib = self.blocks[lo:hi], w * self.maxes[lo:hi]
+            ub[blocks] += contrib
+            lb[blocks] = np.maximum(lb[blocks], contrib)
+            shift += w * self.floor[t]
+        return ub, lb + shift
+
+    def save(self, path):
+        for name in ("ptr", "blocks", "maxes", "floor"):
+            np.save(os.path.join(path, f"blockmax_{name}.npy"), getattr(self, name))
+
+def load_block_max(path, n_docs, block_size, mmap=True):
+    """BlockMax tersimpan di path, atau None jika belum ada / ukuran blok tidak tercatat"""
+    if block_size is None or not os.path.exists(os.path.join(path, "blockmax_floor.npy")):
+        return None
+    mode = "r" if mmap else None
+    # np.asarray: view ndarray biasa, indexing memmap per query jauh lebih lambat
+    return BlockMax(*(np.asarray(np.load(os.path.join(path, f"blockmax_{name}.npy"), mmap_mode=mode))
+                      for name in ("ptr", "blocks", "maxes", "floor")), n_docs, block_size)
+
+def blockmax_topk(matrix, block_max, ids, vals, k):
+    """
+    Top-k [(doc, skor)] atas matriks CSR term × doc untuk query (term id, bobot > 0).
+    Skor tiap dokumen dijumlah per term dengan urutan yang sama seperti q @ matrix,
+    sehingga hasil identik bit per bit dengan top_k_indices pada scoring penuh.
+    Mengembalikan (top, stats); top None jika pruning tidak aman (kurang dari k
+    dokumen berskor > 0) atau tidak menghemat (terlalu banyak blok tersisa) sehingga
+    pemanggil harus memakai scoring penuh.
+    """
+    n_docs = matrix.shape[1]
+    size = block_max.block_size
+    stats = {"n_docs": n_docs, "scored": 0, "pruned": 0, "postings": 0, "blocks": 0}
+    order = np.argsort(ids, kind="stable")
+    ids, vals = np.asarray(ids)[order], np.asarray(vals, dtype=np.float64)[order]
+    if k <= 0 or k >= n_docs or not len(ids):
+        return None, stats
+    # dokumen berskor > 0 harus memuat term berbobot positif; kurang dari k → skor ke-k <= 0
+    positive = block_max.floor[ids] == 0
+    if np.sum(matrix.indptr[ids[positive] + 1] - matrix.indptr[ids[positive]]) < k:
+        return None, stats
+    ub, lb = block_max.bounds(ids, vals)
+    # batas atas dilonggarkan sedikit: urutan penjumlahan float berbeda dengan skor tepat
+    ub *= 1 + 1e-9
+    if np.count_nonzero(lb > 0) >= k:
+        # k blok berbeda masing-masing punya dokumen berskor >= lb → skor ke-k akhir >= theta
+        theta = np.partition(lb, len(lb) - k)[len(lb) - k]
+        if np.count_nonzero(ub >= theta) > MAX_BLOCK_FRACTION * len(ub):
+            return None, stats
+    remaining = np.argsort(-ub, kind="stable")
+    remaining = remaining[ub[remaining] > 0]
+
+    top_docs, top_scores = np.zeros(0, dtype=np.int64), np.zeros(0)
+    # putaran 1: k blok dengan batas atas tertinggi → skor ke-k awal; putaran 2: semua blok
+    # yang batas atasnya masih di atas skor itu sekaligus (tanpa putaran ke-3 kecuali kurang dari k)
+    step = k
+    while len(remaining):
+        batch, remaining = np.sort(remaining[:step]), remaining[step:]
+        docs, scores, n_postings = _score_blocks(matrix, ids, vals, batch, size)
+        stats["scored"] += len(docs)
+        stats["postings"] += n_postings
+        stats["blocks"] += len(batch)
+        docs, scores = np.concatenate([top_docs, docs]), np.concatenate([top_scores, scores])
+        if len(scores) > k:
+            best = np.flatnonzero(scores >= np.partition(scores, len(scores) - k)[len(scores) - k])
+        else:
+            best = np.arange(len(scores))
+        # seri diputus dengan doc id (bukan posisi array) seperti top_k_indices pada scoring penuh
+        best = best[np.lexsort((docs[best], -scores[best]))[:k]]
+        top_docs, top_scores = docs[best], scores[best]
+        if len(top_docs) == k:
+            theta, last = top_scores[-1], top_docs[-1]
+            # blok yang masih bisa menyalip dokumen ke-k (skor lebih tinggi, atau seri dengan doc id lebih kecil)
+            need = (ub[remaining] > theta) | ((ub[remaining] >= theta) & (remaining * size < last))
+            remaining = remaining[need]
+            if len(remaining) > MAX_BLOCK_FRACTION * len(ub):
+                return None, stats
+        step = len(remaining) if len(top_docs) == k else 2 * step
+    if len(top_docs) < k or top_scores[-1] <= 0:
+        return None, stats
+    stats["pruned"] = n_docs - stats["scored"]
+    return [(int(d), float(s)) for d, s in zip(top_docs, top_scores)], stats
+
+def _score_blocks(matrix, ids, vals, blocks, size):
+    """Skor tepat semua dokumen di blok-blok terurut: (doc, skor, jumlah posting dibaca)"""
+    n_docs = matrix.shape[1]
+    starts = blocks.astype(np.int64) * size
+    ends = np.minimum(starts + size, n_docs)
+    acc = np.zeros(len(blocks) * size)
+    slot = np.zeros(-(-n_docs // size), dtype=np.int64)
+    slot[blocks] = np.arange(0, len(blocks) * size, size)
+    n_postings = 0
+    for t, w in zip(ids, vals):
+        lo, hi = matrix.indptr[t], matrix.indptr[t + 1]
+        docs = matrix.indices[lo:hi]
+        first = np.searchsorted(docs, starts)
+        lens = np.searchsorted(docs, ends) - first
+        n = int(lens.sum())
+        if not n:
+            continue
+        # posisi posting semua blok dalam satu array: rentang [first, first+lens) disambung
+        offsets = np.cumsum(lens) - lens
+        pos = lo + np.repeat(first - offsets, lens) + np.arange(n)
+        d = matrix.indices[pos]
+        acc[slot[d // size] + d % size] += matrix.data[pos] * w
+        n_postings += n
+    docs = (starts[:, None] + np.arange(size)).ravel()
+    valid = docs < n_docs
+    return docs[valid], acc[valid], n_postings
+
+def top_k_rows(scores, k):
+    """
+    Top-k per baris matriks skor dense (q × N) dengan argpartition; hasil per baris
+    terurut skor desc lalu indeks dokumen asc (sama dengan top_k_indices).
+    """
+    n_rows, n = scores.shape
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((n_rows, 0), dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(n), (n_rows, 1))
+    rows = np.arange(n_rows)[:, None]
+    top_scores = scores[rows, part]
+    order = np.lexsort((part, -top_scores), axis=1)
+    top = part[rows, order]
+    if k < n:
+        # seri di batas ke-k: argpartition memilih sembarang, ulangi baris itu dengan urutan doc id
+        kth = top_scores.min(axis=1)
+        ties = np.flatnonzero((scores >= kth[:, None]).sum(axis=1) > k)
+        for r in ties:
+            cand = np.flatnonzero(scores[r] >= kth[r])
+            top[r] = cand[np.lexsort((cand, -scores[r, cand]))[:k]]
+    return top
@@ -0,0 +1,308 @@
+# src/tracing.py
+# Instrumentasi ringan: span bernama (durasi per tahap) dan counter (dokumen diskor,
+# posting dibaca, cache hit, ...) per query. Trace aktif disimpan di contextvar
+# (aman untuk thread pool dan asyncio). Tanpa trace aktif span() mengembalikan
+# context manager kosong dan count() langsung kembali → overhead saat nonaktif
+# hanya satu lookup contextvar.
+#
+#   with tracing.trace("search") as t:
+#       with tracing.span("score"):
+#           ...
+#       tracing.count("docs_scored", n)
+#   print(t.format())
+#
+# Trace yang selesai diagregasi di `metrics` (dipakai endpoint /metrics server);
+# metrics.add_sink(fn) meneruskan tiap trace ke sistem lain (log, exporter).
+#
+# ImportTimer mencatat waktu import per modul (startup CLI); `python src/tracing.py
+# imports search_engine preprocess ...` mengukur tiap modul di interpreter baru.
+import os
+import sys
+import json
+import time
+import builtins
+import argparse
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar("stki_trace", default=None)
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _NoopSpan()
+
+class _Span:
+    __slots__ = ("trace", "name", "index", "t0")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        t = self.trace
+        self.index = len(t.spans)
+        self.t0 = time.perf_counter()
+        t.spans.append([self.name, t._depth, self.t0 - t.start, 0.0])
+        t._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        t = self.trace
+        t._depth -= 1
+        t.spans[self.index][3] = time.perf_counter() - self.t0
+        return False
+
+class Trace:
+    def __init__(self, name="query"):
+        self.name = name
+        self.spans = []          # [nama, kedalaman, mulai (s, relatif trace), durasi (s)]
+        self.counters = {}
+        self.start = time.perf_counter()
+        self.duration = None
+        self._depth = 0
+        self._before = 0.0       # durasi span retroaktif (add_span), ikut dihitung di total
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def add_span(self, name, duration, before=False):
+        """
+        Span yang diukur di luar trace. before=True: tahap sebelum trace dimulai
+        (mis. waktu import modul), ikut dihitung di total; selain itu dicatat sebagai
+        anak span yang sedang terbuka (mis. tahap di sisi server pada mode klien).
+        """
+        if before:
+            self.spans.append([name, self._depth, -self._before - duration, duration])
+            self._before += duration
+        else:
+            self.spans.append([name, self._depth, time.perf_counter() - self.start - duration, duration])
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.start + self._before
+        return self
+
+    def elapsed(self):
+        return self.duration if self.duration is not None else time.perf_counter() - self.start + self._before
+
+    def to_dict(self):
+        return {"name": self.name, "total_ms": round(self.elapsed() * 1000, 3),
+                "spans": [{"name": n, "depth": d, "start_ms": round(s * 1000, 3), "ms": round(ms * 1000, 3)}
+                          for n, d, s, ms in self.spans],
+                "counters": dict(self.counters)}
+
+    def format(self):
+        total = self.elapsed()
+        lines = [f"[PROFILE] {self.name}: {total * 1000:.3f} ms"]
+        for name, depth, _, duration in self.spans:
+            pct = 100 * duration / total if total else 0.0
+            label = "  " * depth + name
+            lines.append(f"  {label:<28} {duration * 1000:10.3f} ms {pct:6.1f}%")
+        if self.counters:
+            lines.append("  counters: " + ", ".join(f"{k}={v}" for k, v in sorted(self.counters.items())))
+        return "\n".join(lines)
+
+# API MODUL (dipanggil dari kode ranking; no-op tanpa trace aktif)
+def current():
+    return _current.get()
+
+def active():
+    return _current.get() is not None
+
+def span(name):
+    t = _current.get()
+    return _NOOP if t is None else _Span(t, name)
+
+def count(name, n=1):
+    t = _current.get()
+    if t is not None:
+        t.counters[name] = t.counters.get(name, 0) + n
+
+@contextmanager
+def trace(name="query", record=True):
+    """Mengaktifkan trace baru di konteks ini; record=True → diagregasi ke metrics saat selesai"""
+    t = Trace(name)
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+        t.finish()
+        if record:
+            metrics.record(t)
+
+# AGREGAT (endpoint /metrics)
+class Metrics:
+    """Jumlah/total/maks + persentil (jendela durasi terakhir) per span, total counter, sink opsional"""
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._sinks = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.traces = {}         # nama trace → jumlah
+            self.spans = {}          # nama span → {"count", "total", "max", "recent"}
+            self.counters = {}
+
+    def add_sink(self, fn):
+        """fn(trace_dict) dipanggil untuk tiap trace yang selesai"""
+        self._sinks.append(fn)
+
+    def remove_sink(self, fn):
+        self._sinks.remove(fn)
+
+    def record(self, t):
+        with self._lock:
+            self.traces[t.name] = self.traces.get(t.name, 0) + 1
+            for name, duration in [(t.name, t.elapsed())] + [(f"{t.name}.{s[0]}", s[3]) for s in t.spans]:
+                agg = self.spans.get(name)
+                if agg is None:
+                    agg = self.spans[name] = {"count": 0, "total": 0.0, "max": 0.0,
+                                              "recent": deque(maxlen=self.window)}
+                agg["count"] += 1
+                agg["total"] += duration
+                agg["max"] = max(agg["max"], duration)
+                agg["recent"].append(duration)
+            for k, v in t.counters.items():
+                self.counters[k] = self.counters.get(k, 0) + v
+        for fn in list(self._sinks):
+            fn(t.to_dict())
+
+    def snapshot(self):
+        with self._lock:
+            spans = {}
+            for name, agg in self.spans.items():
+                recent = sorted(agg["recent"])
+                pick = lambda q: recent[min(len(recent) - 1, int(q * len(recent)))] * 1000 if recent else 0.0
+                spans[name] = {"count": agg["count"], "mean_ms": round(agg["total"] / agg["count"] * 1000, 4),
+                               "max_ms": round(agg["max"] * 1000, 4), "p50_ms": round(pick(0.50), 4),
+                               "p95_ms": round(pick(0.95), 4), "p99_ms": round(pick(0.99), 4)}
+            return {"traces": dict(self.traces), "spans": spans, "counters": dict(self.counters)}
+
+metrics = Metrics()
+
+# WAKTU IMPORT (startup)
+class ImportTimer:
+    """
+    Membungkus builtins.__import__ dan mencatat waktu tiap modul yang baru dimuat:
+    inklusif (termasuk import di dalamnya) dan self (tanpa anak), seperti
+    `python -X importtime` tetapi bisa dilaporkan dari dalam proses. Import lewat
+    importlib.import_module dihitung ke modul pemanggilnya. Hanya untuk thread
+    utama saat startup (stack tidak per thread).
+    """
+
+    def __init__(self):
+        self.records = {}        # nama modul → [inklusif (s), self (s)], urut waktu mulai
+        self.start = None
+        self._stack = []
+        self._orig = None
+
+    def install(self):
+        self._orig = builtins.__import__
+        builtins.__import__ = self._import
+        self.start = time.perf_counter()
+        return self
+
+    def uninstall(self):
+        if self._orig is not None:
+            builtins.__import__ = self._orig
+            self._orig = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level:
+            package = (globals or {}).get("__package__") or ""
+            base = package.rsplit(".", level - 1)[0] if level > 1 else package
+            name_abs = f"{base}.{name}" if name else base
+        else:
+            name_abs = name
+        if name_abs in sys.modules:
+            return self._orig(name, globals, locals, fromlist, level)
+        record = self.records.setdefault(name_abs, [0.0, 0.0])
+        self._stack.append(0.0)
+        t0 = time.perf_counter()
+        try:
+            return self._orig(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - t0
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            record[0] += elapsed
+            record[1] += elapsed - children
+
+    def packages(self):
+        """Total waktu self per paket tingkat atas (numpy, scipy, sklearn, nltk, modul src, ...)"""
+        totals = {}
+        for name, (_, own) in self.records.items():
+            root = name.split(".")[0]
+            totals[root] = totals.get(root, 0.0) + own
+        return dict(sorted(totals.items(), key=lambda kv: -kv[1]))
+
+    def total(self):
+        return sum(own for _, own in self.records.values())
+
+    def to_dict(self, top=15):
+        return {"total_ms": round(self.total() * 1000, 3),
+                "packages_ms": {k: round(v * 1000, 3) for k, v in self.packages().items()},
+                "modules_ms": {name: round(incl * 1000, 3) for name, (incl, _) in
+                               sorted(self.records.items(), key=lambda kv: -kv[1][0])[:top]}}
+
+    def format(self, top=10):
+        total = self.total()
+        lines = [f"[IMPORTS] {total * 1000:.3f} ms, {len(self.records)} modul baru"]
+        for root, own in list(self.packages().items())[:top]:
+            pct = 100 * own / total if total else 0.0
+            lines.append(f"  {root:<28} {own * 1000:10.3f} ms {pct:6.1f}%")
+        return "\n".join(lines)
+
+def time_import(module, python=None):
+    """Waktu import satu modul di interpreter baru (cache modul kosong) → dict ImportTimer"""
+    import subprocess
+    code = ("import tracing, json; t = tracing.ImportTimer().install(); "
+            f"import {module}; t.uninstall(); print(json.dumps(t.to_dict()))")
+    out = subprocess.run([python or sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def _main():
+    parser = argparse.ArgumentParser(description="Laporan waktu import modul (regresi startup)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_imp = sub.add_parser("imports", help="waktu import tiap modul di interpreter baru")
+    p_imp.add_argument("modules", nargs="*", default=["search_engine", "preprocess", "vsm_ir", "evaluation"])
+    p_imp.add_argument("--repeat", type=int, default=3, help="ambil median dari N run")
+    p_imp.add_argument("--budget-ms", type=float, default=None, help="exit 1 jika ada modul melebihi batas")
+    p_imp.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    report = {}
+    for module in args.modules:
+        runs = sorted((time_import(module) for _ in range(max(1, args.repeat))), key=lambda r: r["total_ms"])
+        report[module] = runs[len(runs) // 2]
+    if args.json:
+        print(json.dumps(report, indent=1))
+    else:
+        for module, r in report.items():
+            heavy = ", ".join(f"{k} {v:.1f}" for k, v in list(r["packages_ms"].items())[:5])
+            print(f"{module:<16} {r['total_ms']:9.1f} ms   ({heavy})")
+    over = [m for m, r in report.items() if args.budget_ms is not None and r["total_ms"] > args.budget_ms]
+    if over:
+        print(f"❌ melebihi {args.budget_ms} ms: {', '.join(over)}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    _main()
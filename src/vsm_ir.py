@@ -1,9 +1,19 @@
 import os
 import json
+import argparse
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from topk import BlockMax, blockmax_topk, top_k_indices, top_k_rows
+from result_cache import query_key
+from explain import Explainer, load_top
+from packed_store import iter_processed, manifest_generation, corpus_fingerprint
+import tracing
 
+VSM_FORMAT = "stki-vsm-model"
+VSM_VERSION = 1
+
+def default_vsm_dir():
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, "data", "index", "vsm")
 
 class VSMRetrieval:
     def __init__(self, processed_dir=None):
@@ -18,55 +28,309 @@ class VSMRetrieval:
         self.doc_ids = []
         self.vectorizer = None
         self.tfidf_matrix = None
+        self.snippets = None
+        self.generation = 0
+        self.corpus = None           # sidik sumber (packed_store.corpus_fingerprint / IndexReader.fingerprint)
+        self._term_major = None      # tfidf_matrix.T (CSR term × doc) untuk rank()
+        self._block_max = None       # topk.BlockMax atas _term_major untuk rank(prune=True)
+        self.last_query_stats = None
+        self.result_cache = None     # result_cache.ResultCache opsional di depan rank()
+        self.doc_store = None        # doc_store.DocStore opsional → snippet bias-query + highlight
+        self._explainer = None
+        self._top = None             # tabel top-N term tersimpan (lihat explain.py)
 
     # LOAD DOKUMEN PREPROCESSED
     def load_processed_docs(self):
-        files = sorted(os.listdir(self.processed_dir))
-
-        for fname in files:
-            if fname.endswith(".txt"):
-                with open(os.path.join(self.processed_dir, fname), "r", encoding="utf-8") as f:
-                    text = f.read().strip()
-                self.docs.append(text)
-                self.doc_ids.append(fname)
+        self.corpus = corpus_fingerprint(self.processed_dir)
+        for fname, text in iter_processed(self.processed_dir):
+            self.docs.append(text.strip())
+            self.doc_ids.append(fname)
 
+        self.generation = manifest_generation(self.processed_dir)
         print(f"[INFO] Loaded {len(self.docs)} documents.")
 
+    # SINKRONISASI DENGAN MANIFEST PREPROCESSING
+    def refresh(self, changes):
+        """
+        Memuat ulang hanya dokumen yang berubah (hasil preprocess.changed_documents)
+        lalu membangun ulang TF-IDF. Return True jika ada perubahan.
+        """
+        stale = set(changes["changed"]) | set(changes["removed"])
+        if not stale:
+            return False
+
+        kept = [(d, t) for d, t in zip(self.doc_ids, self.docs) if d not in stale]
+        for fname, text in iter_processed(self.processed_dir, changes["changed"]):
+            kept.append((fname, text.strip()))
+        kept.sort()
+        self.doc_ids = [d for d, _ in kept]
+        self.docs = [t for _, t in kept]
+        self.generation = changes.get("generation", self.generation)
+        self.corpus = corpus_fingerprint(self.processed_dir)
+
+        print(f"[INFO] Refreshed {len(stale)} documents (generation {self.generation}).")
+        self.build_tfidf()
+        return True
+
     # MEMBANGUN TF-IDF MATRIX
     def build_tfidf(self):
         if not self.docs:
             raise ValueError("Dokumen belum dimuat.")
 
-        self.vectorizer = TfidfVectorizer()
-        self.tfidf_matrix = self.vectorizer.fit_transform(self.docs)
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        with tracing.span("build_tfidf"):
+            self.vectorizer = TfidfVectorizer()
+            self.tfidf_matrix = self.vectorizer.fit_transform(self.docs)
+        self._term_major = None
+        self._block_max = None
+        self._explainer = None
 
         print(f"[INFO] TF-IDF shape: {self.tfidf_matrix.shape} (docs x terms)")
 
+    # MEMBANGUN TF-IDF DARI INDEX DI DISK (tanpa membaca korpus)
+    @classmethod
+    def from_index(cls, index):
+        """
+        Membuat VSMRetrieval dari index_store.IndexReader. Hasilnya setara dengan
+        TfidfVectorizer() default (smooth idf, norm l2) yang di-fit pada korpus yang sama.
+        """
+        from scipy.sparse import csc_matrix, diags
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.preprocessing import normalize
+        import re
+
+        vsm = cls()
+        vsm.doc_ids = [str(d) for d in index.doc_ids]
+        vsm.snippets = index.snippets
+        vsm.generation = index.generation
+        vsm.corpus = index.fingerprint()
+
+        # token pattern default sklearn hanya menerima token \w\w+
+        token_re = re.compile(r"(?u)\w\w+")
+        keep = np.array([bool(token_re.fullmatch(str(t))) for t in index.terms], dtype=bool)
+        counts = csc_matrix(
+            (np.asarray(index.post_tf, dtype=np.float64), np.asarray(index.post_docs), np.asarray(index.term_ptr)),
+            shape=(index.N, len(index.terms)),
+        )[:, np.flatnonzero(keep)]
+        terms = [str(t) for t in index.terms[keep]]
+
+        df = np.diff(counts.indptr)
+        idf = np.log((1 + index.N) / (1 + df)) + 1
+        vsm.tfidf_matrix = normalize(counts.tocsr() @ diags(idf), norm="l2")
+
+        vsm.vectorizer = TfidfVectorizer(vocabulary={t: i for i, t in enumerate(terms)})
+        vsm.vectorizer.idf_ = idf
+        print(f"[INFO] TF-IDF from index: {vsm.tfidf_matrix.shape} (docs x terms)")
+        return vsm
+
+    # SIMPAN / MUAT MODEL (array .npy, bisa mmap → dibagi antar proses lewat page cache)
+    def save(self, path):
+        """Menyimpan vocabulary, idf, matriks TF-IDF (CSR), doc ids dan snippet ke folder path"""
+        if self.tfidf_matrix is None:
+            raise ValueError("TF-IDF belum dibuat.")
+        os.makedirs(path, exist_ok=True)
+        matrix = self.tfidf_matrix.tocsr()
+        arrays = {
+            "terms": np.array(self.vectorizer.get_feature_names_out(), dtype=str),
+            "idf": np.asarray(self.vectorizer.idf_, dtype=np.float64),
+            "tfidf_data": matrix.data,
+            "tfidf_indices": matrix.indices,
+            "tfidf_indptr": matrix.indptr,
+            "doc_ids": np.array(self.doc_ids, dtype=str),
+            "snippets": np.array([self._snippet(i) for i in range(len(self.doc_ids))], dtype=str),
+        }
+        for name, arr in arrays.items():
+            np.save(os.path.join(path, name + ".npy"), arr)
+        # top-N term per dokumen dihitung sekali di sini, bukan per hasil query
+        self.explainer().save_top(path)
+        meta = {"format": VSM_FORMAT, "version": VSM_VERSION, "n_docs": matrix.shape[0],
+                "n_terms": matrix.shape[1], "generation": self.generation, "corpus": self.corpus}
+        # meta.json ditulis terakhir: model dianggap valid hanya jika meta ada
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+
+    @classmethod
+    def load(cls, path=None, mmap=True):
+        from scipy.sparse import csr_matrix
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        path = path or default_vsm_dir()
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != VSM_FORMAT or meta.get("version") != VSM_VERSION:
+            raise ValueError(f"Format model VSM tidak dikenali di {path}: "
+                             f"{meta.get('format')} v{meta.get('version')}")
+        mode = "r" if mmap else None
+        arr = lambda name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mode)
+
+        vsm = cls()
+        vsm.doc_ids = [str(d) for d in arr("doc_ids")]
+        vsm.snippets = arr("snippets")
+        vsm.generation = meta["generation"]
+        vsm.corpus = meta.get("corpus")
+        vsm.tfidf_matrix = csr_matrix((arr("tfidf_data"), arr("tfidf_indices"), arr("tfidf_indptr")),
+                                      shape=(meta["n_docs"], meta["n_terms"]), copy=False)
+        terms = arr("terms")
+        vsm.vectorizer = TfidfVectorizer(vocabulary={str(t): i for i, t in enumerate(terms)})
+        vsm.vectorizer.idf_ = np.asarray(arr("idf"))
+        vsm._top = load_top(path, mmap)
+        return vsm
+
+    @classmethod
+    def open(cls, processed_dir=None, model_dir=None, index=None):
+        """
+        Model tersimpan jika dibangun dari sumber yang sama dan belum berubah (sidik index
+        jika diberikan, selain itu sidik korpus processed); jika tidak, bangun dari index
+        on-disk (jika ada) atau fit ulang dari korpus.
+        """
+        model_dir = model_dir or default_vsm_dir()
+        fresh = cls(processed_dir)
+        source = index.fingerprint() if index is not None else corpus_fingerprint(fresh.processed_dir)
+        if os.path.exists(os.path.join(model_dir, "meta.json")):
+            vsm = cls.load(model_dir)
+            if vsm.corpus == source:
+                vsm.processed_dir = fresh.processed_dir
+                print(f"[INFO] Loaded VSM model: {vsm.tfidf_matrix.shape} (docs x terms) from {model_dir}")
+                return vsm._attach_doc_store()
+            print("[WARN] saved VSM model is stale; rebuild with `python src/vsm_ir.py build`")
+        if index is not None:
+            return cls.from_index(index)._attach_doc_store()
+        fresh.load_processed_docs()
+        fresh.build_tfidf()
+        return fresh._attach_doc_store()
+
+    def _attach_doc_store(self):
+        try:
+            from doc_store import DocStore
+        except ImportError:
+            return self
+        store = DocStore.open(self.processed_dir)
+        if store is not None and store.matches(self.doc_ids):
+            self.doc_store = store
+        return self
+
+    # PENJELASAN HASIL (sparse, lihat explain.py)
+    def explainer(self):
+        if self._explainer is None:
+            terms = self.vectorizer.get_feature_names_out()
+            self._explainer = Explainer(self.tfidf_matrix, terms, term_major=False, top=self._top)
+        return self._explainer
+
+    def explain(self, idx, query, top_n=5):
+        """Kontribusi tiap term query ke skor cosine dokumen idx + top term dokumen"""
+        q_vec = self.vectorize_query(query)
+        return self.explainer().explain(idx, q_vec.indices, q_vec.data, top_n)
+
+    def _snippet(self, idx):
+        if self.docs:
+            return self.docs[idx][:120].replace("\n", " ")
+        return str(self.snippets[idx])
+
     # QUERY → VECTOR
     def vectorize_query(self, query):
         return self.vectorizer.transform([query.lower().strip()])
 
     # RANKING (TOP-K)
-    def rank(self, query, k=5):
+    def rank(self, query, k=5, prune=False):
+        """
+        prune=True: top-k block-max (topk.py) atas posting list term query, tanpa
+        menghitung cosine ke semua dokumen; hasil identik dengan scoring penuh.
+        last_query_stats mencatat jumlah dokumen yang diskor.
+        """
         if self.tfidf_matrix is None:
             raise ValueError("TF-IDF belum dibuat.")
 
-        q_vec = self.vectorize_query(query)
-        scores = cosine_similarity(q_vec, self.tfidf_matrix).flatten()
-
-        top_idx = np.argsort(scores)[::-1][:k]
+        with tracing.span("analyze"):
+            q_vec = self.vectorize_query(query)
+        if self.result_cache is not None:
+            key = query_key("vsm", q_vec.indices, q_vec.data)
+            with tracing.span("cache"):
+                cached = self.result_cache.get(key, k, self.generation)
+            if cached is not None:
+                self.last_query_stats = {"n_docs": self.tfidf_matrix.shape[0], "scored": 0, "pruned": 0, "mode": "cache"}
+                return cached
+
+        top = None
+        if prune:
+            with tracing.span("score"):
+                top = self._rank_pruned(q_vec, k)
+        if top is not None:
+            top_idx = [d for d, _ in top]
+            scores = dict(top)
+        else:
+            with tracing.span("score"):
+                # baris query dan dokumen sama-sama ter-normalisasi l2 → dot product = cosine
+                scores = (q_vec @ self.term_major()).toarray().ravel()
+            with tracing.span("sort"):
+                top_idx = top_k_indices(scores, k)
+            n_docs = self.tfidf_matrix.shape[0]
+            self.last_query_stats = {"n_docs": n_docs, "scored": n_docs, "pruned": 0, "mode": "exhaustive"}
+        tracing.count("docs_scored", self.last_query_stats["scored"])
 
         results = []
         for idx in top_idx:
-            snippet = self.docs[idx][:120].replace("\n", " ")
+            snippet = self._snippet(idx)
             results.append({
                 "doc_id": self.doc_ids[idx],
                 "score": float(scores[idx]),
                 "snippet": snippet
             })
-
+        if self.doc_store is not None:
+            terms = self.vectorizer.build_analyzer()(query.lower().strip())
+            with tracing.span("snippets"):
+                for r, idx in zip(results, top_idx):
+                    snip = self.doc_store.snippet(int(idx), terms)
+                    r["snippet"], r["highlights"] = snip["text"], snip["highlights"]
+
+        if self.result_cache is not None:
+            self.result_cache.put(key, k, results, self.generation)
         return results
 
+    def rank_batch(self, queries, k=5, chunk_size=None, max_bytes=64 * 2**20):
+        """
+        Ranking banyak query sekaligus: semua query divektorisasi menjadi satu matriks
+        sparse lalu diskor dengan perkalian sparse × sparse per chunk (memori skor dense
+        dibatasi max_bytes) dan top-k per baris via argpartition.
+        Mengembalikan list hasil (format sama dengan rank) per query.
+        """
+        if self.tfidf_matrix is None:
+            raise ValueError("TF-IDF belum dibuat.")
+
+        q_mat = self.vectorizer.transform([q.lower().strip() for q in queries])
+        doc_t = self.tfidf_matrix.T.tocsc()
+        n_docs = self.tfidf_matrix.shape[0]
+        if chunk_size is None:
+            chunk_size = max(1, max_bytes // (8 * max(1, n_docs)))
+
+        all_results = []
+        for start in range(0, q_mat.shape[0], chunk_size):
+            # baris query dan dokumen sama-sama ter-normalisasi l2 → dot product = cosine
+            scores = (q_mat[start:start + chunk_size] @ doc_t).toarray()
+            for row, top_idx in zip(scores, top_k_rows(scores, k)):
+                all_results.append([{
+                    "doc_id": self.doc_ids[idx],
+                    "score": float(row[idx]),
+                    "snippet": self._snippet(idx),
+                } for idx in top_idx])
+        return all_results
+
+    def term_major(self):
+        """tfidf_matrix.T sebagai CSR term × doc (indices terurut), dibuat sekali"""
+        if self._term_major is None:
+            self._term_major = self.tfidf_matrix.T.tocsr()
+            self._term_major.sort_indices()
+        return self._term_major
+
+    def _rank_pruned(self, q_vec, k):
+        tm = self.term_major()
+        if self._block_max is None:
+            self._block_max = BlockMax.from_matrix(tm)
+        top, stats = blockmax_topk(tm, self._block_max, q_vec.indices, q_vec.data, k)
+        stats["mode"] = "blockmax" if top is not None else "exhaustive"
+        self.last_query_stats = stats
+        return top
+
     # METRIK EVALUASI
     def precision_at_k(self, retrieved, relevant, k):
         retrieved_k = retrieved[:k]
@@ -119,25 +383,37 @@ class VSMRetrieval:
         }
 
 
-# DEMO
+# DEMO / BUILD
 if __name__ == "__main__":
-    base = os.path.dirname(os.path.dirname(__file__))
-    gold_path = os.path.join(base, "data", "gold.json")
-
-    vsm = VSMRetrieval()
-    vsm.load_processed_docs()
-    vsm.build_tfidf()
-
-    gold = vsm.load_gold(gold_path)
-
-    query = list(gold.keys())[0]   # otomatis pakai query pertama di gold.json
-    print(f"\nQuery uji: {query}")
-
-    results = vsm.rank(query, k=5)
-    print("\n=== TOP-5 RANKING ===")
-    for r in results:
-        print(f"{r['doc_id']} | {r['score']:.4f} | {r['snippet']}")
-
-    eval = vsm.evaluate_query(query, gold, k=5)
-    print("\n=== UJI WAJIB ===")
-    print(eval)
+    base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="VSM TF-IDF: demo atau simpan model ter-fit")
+    parser.add_argument("command", nargs="?", choices=["demo", "build"], default="demo")
+    parser.add_argument("--out", default=default_vsm_dir())
+    args = parser.parse_args()
+
+    if args.command == "build":
+        vsm = VSMRetrieval()
+        vsm.load_processed_docs()
+        vsm.build_tfidf()
+        vsm.save(args.out)
+        print(f"[INFO] saved to {args.out}")
+    else:
+        gold_path = os.path.join(base, "data", "gold.json")
+
+        vsm = VSMRetrieval()
+        vsm.load_processed_docs()
+        vsm.build_tfidf()
+
+        gold = vsm.load_gold(gold_path)
+
+        query = list(gold.keys())[0]   # otomatis pakai query pertama di gold.json
+        print(f"\nQuery uji: {query}")
+
+        results = vsm.rank(query, k=5)
+        print("\n=== TOP-5 RANKING ===")
+        for r in results:
+            print(f"{r['doc_id']} | {r['score']:.4f} | {r['snippet']}")
+
+        eval = vsm.evaluate_query(query, gold, k=5)
+        print("\n=== UJI WAJIB ===")
+        print(eval)